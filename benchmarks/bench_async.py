@@ -0,0 +1,129 @@
+"""
+Event loop lag while validating, cleaning and updating a large document, with the synchronous methods,
+the AsyncMixin coroutines and the coroutines offloading to the default executor.
+
+    python benchmarks/bench_async.py [size]
+
+A task sleeping 1 ms in a loop measures how late it wakes up (the lag) while the operation runs 5 times.
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import time
+import asyncio
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+aio = importlib.import_module(PACKAGE + ".extensions.aio")
+
+SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+RUNS = 5
+
+
+class Item(dict_model.DefinedDict, aio.AsyncMixin):
+    name = dict_model.StringField(is_required=True)
+    count = dict_model.IntField(min=0)
+    kind = dict_model.StringField(choices=["a", "b", "c"])
+    created = dict_model.DateTimeField()
+
+
+class Document(dict_model.DefinedDict, aio.AsyncMixin):
+    name = dict_model.StringField()
+    items = dict_model.ListField(inner_type=dict_model.DefinedDictField(Item))
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+    entries = dict_model.MapField(inner_type=dict_model.DefinedDictField(Item))
+
+
+def make_document(n):
+    created = datetime.datetime(2015, 1, 1)
+    return {
+        "name" : "document",
+        "items" : [ { "name" : "item%d" % i, "count" : i, "kind" : "abc"[i % 3], "created" : created } for i in range(n) ],
+        "counters" : { "c%d" % i : i for i in range(n) },
+        "entries" : { "e%d" % i : { "name" : "entry", "count" : i } for i in range(n // 10) },
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+async def measure(operation, copied):
+    """Run operation(document) RUNS times, return (time of a run, lags)"""
+    documents = [ copy.deepcopy(DOCUMENT) if copied else DOCUMENT for _ in range(RUNS) ]
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for document in documents:
+        await operation(document)
+        # let the ticker wake up between the runs of the synchronous methods
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    running = False
+    await task
+    return elapsed / RUNS, lags
+
+
+DOCUMENT = make_document(SIZE)
+PATCH = { "counters" : { "c%d" % i : -i for i in range(SIZE) }, "entries" : { "e0" : { "count" : 1 } } }
+
+
+async def main():
+    offload = { "offload_threshold" : 0 }
+
+    async def sync_errors(document):
+        Document.get_document_errors(document)
+
+    async def sync_clean(document):
+        Document.clean_document(document)
+
+    async def sync_update(document):
+        Document.update(document, PATCH)
+
+    async def async_errors(document, **kwargs):
+        await Document.aget_document_errors(document, **kwargs)
+
+    async def async_clean(document, **kwargs):
+        await Document.aclean_document(document, **kwargs)
+
+    async def async_update(document, **kwargs):
+        await Document.aupdate(document, PATCH, **kwargs)
+
+    assert await Document.aget_document_errors(DOCUMENT) == Document.get_document_errors(DOCUMENT)
+    print("%d items, %d counters, %d runs" % (SIZE, SIZE, RUNS))
+    print("%-28s %12s %12s %12s %12s" % ("", "time", "lag p50", "lag p99", "lag max"))
+    cases = [
+        ("get_document_errors", sync_errors, False),
+        ("aget_document_errors", async_errors, False),
+        ("aget_document_errors offload", lambda document: async_errors(document, **offload), False),
+        ("clean_document", sync_clean, True),
+        ("aclean_document", async_clean, True),
+        ("aclean_document offload", lambda document: async_clean(document, **offload), True),
+        ("update", sync_update, True),
+        ("aupdate", async_update, True),
+        ("aupdate offload", lambda document: async_update(document, **offload), True),
+    ]
+    for name, operation, copied in cases:
+        elapsed, lags = await measure(operation, copied)
+        print("%-28s %9.2f ms %9.2f ms %9.2f ms %9.2f ms" % (
+            name, elapsed * 1e3, percentile(lags, 50) * 1e3, percentile(lags, 99) * 1e3, max(lags) * 1e3))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Bursts of small patches to the same documents, applied one by one with a write each, and with BatchUpdater.
+
+    python benchmarks/bench_batchupdate.py
+
+The write is json.dumps of the document, standing for the store. The extensions are imported as a package,
+from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import random
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+batchupdate = importlib.import_module(PACKAGE + ".extensions.batchupdate")
+
+
+class Stats(dict_model.DefinedDict):
+    views = dict_model.IntField()
+    score = dict_model.FloatField()
+    updated = dict_model.DateTimeField()
+
+
+class Item(dict_model.DefinedDict):
+    name = dict_model.StringField()
+    status = dict_model.StringField(choices=["new", "active", "closed"])
+    updated = dict_model.DateTimeField()
+    stats = dict_model.DefinedDictField(Stats)
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+    sections = dict_model.MapField(inner_type=dict_model.DefinedDictField(Stats))
+    extra = dict_model.DictField()
+
+
+def make_document(i):
+    now = datetime.datetime(2015, 1, 1)
+    return {
+        "name" : "item %d" % i,
+        "status" : "new",
+        "updated" : now,
+        "stats" : { "views" : 0, "score" : 0.0, "updated" : now },
+        "counters" : { "c%d" % k : 0 for k in range(50) },
+        "sections" : { "s%d" % k : { "views" : 0, "score" : 0.0, "updated" : now } for k in range(20) },
+        "extra" : { "e%d" % k : k for k in range(20) },
+    }
+
+
+def make_patch(rng, n):
+    now = datetime.datetime(2015, 1, 1) + datetime.timedelta(seconds=n)
+    kind = rng.randrange(5)
+    if kind == 0:
+        return { "counters" : { "c%d" % rng.randrange(50) : n }, "updated" : now }
+    if kind == 1:
+        return { "stats" : { "views" : n, "score" : n } }
+    if kind == 2:
+        return { "sections" : { "s%d" % rng.randrange(20) : { "views" : n, "updated" : now } } }
+    if kind == 3:
+        return { "status" : rng.choice(["new", "active", "closed"]), "updated" : now }
+    return { "extra" : { "e%d" % rng.randrange(20) : n } }
+
+
+def write(document_id, document, changed):
+    json.dumps(document, default=str)
+
+
+def one_by_one(model, documents, events):
+    for document_id, patch in events:
+        document = documents[document_id]
+        changed = model.update(document, patch, changed=set())
+        write(document_id, document, changed)
+
+
+def batched(model, documents, events, flush_size):
+    updater = batchupdate.BatchUpdater(model, load=documents.get, write=write, flush_size=flush_size, flush_window=None)
+    with updater:
+        for document_id, patch in events:
+            updater.add(document_id, patch)
+    return updater.stats
+
+
+def best(run, repeat=3):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    rng = random.Random(0)
+    patches = 20000
+    print("%10s %10s %12s %12s %10s %8s %8s" % ("documents", "flush", "one by one", "batched", "speedup", "writes", "rounds"))
+    for count, flush_size in ((10, 100), (10, 1000), (100, 1000), (1000, 1000), (1000, 10000)):
+        events = [ (rng.randrange(count), make_patch(rng, n)) for n in range(patches) ]
+        originals = { i : make_document(i) for i in range(count) }
+
+        # same result both ways
+        expected = copy.deepcopy(originals)
+        one_by_one(Item, expected, copy.deepcopy(events))
+        documents = copy.deepcopy(originals)
+        batched(Item, documents, copy.deepcopy(events), flush_size)
+        assert documents == expected
+
+        before, result = best(lambda: one_by_one(Item, copy.deepcopy(originals), events))
+        after, stats = best(lambda: batched(Item, copy.deepcopy(originals), events, flush_size))
+        copying, result = best(lambda: copy.deepcopy(originals))
+        before -= copying
+        after -= copying
+        print("%10d %10d %9.1f ms %9.1f ms %9.2fx %8d %8d" % (
+            count, flush_size, before * 1e3, after * 1e3, before / after, stats.documents, stats.rounds))
+
+
+if __name__ == "__main__":
+    main()
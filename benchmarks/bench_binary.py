@@ -0,0 +1,80 @@
+"""
+Size and speed of BinaryMixin.pack / unpack compared to json and pickle.
+
+    python benchmarks/bench_binary.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+json does not restore the datetimes (they are dumped with default=str), which favours it.
+"""
+import os
+import sys
+import json
+import pickle
+import timeit
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+binary = importlib.import_module(PACKAGE + ".extensions.binary")
+
+
+class Address(dict_model.DefinedDict, binary.BinaryMixin):
+    street = dict_model.StringField()
+    city = dict_model.StringField()
+    kind = dict_model.StringField(choices=["home", "work"])
+
+
+class User(dict_model.DefinedDict, binary.BinaryMixin):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField()
+    score = dict_model.FloatField()
+    active = dict_model.BoolField()
+    status = dict_model.StringField(choices=["new", "active", "banned"])
+    created = dict_model.DateTimeField()
+    updated = dict_model.DateTimeField()
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+    address = dict_model.DefinedDictField(Address)
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+
+def make_user(n):
+    return User.clean_document({
+        "name" : "name",
+        "age" : 20,
+        "score" : 2.5,
+        "active" : True,
+        "status" : "active",
+        "created" : datetime.datetime(2015, 1, 1, 12, 30),
+        "updated" : datetime.datetime(2015, 1, 2, 12, 30),
+        "tags" : [ "tag%d" % i for i in range(n) ],
+        "address" : { "street" : "street", "city" : "city", "kind" : "home" },
+        "counters" : { "c%d" % i : i for i in range(n) },
+    })
+
+
+def bench(name, dumps, loads, document, number):
+    data = dumps(document)
+    dump = min(timeit.repeat(lambda: dumps(document), number=number, repeat=9)) / number
+    load = min(timeit.repeat(lambda: loads(data), number=number, repeat=9)) / number
+    print("%-8s %8d B   dump %8.2f us   load %8.2f us" % (name, len(data), dump * 1e6, load * 1e6))
+
+
+def main():
+    for n in (0, 10, 100):
+        document = make_user(n)
+        assert User.unpack(User.pack(document)) == document
+        print("%d tags and counters" % n)
+        number = max(100, 20000 // (n + 1))
+        bench("pack", User.pack, User.unpack, document, number)
+        bench("json", lambda d: json.dumps(d, default=str).encode("utf-8"), json.loads, document, number)
+        bench("pickle", lambda d: pickle.dumps(d, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads,
+              document, number)
+        print()
+
+
+if __name__ == "__main__":
+    main()
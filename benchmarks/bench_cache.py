@@ -0,0 +1,118 @@
+"""
+Validation of documents embedding the same sub-documents, with and without the validation cache.
+
+    python benchmarks/bench_cache.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import timeit
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+cache = importlib.import_module(PACKAGE + ".extensions.cache")
+
+
+class Geo(dict_model.DefinedDict):
+    lat = dict_model.FloatField(is_required=True, min=-90, max=90)
+    lng = dict_model.FloatField(is_required=True, min=-180, max=180)
+
+
+class Address(dict_model.DefinedDict, cache.ValidationCacheMixin):
+    street = dict_model.StringField(is_required=True)
+    lines = dict_model.ListField(inner_type=dict_model.StringField())
+    city = dict_model.StringField(is_required=True)
+    zip = dict_model.IntField(min=0, max=99999)
+    kind = dict_model.StringField(choices=["home", "work"])
+    created = dict_model.DateTimeField()
+    geo = dict_model.DefinedDictField(Geo)
+    phones = dict_model.MapField(inner_type=dict_model.StringField())
+
+
+class CodeField(dict_model.StringField):
+    """A field that is not compiled, with a slow check"""
+
+    def errors(self, value, with_key=None):
+        yield from super().errors(value, with_key)
+        if isinstance(value, str) and sum(ord(c) for c in value) % 97 == 0:
+            yield (with_key, dict_model.Field.ERROR_VALUE, value)
+
+
+class Card(dict_model.DefinedDict, cache.ValidationCacheMixin):
+    codes = dict_model.ListField(inner_type=CodeField())
+    owner = CodeField(is_required=True)
+
+
+class User(dict_model.DefinedDict):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField(is_required=True)
+    address = dict_model.DefinedDictField(Address)
+    addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address))
+    cards = dict_model.ListField(inner_type=dict_model.DefinedDictField(Card))
+
+
+def make_address(i):
+    return { "street" : "street %d" % i, "lines" : [ "line 1", "line 2" ], "city" : "city", "zip" : i,
+             "kind" : "home", "created" : datetime.datetime(2015, 1, 1), "geo" : { "lat" : 1.0, "lng" : 2.0 },
+             "phones" : { "home" : "0123", "work" : "4567" } }
+
+
+def make_card(i):
+    return { "codes" : [ "code %d %d" % (i, j) for j in range(20) ], "owner" : "owner %d" % i }
+
+
+def make_users(n, addresses, shared):
+    """n users with 11 addresses each, taken from a pool of addresses distinct ones"""
+    pool = [ make_address(i) for i in range(addresses) ]
+    def address(i):
+        return pool[i % addresses] if shared else copy.deepcopy(pool[i % addresses])
+    return [ { "name" : "name", "age" : 20, "address" : address(i * 11),
+               "addresses" : [ address(i * 11 + j + 1) for j in range(10) ] } for i in range(n) ]
+
+
+def validate(users):
+    with cache.validation_batch():
+        for user in users:
+            User.get_document_errors(user)
+
+
+def make_card_users(n, cards):
+    """n users with 10 cards each, copies of cards distinct ones"""
+    pool = [ make_card(i) for i in range(cards) ]
+    return [ { "name" : "name", "age" : 20, "cards" : [ copy.deepcopy(pool[(i * 10 + j) % cards]) for j in range(10) ] }
+             for i in range(n) ]
+
+
+def bench(name, users, model=Address, **kwargs):
+    expected = [ User.get_document_errors(user) for user in users ]
+    before = min(timeit.repeat(lambda: validate(users), number=1, repeat=5))
+    model.enable_validation_cache(**kwargs)
+    assert [ User.get_document_errors(user) for user in users ] == expected
+    model.enable_validation_cache(**kwargs)
+    after = min(timeit.repeat(lambda: validate(users), number=1, repeat=5))
+    info = model.validation_cache_info()
+    model.disable_validation_cache()
+    print("%-36s %8.2f ms %8.2f ms %6.2fx   hits %d/%d/%d" % (
+        name, before * 1e3, after * 1e3, before / after,
+        info["identity_hits"], info["structure_hits"], info["misses"] + info["uncached"]))
+
+
+def main():
+    print("%-36s %11s %11s %7s   identity/structure/miss" % ("", "uncached", "cached", ""))
+    bench("shared objects, 10 addresses", make_users(1000, 10, True))
+    bench("all distinct", make_users(1000, 11000, False))
+    bench("equal copies, structural", make_users(1000, 10, False), structural=True)
+    bench("all distinct, structural", make_users(1000, 11000, False), structural=True)
+    bench("equal card copies, structural", make_card_users(1000, 10), Card, structural=True)
+    bench("distinct cards, structural", make_card_users(1000, 10000), Card, structural=True)
+
+
+if __name__ == "__main__":
+    main()
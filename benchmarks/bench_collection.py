@@ -0,0 +1,98 @@
+"""
+Query latency of ModelCollection against a linear scan of the documents.
+
+    python benchmarks/bench_collection.py [counts...]
+
+counts defaults to 10000 100000 1000000.
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import time
+import random
+import timeit
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+collection = importlib.import_module(PACKAGE + ".extensions.collection")
+
+
+class User(dict_model.DefinedDict):
+    status = dict_model.StringField(choices=["new", "active", "inactive", "banned", "deleted"])
+    active = dict_model.BoolField()
+    age = dict_model.IntField()
+    score = dict_model.FloatField()
+    created = dict_model.DateTimeField()
+    name = dict_model.StringField()
+
+
+START = datetime.datetime(2015, 1, 1)
+DAY = START + datetime.timedelta(days=100)
+NEXT_DAY = START + datetime.timedelta(days=101)
+
+
+def make_users(count):
+    random.seed(0)
+    statuses = User.status.choices
+    return [ {
+        "status" : random.choice(statuses),
+        "active" : random.random() < 0.5,
+        "age" : random.randrange(100),
+        "score" : random.random(),
+        "created" : START + datetime.timedelta(seconds=random.randrange(86400 * 365)),
+        "name" : "user%d" % i,
+    } for i in range(count) ]
+
+
+QUERIES = [
+    ("status == banned", { "status" : "banned" },
+        lambda d: d.get("status") == "banned"),
+    ("age == 42", { "age" : 42 },
+        lambda d: d.get("age") == 42),
+    ("score in [0.5, 0.501)", { "score__gte" : 0.5, "score__lt" : 0.501 },
+        lambda d: d.get("score") is not None and 0.5 <= d["score"] < 0.501),
+    ("one day of created", { "created__gte" : DAY, "created__lt" : NEXT_DAY },
+        lambda d: d.get("created") is not None and DAY <= d["created"] < NEXT_DAY),
+    ("banned, active, age 30-39", { "status" : "banned", "active" : True, "age__gte" : 30, "age__lt" : 40 },
+        lambda d: d.get("status") == "banned" and d.get("active") == True and
+                  d.get("age") is not None and 30 <= d["age"] < 40),
+    ("age 30-39 and name", { "age__gte" : 30, "age__lt" : 40, "name" : "user10" },
+        lambda d: d.get("age") is not None and 30 <= d["age"] < 40 and d.get("name") == "user10"),
+]
+
+
+def main():
+    counts = [ int(count) for count in sys.argv[1:] ] or [ 10000, 100000, 1000000 ]
+    for count in counts:
+        documents = make_users(count)
+        start = time.perf_counter()
+        users = collection.ModelCollection(User, documents)
+        print("%d documents, indexed in %.2f s" % (count, time.perf_counter() - start))
+        for name, conditions, predicate in QUERIES:
+            found = users.find(**conditions)
+            assert found == [ d for d in documents if predicate(d) ]
+            number = max(1, 100000 // count)
+            scan = min(timeit.repeat(lambda: [ d for d in documents if predicate(d) ], number=number, repeat=3))
+            number = max(1, number * 10 if len(found) < count // 100 else number)
+            query = min(timeit.repeat(lambda: users.find(**conditions), number=number, repeat=3))
+            scan /= max(1, 100000 // count)
+            query /= number
+            print("    %-28s %8d found   scan %10.1f us   index %10.1f us   %8.1fx" % (
+                name, len(found), scan * 1e6, query * 1e6, scan / query))
+
+        ids = random.sample(range(count), min(count, 1000))
+        start = time.perf_counter()
+        for id in ids:
+            users.update(id, { "age" : 20, "status" : "active" })
+        print("    update of indexed fields    %8.1f us" % ((time.perf_counter() - start) / len(ids) * 1e6))
+        print()
+        del users, documents
+
+
+if __name__ == "__main__":
+    main()
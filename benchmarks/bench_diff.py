@@ -0,0 +1,71 @@
+"""
+Size of the update produced by MongoMixin.diff compared to writing back the whole document.
+
+    python benchmarks/bench_diff.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import json
+import timeit
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+mongo = importlib.import_module(PACKAGE + ".extensions.mongo")
+
+
+class Entry(dict_model.DefinedDict, mongo.MongoMixin):
+    name = dict_model.StringField(store_field="n")
+    count = dict_model.IntField()
+    updated = dict_model.DateTimeField()
+
+
+class Document(dict_model.DefinedDict, mongo.MongoMixin):
+    name = dict_model.StringField()
+    updated = dict_model.DateTimeField()
+    entry = dict_model.DefinedDictField(Entry)
+    entries = dict_model.MapField(inner_type=dict_model.DefinedDictField(Entry))
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+
+
+def make_document(n):
+    now = datetime.datetime(2015, 1, 1)
+    return {
+        "name" : "document",
+        "updated" : now,
+        "entry" : { "name" : "entry", "count" : 0, "updated" : now },
+        "entries" : { "e%d" % i : { "name" : "entry", "count" : i, "updated" : now } for i in range(n) },
+        "tags" : [ "tag%d" % i for i in range(n) ],
+    }
+
+
+def size(document):
+    return len(json.dumps(document, default=str))
+
+
+def main():
+    print("%8s %12s %10s %10s %12s" % ("entries", "document", "diff", "ratio", "diff time"))
+    for n in (10, 100, 1000, 10000):
+        old = make_document(n)
+        new = make_document(n)
+        new["updated"] = datetime.datetime(2015, 1, 2)
+        new["entries"]["e0"]["count"] = -1
+        new["entries"].pop("e1")
+
+        stored = make_document(n)
+        Document.map_to_mongo(stored)
+        update = Document.diff(old, new)
+        number = max(1, 2000 // n)
+        elapsed = min(timeit.repeat(lambda: Document.diff(old, new), number=number, repeat=3)) / number
+        print("%8d %10d B %8d B %9.4f%% %9.1f us" % (
+            n, size(stored), size(update), 100.0 * size(update) / size(stored), elapsed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
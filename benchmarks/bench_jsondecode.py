@@ -0,0 +1,95 @@
+"""
+Decode json with JsonDecoderMixin.decode_json, compared to json.loads + clean_document + get_document_errors.
+
+    python benchmarks/bench_jsondecode.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import json
+import timeit
+import importlib
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+jsondecode = importlib.import_module(PACKAGE + ".extensions.jsondecode")
+
+
+class Address(dict_model.DefinedDict, jsondecode.JsonDecoderMixin):
+    street = dict_model.StringField(is_required=True)
+    city = dict_model.StringField(is_required=True)
+    kind = dict_model.StringField(choices=["home", "work"])
+
+
+class User(dict_model.DefinedDict, jsondecode.JsonDecoderMixin):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField(is_required=True)
+    score = dict_model.FloatField(min=0, max=10)
+    created = dict_model.DateTimeField(is_required=True)
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+    address = dict_model.DefinedDictField(Address)
+    addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address))
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+
+def make_user(n, undefined=0):
+    address = { "street" : "street", "city" : "city", "kind" : "home", "note" : "not in the model" }
+    user = {
+        "name" : "name",
+        "age" : 20,
+        "score" : 2.5,
+        "created" : "2015-01-01T00:00:00",
+        "tags" : [ "tag%d" % i for i in range(n) ],
+        "address" : dict(address),
+        "addresses" : [ dict(address) for i in range(n) ],
+        "counters" : { "c%d" % i : i for i in range(n) },
+    }
+    if undefined:
+        user["history"] = [ { "event" : "event %d" % i, "at" : "2015-01-01", "values" : [ i, i + 1 ] }
+                            for i in range(undefined) ]
+    return json.dumps(user)
+
+
+def loads(text):
+    document = json.loads(text)
+    document["created"] = jsondecode.datetime.datetime.fromisoformat(document["created"])
+    User.clean_document(document)
+    return document, User.get_document_errors(document)
+
+
+def peak(function, *args):
+    """The peak memory allocated by function(*args), in KiB"""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name, text, number):
+    assert loads(text) == User.decode_json(text)
+    # alternated, so that both get the same share of the noise of the machine
+    before = after = float("inf")
+    for i in range(15):
+        before = min(before, timeit.timeit(lambda: loads(text), number=number))
+        after = min(after, timeit.timeit(lambda: User.decode_json(text), number=number))
+    print("%-32s %8d B   loads+clean+errors %9.2f us %8.1f KiB   decode_json %9.2f us %8.1f KiB   %5.2fx" % (
+        name, len(text), before / number * 1e6, peak(loads, text), after / number * 1e6,
+        peak(User.decode_json, text), before / after))
+
+
+def main():
+    for n in (0, 10, 100):
+        bench("%d elements" % n, make_user(n), max(10, 20000 // (n + 1)))
+    for undefined in (100, 1000, 10000):
+        bench("10 elements, %d undefined" % undefined, make_user(10, undefined), max(5, 20000 // undefined))
+
+
+if __name__ == "__main__":
+    main()
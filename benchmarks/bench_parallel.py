@@ -0,0 +1,77 @@
+"""
+Crossover of the parallel_threshold of ListField: time to validate and clean a list of DefinedDictField
+serially, on a thread pool and on a process pool, for growing list sizes.
+
+    python benchmarks/bench_parallel.py [workers]
+
+workers defaults to the number of cpus. The parallel_threshold of a field should be around the first size
+where the pool is faster than the serial loop on the machine it runs on.
+"""
+import os
+import sys
+import copy
+import time
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dict_model import *
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+
+
+class Item(DefinedDict):
+    name = StringField(is_required=True)
+    count = IntField(min=0)
+    kind = StringField(choices=["a", "b", "c"])
+    created = DateTimeField()
+    tags = ListField(inner_type=StringField())
+
+
+class Serial(DefinedDict):
+    items = ListField(inner_type=DefinedDictField(Item))
+
+
+class Threads(DefinedDict):
+    items = ListField(inner_type=DefinedDictField(Item), parallel_threshold=1,
+                      parallel_workers=WORKERS, parallel_executor="thread")
+
+
+class Processes(DefinedDict):
+    items = ListField(inner_type=DefinedDictField(Item), parallel_threshold=1,
+                      parallel_workers=WORKERS, parallel_executor="process")
+
+
+def make_document(n):
+    created = datetime.datetime(2015, 1, 1)
+    return { "items" : [ { "name" : "item%d" % i, "count" : i, "kind" : "abc"[i % 3], "created" : created,
+                           "tags" : [ "a", "b" ] } for i in range(n) ] }
+
+
+def best(function, document, copied, repeat=3):
+    times = []
+    for _ in range(repeat):
+        value = copy.deepcopy(document) if copied else document
+        start = time.perf_counter()
+        function(value)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    print("%d workers" % WORKERS)
+    # start the pools before measuring
+    Threads.get_document_errors(make_document(10))
+    Processes.get_document_errors(make_document(10))
+    for name, method, copied in (("get_document_errors", "get_document_errors", False), ("clean_document", "clean_document", True)):
+        print()
+        print("%-8s %-20s %12s %12s %12s" % ("size", name, "serial", "threads", "processes"))
+        for n in (1000, 10000, 50000, 100000, 200000):
+            document = make_document(n)
+            assert Threads.get_document_errors(document) == Serial.get_document_errors(document)
+            times = [ best(getattr(model, method), document, copied) for model in (Serial, Threads, Processes) ]
+            print("%-8d %-20s %9.2f ms %9.2f ms %9.2f ms" % ((n, "") + tuple(t * 1000 for t in times)))
+
+
+if __name__ == "__main__":
+    main()
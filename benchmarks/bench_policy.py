@@ -0,0 +1,85 @@
+"""
+Validation of a stream of documents with the validation policies, compared to get_document_errors.
+
+    python benchmarks/bench_policy.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import time
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+policy = importlib.import_module(PACKAGE + ".extensions.policy")
+
+
+class Address(dict_model.DefinedDict):
+    street = dict_model.StringField(is_required=True)
+    city = dict_model.StringField(is_required=True)
+    kind = dict_model.StringField(choices=["home", "work"])
+
+
+class User(dict_model.DefinedDict, policy.ValidationPolicyMixin):
+    id = dict_model.StringField(is_required=True)
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField(is_required=True)
+    score = dict_model.FloatField(choices=[1.0, 2.0, 3.0], min=1, max=3)
+    active = dict_model.BoolField()
+    created = dict_model.DateTimeField(is_required=True)
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+    address = dict_model.DefinedDictField(Address)
+    addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address))
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+
+def make_user(i, n):
+    address = { "street" : "street", "city" : "city", "kind" : "home" }
+    return {
+        "id" : "user%d" % i,
+        "name" : "name",
+        "age" : 20,
+        "score" : 2.0,
+        "active" : True,
+        "created" : datetime.datetime(2015, 1, 1),
+        "tags" : [ "tag%d" % k for k in range(n) ],
+        "address" : dict(address),
+        "addresses" : [ dict(address) for k in range(n) ],
+        "counters" : { "c%d" % k : k for k in range(n) },
+    }
+
+
+def best(run, repeat=5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    policies = [
+        ("sampled 1/10", lambda: policy.ValidationPolicy.sampled(10, key="id")),
+        ("sampled 1/100", lambda: policy.ValidationPolicy.sampled(100, key="id")),
+        ("sampled 1/100, no key", lambda: policy.ValidationPolicy.sampled(100)),
+        ("type_only", policy.ValidationPolicy.type_only),
+    ]
+    for n in (0, 10, 100):
+        documents = [ make_user(i, n) for i in range(2000) ]
+        print("%d elements per list, %d documents" % (n, len(documents)))
+        baseline = best(lambda: [ User.get_document_errors(document) for document in documents ])
+        print("    %-24s %10.2f us" % ("get_document_errors", baseline / len(documents) * 1e6))
+        for name, make_policy in policies:
+            used = make_policy()
+            elapsed = best(lambda: [ User.get_policy_errors(document, policy=used) for document in documents ])
+            print("    %-24s %10.2f us %8.2fx" % (name, elapsed / len(documents) * 1e6, baseline / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Cost of ProfilingMixin: a model with the mixin, with profiling off and on, against the same model without it.
+
+    python benchmarks/bench_profiling.py
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import timeit
+import datetime
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+profiling = importlib.import_module(PACKAGE + ".extensions.profiling")
+
+
+def make_models(mixins):
+    class Address(dict_model.DefinedDict, *mixins):
+        street = dict_model.StringField(is_required=True)
+        city = dict_model.StringField(is_required=True)
+        kind = dict_model.StringField(choices=["home", "work"])
+
+    class User(dict_model.DefinedDict, *mixins):
+        name = dict_model.StringField(is_required=True)
+        age = dict_model.IntField(is_required=True)
+        created = dict_model.DateTimeField(is_required=True)
+        tags = dict_model.ListField(inner_type=dict_model.StringField())
+        address = dict_model.DefinedDictField(Address)
+        addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address))
+        counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+    return User
+
+
+def make_user(n):
+    address = { "street" : "street", "city" : "city", "kind" : "home" }
+    return {
+        "name" : "name",
+        "age" : 20,
+        "created" : datetime.datetime(2015, 1, 1),
+        "tags" : [ "tag%d" % i for i in range(n) ],
+        "address" : dict(address),
+        "addresses" : [ dict(address) for i in range(n) ],
+        "counters" : { "c%d" % i : i for i in range(n) },
+    }
+
+
+def measure(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    plain = make_models([])
+    profiled = make_models([profiling.ProfilingMixin])
+    document = make_user(10)
+    patch = { "name" : "other", "address" : { "city" : "other" }, "counters" : { "c0" : 1 } }
+    operations = [
+        ("get_document_errors", lambda model: model.get_document_errors(document)),
+        ("is_document_valid", lambda model: model.is_document_valid(document)),
+        ("clean_document", lambda model: model.clean_document(copy.deepcopy(document))),
+        ("update", lambda model: model.update(copy.deepcopy(document), patch)),
+    ]
+    print("%-22s %12s %12s %12s" % ("", "no mixin", "off", "on"))
+    for name, operation in operations:
+        without = measure(lambda: operation(plain), 5000)
+        off = measure(lambda: operation(profiled), 5000)
+        profiling.enable_profiling()
+        on = measure(lambda: operation(profiled), 500)
+        profiling.disable_profiling()
+        print("%-22s %9.2f us %9.2f us %9.2f us" % (name, without, off, on))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Memory of records (DefinedDict.record_class) compared to dicts, measured with tracemalloc.
+
+    python benchmarks/bench_records.py [count]
+
+count defaults to 1000000.
+"""
+import os
+import sys
+import timeit
+import datetime
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dict_model import *
+
+
+class Address(DefinedDict):
+    street = StringField()
+    city = StringField()
+    kind = StringField(choices=["home", "work"])
+
+
+class User(DefinedDict):
+    name = StringField(is_required=True)
+    age = IntField()
+    score = FloatField()
+    active = BoolField()
+    created = DateTimeField()
+    address = DefinedDictField(Address)
+
+
+CREATED = datetime.datetime(2015, 1, 1)
+
+
+def make_user():
+    # the values are shared between the documents so that only the containers are measured
+    return {
+        "name" : "name",
+        "age" : 20,
+        "score" : 2.0,
+        "active" : True,
+        "created" : CREATED,
+        "address" : { "street" : "street", "city" : "city", "kind" : "home" },
+    }
+
+
+def measure(build, count):
+    tracemalloc.start()
+    values = build(count)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del values
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    Record = User.record_class()
+    documents = measure(lambda n: [ make_user() for i in range(n) ], count)
+    records = measure(lambda n: [ Record.from_dict(make_user()) for i in range(n) ], count)
+    print("%d documents" % count)
+    print("dict     %10.1f MB   %6.1f B per document" % (documents / 1e6, documents / count))
+    print("record   %10.1f MB   %6.1f B per document   %.2fx smaller" % (
+        records / 1e6, records / count, documents / records))
+
+    document = make_user()
+    record = Record.from_dict(document)
+    number = 100000
+    from_dict = min(timeit.repeat(lambda: Record.from_dict(document), number=number, repeat=3))
+    to_dict = min(timeit.repeat(record.to_dict, number=number, repeat=3))
+    print("from_dict %6.2f us   to_dict %6.2f us" % (from_dict / number * 1e6, to_dict / number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Time to import a module defining 5000 models, and to use each of them once afterwards.
+
+    python benchmarks/bench_startup.py [models]
+
+The models are written to a temporary module: a third of them subclass an earlier model, a third embed an
+earlier model, and all have the mongo and label mixins. The extensions are imported as a package, from the
+parent folder of the repository.
+"""
+import os
+import gc
+import sys
+import time
+import shutil
+import tempfile
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+HEADER = """
+from {package}.dict_model import *
+from {package}.extensions.labels import LabelMixin
+from {package}.extensions.mongo import MongoMixin
+"""
+
+MODEL = """
+class Model{index}({bases}):
+    name{index} = StringField(is_required=True, labels="private")
+    count{index} = IntField(min=0, store_field="c{index}")
+    score{index} = FloatField(choices=[1.0, 2.0])
+    created{index} = DateTimeField()
+    status{index} = StringField(choices={{"on" : 1, "off" : 0}})
+    tags{index} = ListField(inner_type=StringField())
+    counters{index} = MapField(inner_type=IntField())
+{nested}"""
+
+
+def write_models(path, count):
+    parts = [ HEADER.format(package=PACKAGE) ]
+    for index in range(count):
+        bases = "DefinedDict, MongoMixin, LabelMixin"
+        nested = ""
+        if index and index % 3 == 1:
+            bases = "Model%d" % (index - 1)
+        elif index and index % 3 == 2:
+            nested = "    nested{index} = DefinedDictField(Model{parent})\n".format(index=index, parent=index - 1)
+        parts.append(MODEL.format(index=index, bases=bases, nested=nested))
+    with open(path, "w") as f:
+        f.write("".join(parts))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    folder = tempfile.mkdtemp()
+    try:
+        write_models(os.path.join(folder, "startup_models.py"), count)
+        sys.path.insert(0, folder)
+        importlib.import_module(PACKAGE + ".extensions.mongo")
+        gc.collect()
+        start = time.perf_counter()
+        module = importlib.import_module("startup_models")
+        imported = time.perf_counter() - start
+        models = [ getattr(module, "Model%d" % index) for index in range(count) ]
+
+        start = time.perf_counter()
+        for model in models:
+            model.get_document_errors({})
+        validated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for model in models:
+            document = {}
+            model.clean_document(document)
+            model.map_to_mongo(document)
+            model.clean_labels(document, "private")
+        used = time.perf_counter() - start
+
+        print("%d models" % count)
+        print("import                   %8.1f ms" % (imported * 1e3))
+        print("first get_document_errors %7.1f ms" % (validated * 1e3))
+        print("first clean, mongo, labels %6.1f ms" % (used * 1e3))
+        print("total                    %8.1f ms" % ((imported + validated + used) * 1e3))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
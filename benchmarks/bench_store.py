@@ -0,0 +1,106 @@
+"""
+Write and scan a DocumentStore.
+
+    python benchmarks/bench_store.py [count]
+
+count defaults to 200000. The store is written to a temporary folder.
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+import importlib
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+store = importlib.import_module(PACKAGE + ".extensions.store")
+
+
+class Address(dict_model.DefinedDict):
+    street = dict_model.StringField()
+    city = dict_model.StringField()
+    kind = dict_model.StringField(choices=["home", "work"])
+
+
+class User(dict_model.DefinedDict):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField()
+    score = dict_model.FloatField()
+    active = dict_model.BoolField()
+    created = dict_model.DateTimeField()
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+    address = dict_model.DefinedDictField(Address)
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+
+def make_users(count):
+    created = datetime.datetime(2015, 1, 1)
+    for i in range(count):
+        yield {
+            "name" : "user%d" % i,
+            "age" : i % 90,
+            "score" : i / 7.0,
+            "active" : i % 2 == 0,
+            "created" : created + datetime.timedelta(seconds=i),
+            "tags" : [ "tag%d" % j for j in range(i % 8) ],
+            "address" : { "street" : "street %d" % i, "city" : "city", "kind" : "home" },
+            "counters" : { "c%d" % j : j for j in range(i % 8) },
+        }
+
+
+def timed(name, count, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print("%-28s %8.2f s   %10.0f documents/s" % (name, elapsed, count / elapsed))
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "users.dms")
+        documents = store.DocumentStore(User, path)
+
+        def append():
+            batch = []
+            for document in make_users(count):
+                batch.append(document)
+                if len(batch) == 10000:
+                    documents.append_many(batch)
+                    batch = []
+            documents.append_many(batch)
+        timed("append_many (validated)", count, append)
+        print("%d documents, %.1f MB on disk" % (len(documents), os.path.getsize(path) / 1e6))
+
+        def scan(fields, stop=None):
+            n = 0
+            for document in documents.scan(fields, stop=stop):
+                n += 1
+            return n
+        timed("scan, all fields", count, lambda: scan(None))
+        timed("scan, age", count, lambda: scan([ "age" ]))
+        timed("scan, name and created", count, lambda: scan([ "name", "created" ]))
+
+        indexes = [ random.randrange(count) for i in range(100000) ]
+        timed("random reads of age", len(indexes), lambda: [ documents[index]["age"] for index in indexes ])
+
+        # the documents are not kept, scanning takes the same memory whatever the size of the store
+        for stop in (count // 10, count):
+            tracemalloc.start()
+            scan(None, stop)
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("scan of %d documents, peak traced memory %.1f KB" % (stop, peak / 1e3))
+        documents.close()
+
+
+if __name__ == "__main__":
+    main()
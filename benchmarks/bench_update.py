@@ -0,0 +1,52 @@
+"""
+Revalidate a document after a small update: get_document_errors against get_errors_for_paths on the
+paths reported by update.
+
+    python benchmarks/bench_update.py
+"""
+import os
+import sys
+import timeit
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dict_model import *
+
+
+class Entry(DefinedDict):
+    name = StringField(is_required=True)
+    count = IntField(min=0)
+
+
+class Document(DefinedDict):
+    name = StringField(is_required=True)
+    updated = DateTimeField()
+    entries = MapField(inner_type=DefinedDictField(Entry))
+    tags = ListField(inner_type=StringField())
+
+
+def make_document(n):
+    return {
+        "name" : "document",
+        "updated" : datetime.datetime(2015, 1, 1),
+        "entries" : { "e%d" % i : { "name" : "entry", "count" : i } for i in range(n) },
+        "tags" : [ "tag%d" % i for i in range(n) ],
+    }
+
+
+def main():
+    patch = { "updated" : datetime.datetime(2015, 1, 2), "entries" : { "e0" : { "count" : 1 } } }
+    for n in (10, 1000, 100000):
+        document = make_document(n)
+        changed = Document.update(document, patch, changed=set())
+        assert Document.get_errors_for_paths(document, changed) == []
+        number = max(10, 100000 // n)
+        full = min(timeit.repeat(lambda: Document.get_document_errors(document), number=number, repeat=3))
+        paths = min(timeit.repeat(lambda: Document.get_errors_for_paths(document, changed), number=number, repeat=3))
+        print("%-20s full %10.2f us   paths %8.2f us   speedup %8.1fx" % (
+            "%d entries" % n, full / number * 1e6, paths / number * 1e6, full / paths))
+
+
+if __name__ == "__main__":
+    main()
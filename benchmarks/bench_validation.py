@@ -0,0 +1,86 @@
+"""
+Compare the compiled validators (get_document_errors, is_document_valid) against the generator path (_yield_errors).
+
+    python benchmarks/bench_validation.py
+"""
+import os
+import sys
+import timeit
+import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dict_model import *
+
+
+class Address(DefinedDict):
+    street = StringField(is_required=True)
+    city = StringField(is_required=True)
+    kind = StringField(choices=["home", "work"])
+
+
+class User(DefinedDict):
+    name = StringField(is_required=True)
+    age = IntField(is_required=True)
+    score = FloatField(choices=[1.0, 2.0, 3.0], min=1, max=3)
+    active = BoolField()
+    created = DateTimeField(is_required=True)
+    tags = ListField(inner_type=StringField())
+    address = DefinedDictField(Address)
+    addresses = ListField(inner_type=DefinedDictField(Address))
+    counters = MapField(inner_type=IntField())
+
+
+def make_user(n):
+    address = { "street" : "street", "city" : "city", "kind" : "home" }
+    return {
+        "name" : "name",
+        "age" : 20,
+        "score" : 2.0,
+        "active" : True,
+        "created" : datetime.datetime(2015, 1, 1),
+        "tags" : [ "tag%d" % i for i in range(n) ],
+        "address" : dict(address),
+        "addresses" : [ dict(address) for i in range(n) ],
+        "counters" : { "c%d" % i : i for i in range(n) },
+    }
+
+
+def bench(name, document, number):
+    generator = min(timeit.repeat(lambda: list(User._yield_errors(document)), number=number, repeat=5))
+    compiled = min(timeit.repeat(lambda: User.get_document_errors(document), number=number, repeat=5))
+    print("%-24s generator %8.2f us   compiled %8.2f us   speedup %5.2fx" % (
+        name, generator / number * 1e6, compiled / number * 1e6, generator / compiled))
+
+
+def bench_valid(name, document, number):
+    def generator():
+        for error in User._yield_errors(document):
+            return False
+        return True
+    before = min(timeit.repeat(generator, number=number, repeat=5))
+    after = min(timeit.repeat(lambda: User.is_document_valid(document), number=number, repeat=5))
+    print("%-24s generator %8.2f us   compiled %8.2f us   speedup %5.2fx" % (
+        name, before / number * 1e6, after / number * 1e6, before / after))
+
+
+def main():
+    for n in (0, 10, 100, 1000):
+        document = make_user(n)
+        assert list(User._yield_errors(document)) == User.get_document_errors(document)
+        bench("valid, %d elements" % n, document, max(10, 20000 // (n + 1)))
+
+    invalid = make_user(10)
+    invalid.update({ "name" : None, "age" : "20", "score" : 5.0 })
+    invalid["addresses"].append({ "kind" : "school" })
+    assert list(User._yield_errors(invalid)) == User.get_document_errors(invalid)
+    bench("invalid, 10 elements", invalid, 2000)
+
+    print()
+    print("is_document_valid")
+    for n in (0, 100, 10000):
+        bench_valid("valid, %d elements" % n, make_user(n), max(10, 20000 // (n + 1)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Benchmark suite of the models, to compare the performance of two versions of the library.
+
+    python benchmarks/suite.py run [-o results.json] [--filter flat] [--repeat 5]
+    python benchmarks/suite.py compare before.json after.json [--threshold 10]
+
+run measures each operation of each synthetic model:
+
+    flat            20 scalar fields (str, int, float, bool, datetime, choices)
+    nested          10 levels of DefinedDictField
+    wide_map        a MapField of 1000 DefinedDictField and a MapField of 1000 int
+    long_list       a ListField of 1000 DefinedDictField and a ListField of 1000 str
+
+operations          get_document_errors, is_document_valid, clean_document, update, make_default,
+                    map_to_mongo and map_from_mongo (skipped if the mongo extension can not be imported)
+
+It prints and saves ops/sec (best of --repeat) and the peak memory allocated by one operation.
+compare prints the change of every result and exits with 1 if any is slower (or uses more memory)
+by more than --threshold percent.
+
+The documents are generated with a fixed seed, the results of two runs are only comparable on the same
+machine. The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import random
+import timeit
+import datetime
+import platform
+import importlib
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+try:
+    mongo = importlib.import_module(PACKAGE + ".extensions.mongo")
+except ImportError:
+    mongo = None
+
+# each measure runs the operation for at least this long
+MIN_TIME = 0.2
+# copied operations are run at most as many times as can be copied in this long
+MAX_COPY_TIME = 2.0
+COPY_CHUNK = 100
+
+#################################### Models ####################################
+def _model(name, fields):
+    """Create a model with the mixins of the suite"""
+    bases = (dict_model.DefinedDict, ) if mongo is None else (dict_model.DefinedDict, mongo.MongoMixin)
+    return type(name, bases, fields)
+
+
+def _item_model(name):
+    return _model(name, {
+        "name" : dict_model.StringField(is_required=True),
+        "count" : dict_model.IntField(min=0),
+        "kind" : dict_model.StringField(choices={ "a" : 1, "b" : 2, "c" : 3 }),
+        "updated" : dict_model.DateTimeField(store_field="u"),
+    })
+
+
+def _item(i):
+    return { "name" : "item%d" % i, "count" : i, "kind" : "abc"[i % 3], "updated" : datetime.datetime(2015, 1, 1 + i % 28) }
+
+
+def flat_model():
+    fields = {}
+    for i in range(4):
+        fields["string%d" % i] = dict_model.StringField(is_required=True)
+        fields["int%d" % i] = dict_model.IntField(min=0, max=1000)
+        fields["float%d" % i] = dict_model.FloatField()
+        fields["bool%d" % i] = dict_model.BoolField()
+        fields["date%d" % i] = dict_model.DateTimeField()
+    fields["status"] = dict_model.StringField(choices={ "new" : 0, "active" : 1, "deleted" : 2 })
+    fields["store"] = dict_model.IntField(store_field="s")
+    model = _model("Flat", fields)
+
+    def document(rng):
+        doc = {}
+        for i in range(4):
+            doc["string%d" % i] = "value%d" % rng.randrange(1000)
+            doc["int%d" % i] = rng.randrange(1000)
+            doc["float%d" % i] = rng.random()
+            doc["bool%d" % i] = rng.random() < 0.5
+            doc["date%d" % i] = datetime.datetime(2015, 1, 1) + datetime.timedelta(seconds=rng.randrange(10 ** 7))
+        doc["status"] = rng.choice(["new", "active", "deleted"])
+        doc["store"] = rng.randrange(1000)
+        return doc
+
+    patch = { "string0" : "patched", "int1" : 5, "status" : "deleted" }
+    return model, document, patch
+
+
+def nested_model(depth=10):
+    model = None
+    for level in range(depth):
+        fields = {
+            "name" : dict_model.StringField(is_required=True),
+            "value" : dict_model.IntField(),
+            "updated" : dict_model.DateTimeField(),
+        }
+        if model is not None:
+            fields["child"] = dict_model.DefinedDictField(model)
+        model = _model("Nested%d" % level, fields)
+
+    def document(rng):
+        doc = None
+        for level in range(depth):
+            node = { "name" : "level%d" % level, "value" : rng.randrange(1000), "updated" : datetime.datetime(2015, 1, 1) }
+            if doc is not None:
+                node["child"] = doc
+            doc = node
+        return doc
+
+    patch = {}
+    node = patch
+    for level in range(depth - 1):
+        node["child"] = {}
+        node = node["child"]
+    node["value"] = -1
+    return model, document, patch
+
+
+def wide_map_model(size=1000):
+    item = _item_model("MapItem")
+    model = _model("WideMap", {
+        "name" : dict_model.StringField(),
+        "items" : dict_model.MapField(inner_type=dict_model.DefinedDictField(item)),
+        "counters" : dict_model.MapField(inner_type=dict_model.IntField()),
+    })
+
+    def document(rng):
+        return {
+            "name" : "map",
+            "items" : { "k%d" % i : _item(i) for i in range(size) },
+            "counters" : { "c%d" % i : rng.randrange(1000) for i in range(size) },
+        }
+
+    patch = { "items" : { "k0" : { "count" : 1 }, "new" : _item(0) }, "counters" : { "c1" : 1 } }
+    return model, document, patch
+
+
+def long_list_model(size=1000):
+    item = _item_model("ListItem")
+    model = _model("LongList", {
+        "name" : dict_model.StringField(),
+        "items" : dict_model.ListField(inner_type=dict_model.DefinedDictField(item)),
+        "tags" : dict_model.ListField(inner_type=dict_model.StringField()),
+    })
+
+    def document(rng):
+        return {
+            "name" : "list",
+            "items" : [ _item(i) for i in range(size) ],
+            "tags" : [ "tag%d" % rng.randrange(100) for i in range(size) ],
+        }
+
+    patch = { "name" : "patched", "items" : [ _item(0) ] }
+    return model, document, patch
+
+
+MODELS = [
+    ("flat", flat_model),
+    ("nested", nested_model),
+    ("wide_map", wide_map_model),
+    ("long_list", long_list_model),
+]
+
+#################################### Operations ####################################
+"""
+Each operation is (name, prepare(model, document, patch) -> argument, run(model, argument, patch), copied).
+If copied is True the operation modifies its argument, and each run is given a copy made before timing.
+clean_document and update are run on a document they were already run on, they do the same work each time
+without a copy.
+"""
+
+def _to_mongo(model, document, patch):
+    document = copy.deepcopy(document)
+    model.map_to_mongo(document)
+    return document
+
+
+def _document(model, document, patch):
+    return document
+
+
+def _cleaned(model, document, patch):
+    document = copy.deepcopy(document)
+    model.clean_document(document)
+    return document
+
+
+def _updated(model, document, patch):
+    document = copy.deepcopy(document)
+    model.update(document, patch)
+    return document
+
+
+OPERATIONS = [
+    ("get_document_errors", _document, lambda model, document, patch: model.get_document_errors(document), False),
+    ("is_document_valid", _document, lambda model, document, patch: model.is_document_valid(document), False),
+    ("clean_document", _cleaned, lambda model, document, patch: model.clean_document(document), False),
+    ("update", _updated, lambda model, document, patch: model.update(document, patch), False),
+    ("make_default", _document, lambda model, document, patch: model.make_default(), False),
+]
+MONGO_OPERATIONS = [
+    ("map_to_mongo", _document, lambda model, document, patch: model.map_to_mongo(document), True),
+    ("map_from_mongo", _to_mongo, lambda model, document, patch: model.map_from_mongo(document), True),
+]
+
+
+def measure(model, document, patch, operation, repeat):
+    """Return (ops/sec, peak bytes) of the operation"""
+    name, prepare, run, copied = operation
+    argument = prepare(model, document, patch)
+
+    limit = None
+    if copied:
+        start = time.perf_counter()
+        copy.deepcopy(argument)
+        limit = max(1, int(MAX_COPY_TIME / (time.perf_counter() - start)))
+    number = 1
+    while True:
+        elapsed = _time(model, argument, patch, run, copied, number)
+        if elapsed >= MIN_TIME or number == limit:
+            break
+        number *= 2 if elapsed <= 0 else min(10, max(2, int(MIN_TIME / elapsed) + 1))
+        if limit is not None:
+            number = min(number, limit)
+    best = min([ elapsed ] + [ _time(model, argument, patch, run, copied, number) for _ in range(repeat - 1) ])
+
+    value = copy.deepcopy(argument) if copied else argument
+    tracemalloc.start()
+    try:
+        run(model, value, patch)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return number / best, peak
+
+
+def _time(model, argument, patch, run, copied, number):
+    if copied:
+        # the copies are made COPY_CHUNK at a time, to not hold number copies of a large document
+        elapsed = 0.0
+        for chunk in range(0, number, COPY_CHUNK):
+            arguments = [ copy.deepcopy(argument) for _ in range(min(COPY_CHUNK, number - chunk)) ]
+            start = time.perf_counter()
+            for value in arguments:
+                run(model, value, patch)
+            elapsed += time.perf_counter() - start
+        return elapsed
+    return timeit.timeit(lambda: run(model, argument, patch), number=number)
+
+#################################### Commands ####################################
+def run_suite(repeat=5, filter=None):
+    """Return the results of the suite, { "meta" : {...}, "results" : { "model.operation" : {...} } }"""
+    operations = OPERATIONS + (MONGO_OPERATIONS if mongo is not None else [])
+    results = {}
+    for model_name, build in MODELS:
+        model, make_document, patch = build()
+        document = make_document(random.Random(0))
+        assert model.get_document_errors(document) == [], model_name
+        for operation in operations:
+            key = "%s.%s" % (model_name, operation[0])
+            if filter and filter not in key:
+                continue
+            ops, peak = measure(model, document, patch, operation, repeat)
+            results[key] = { "ops" : ops, "peak" : peak }
+            print("%-36s %14.1f ops/sec %12d B" % (key, ops, peak))
+    if mongo is None:
+        print("mongo extension could not be imported, map_to_mongo and map_from_mongo are skipped")
+    return {
+        "meta" : {
+            "python" : platform.python_version(),
+            "implementation" : platform.python_implementation(),
+            "machine" : platform.machine(),
+            "time" : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "repeat" : repeat,
+        },
+        "results" : results,
+    }
+
+
+def compare(before, after, threshold):
+    """Print the change of each result, return the keys that regressed by more than threshold percent"""
+    regressions = []
+    print("%-36s %14s %14s %9s %9s" % ("", "before ops", "after ops", "ops", "peak"))
+    for key in sorted(set(before["results"]) | set(after["results"])):
+        old = before["results"].get(key)
+        new = after["results"].get(key)
+        if old is None or new is None:
+            print("%-36s %s" % (key, "only after" if old is None else "only before"))
+            continue
+        ops_change = (new["ops"] / old["ops"] - 1) * 100
+        peak_change = (new["peak"] / old["peak"] - 1) * 100 if old["peak"] else 0.0
+        regressed = ops_change < -threshold or peak_change > threshold
+        if regressed:
+            regressions.append(key)
+        print("%-36s %14.1f %14.1f %+8.1f%% %+8.1f%%%s" % (
+            key, old["ops"], new["ops"], ops_change, peak_change, "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python benchmarks/suite.py", description="Benchmark suite of dict_model")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    run = commands.add_parser("run", help="run the suite")
+    run.add_argument("-o", "--output", help="json file to save the results to")
+    run.add_argument("--filter", help="only run the benchmarks whose model.operation contains this")
+    run.add_argument("--repeat", type=int, default=5, help="number of measures of each benchmark, the best is kept")
+    diff = commands.add_parser("compare", help="compare the results of two runs")
+    diff.add_argument("before", help="json file of the first run")
+    diff.add_argument("after", help="json file of the second run")
+    diff.add_argument("--threshold", type=float, default=10.0,
+                      help="percent of ops/sec lost (or peak memory gained) reported as a regression (default: 10)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(repeat=args.repeat, filter=args.filter)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print("%d regression(s) above %.1f%%" % (len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
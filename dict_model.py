@@ -18,9 +18,17 @@
 # and/or modify it under the terms of the Do What The Fuck You Want
 # To Public License, Version 2, as published by Sam Hocevar. See
 # http://sam.zoy.org/wtfpl/COPYING for more details.
+import os
 import re
+import sys
+import json
+import time
+import keyword
 import datetime
 import logging
+import itertools
+import importlib
+import collections
 
 """
 Note:
@@ -114,8 +122,15 @@ class Field(object):
             if set_default:
                 document[key] = self.make_default()
 
-    def update(self, document, key, value):
+    def update(self, document, key, value, changed=None, path=None):
+        """Set document[key] to value.
+
+        changed             if provided, a set that the dotted path of every modified value is added to.
+        path                the dotted path of document[key], used with changed.
+        """
         document[key] = value
+        if changed is not None:
+            changed.add(path)
 
 
 class TypedField(Field):
@@ -195,10 +210,10 @@ class FloatField(NumberField):
     def __init__(self, **kwargs):
         super().__init__(allowed_type=(float, int), **kwargs)
 
-    def update(self, document, key, value):
+    def update(self, document, key, value, **kwargs):
         if isinstance(value, int):
             value = float(value)
-        super().update(document, key, value)
+        super().update(document, key, value, **kwargs)
 
 
 class BoolField(TypedField):
@@ -213,13 +228,18 @@ class ListField(TypedField):
     """TypedField for list
     """
 
-    def __init__(self, inner_type=None, ensure_list=True, remove_none_value=True, **kwargs):
+    def __init__(self, inner_type=None, ensure_list=True, remove_none_value=True,
+                 parallel_threshold=None, parallel_workers=None, parallel_executor="process", **kwargs):
         """Constructor
 
         inner_type              The type of field for the values in the list.
                                 if None, then it will not enforced (default : None)
         ensure_list             Ensure that this field is always a list and never a None.
                                 All None value will be converted to list upon cleaning.
+        parallel_threshold      If provided, lists of at least this many values are validated and cleaned
+                                in chunks on a pool, see _parallel_errors. inner_type must be a DefinedDictField.
+        parallel_workers        The size of the pool (default : number of cpus)
+        parallel_executor       "process" or "thread" (default : "process")
         """
         super().__init__(allowed_type=(list, ), **kwargs)
         if inner_type is not None and not isinstance(inner_type, Field):
@@ -227,6 +247,7 @@ class ListField(TypedField):
         self.inner_type = inner_type
         self.ensure_list = ensure_list
         self.remove_none_value = remove_none_value
+        _set_parallel(self, parallel_threshold, parallel_workers, parallel_executor)
 
     def errors(self, value, with_key=None):
         yield from super().errors(value, with_key)
@@ -278,23 +299,33 @@ class DictField(TypedField):
         super().__init__(allowed_type=(dict, ), **kwargs)
 
 
-    def update(self, document, key, value):
+    def update(self, document, key, value, changed=None, path=None):
         if isinstance(value, dict):
             if document.get(key) is None:
                 document[key] = value
+                if changed is not None:
+                    changed.add(path)
             elif isinstance(document.get(key), dict):
                 document[key].update(value)
+                if changed is not None:
+                    changed.update(_child_path(path, k) for k in value)
 
 
 class MapField(DictField):
 
-    def __init__(self, inner_type=None, ensure_dict=True, remove_none_value=True, **kwargs):
+    def __init__(self, inner_type=None, ensure_dict=True, remove_none_value=True,
+                 parallel_threshold=None, parallel_workers=None, parallel_executor="process", **kwargs):
+        """Constructor
+
+        parallel_threshold, parallel_workers and parallel_executor are the same as for ListField.
+        """
         super().__init__(**kwargs)
         if inner_type is None or not isinstance(inner_type, Field):
             raise DictFieldError(message="Innertype for MapField needs to be a Field")
         self.inner_type = inner_type
         self.ensure_dict = ensure_dict
         self.remove_none_value = remove_none_value
+        _set_parallel(self, parallel_threshold, parallel_workers, parallel_executor)
 
     def errors(self, value, with_key=None):
         yield from super().errors(value, with_key)
@@ -303,26 +334,37 @@ class MapField(DictField):
                 for k, v in value.items():
                     yield from self.inner_type.errors(v, ".".join([with_key, k]))
             else:
-                for k, v in value:
+                for v in value.values():
                     yield from self.inner_type.errors(v, None)
 
-    def update(self, document, key, value):
+    def update(self, document, key, value, changed=None, path=None):
         if isinstance(value, dict):
             if document.get(key) is None:
                 document[key] = {}
+                if changed is not None:
+                    changed.add(path)
         if isinstance(value, dict):
             if isinstance(self.inner_type, DefinedDictField):
                 for k, v in value.items():
                     if document[key].get(k) is None or v is None:
                         document[key][k] = v
-                    else:
+                        if changed is not None:
+                            changed.add(_child_path(path, k))
+                    elif changed is None:
                         self.inner_type.model.update(document[key][k], v)
+                    else:
+                        self.inner_type.model.update(document[key][k], v, changed=changed,
+                                                     parent=_child_path(path, k))
             else:
                 for k, v in value.items():
                     if document[key].get(k) is None:
                         document[key][k] = v
-                    else:
+                        if changed is not None:
+                            changed.add(_child_path(path, k))
+                    elif changed is None:
                         self.inner_type.update(document[key], k, v)
+                    else:
+                        self.inner_type.update(document[key], k, v, changed=changed, path=_child_path(path, k))
 
     def clean(self, document, key, **kwargs):
         super().clean(document, key, **kwargs)
@@ -359,12 +401,16 @@ class DefinedDictField(DictField):
         else:
             return super().make_default()
 
-    def update(self, document, key, value):
+    def update(self, document, key, value, changed=None, path=None):
         if isinstance(value, dict):
             if document.get(key) is None:
                 document[key] = value
-            else:
+                if changed is not None:
+                    changed.add(path)
+            elif changed is None:
                 self.model.update(document[key], value)
+            else:
+                self.model.update(document[key], value, changed=changed, parent=path)
 
     def clean(self, document, key, set_default=True, **kwargs):
         if key not in document:
@@ -377,7 +423,9 @@ class DefinedDictField(DictField):
 class Mixin(object):
     """Parent class for mixins
 
-    _apply_mixin will be run for each class created with this mixin and each class that inherits a class with this mixin.
+    _apply_mixin will be run once for each class created with this mixin and each class that inherits a class with this mixin.
+    It runs for every class of the schema when it is imported, expensive structures are better built when first
+    used, see LazyClassAttribute.
     """
 
     @classmethod
@@ -395,7 +443,839 @@ class Mixin(object):
         """
         pass
 
+#################################### Compiled Validators ####################################
+"""
+Validators are compiled for each model the first time they are used (see DefinedDictMetaClass).
+
+The compiled validator is a single function that checks every field of the model in the same order
+as _yield_errors and produces exactly the same errors. The checks of the builtin fields (required,
+choices, type, min/max) are inlined, ListField/MapField values are walked in place and nested
+DefinedDictField values call the compiled validator of their own model.
+
+Keys are passed around as path nodes, (parent_node, key), and are only joined into a dotted key
+when an error is found.
+
+Each model has a validator for each of the modes below
+
+    errors          _compiled_errors(document, parent, errors)
+                    append the error tuples of get_document_errors to errors.
+    valid           _compiled_valid(document)
+                    return False on the first error, without building any key or error.
+    limited         _compiled_limited(document, parent, errors, limit)
+                    append DocumentError to errors, raise _ErrorLimitReached when limit is reached.
+
+Fields with their own errors method are not inlined, their errors method is called instead.
+Changing the attributes of a field after the model is created will not be seen by the compiled validator.
+"""
+
+def _path_string(node):
+    """Join a path node into a dotted key"""
+    parts = []
+    while node is not None:
+        node, key = node
+        parts.append(key if isinstance(key, str) else str(key))
+    parts.reverse()
+    return ".".join(parts)
+
+
+class _ErrorLimitReached(Exception):
+    pass
+
+
+_NO_VALUE = object()
+
+
+class DocumentError(object):
+    """An error found in a document, see get_document_errors(max_errors=...)
+
+    key                 the dotted key of the invalid value, only built when it is read.
+    error               Field.ERROR_IS_REQUIRED, Field.ERROR_TYPE or Field.ERROR_VALUE
+    value               the invalid value, None for Field.ERROR_IS_REQUIRED
+
+    It compares equal to, and unpacks like, the error tuples of get_document_errors.
+    """
+
+    __slots__ = ("_node", "_key", "error", "_value")
+
+    def __init__(self, node, error, value=_NO_VALUE):
+        self._node = node
+        self._key = None
+        self.error = error
+        self._value = value
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = _path_string(self._node)
+        return self._key
+
+    @property
+    def value(self):
+        return None if self._value is _NO_VALUE else self._value
+
+    def as_tuple(self):
+        if self._value is _NO_VALUE:
+            return (self.key, self.error)
+        return (self.key, self.error, self._value)
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __len__(self):
+        return 2 if self._value is _NO_VALUE else 3
+
+    def __getitem__(self, index):
+        return self.as_tuple()[index]
+
+    def __eq__(self, other):
+        if isinstance(other, DocumentError):
+            other = other.as_tuple()
+        return self.as_tuple() == other
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __reduce__(self):
+        if self._value is _NO_VALUE:
+            return (DocumentError, (self._node, self.error))
+        return (DocumentError, (self._node, self.error, self._value))
+
+    def __repr__(self):
+        return "DocumentError%r" % (self.as_tuple(), )
+
+
+class _ValidatorCompiler(object):
+    """Generate the validator of a model for one of the modes (errors, valid, limited)
+
+    fields can be given to only validate some of the fields of the model.
+    """
+
+    SIGNATURES = {
+        "errors" : "document, parent, errors",
+        "valid" : "document",
+        "limited" : "document, parent, errors, limit",
+    }
+
+    def __init__(self, model, mode="errors", fields=None):
+        self.model = model
+        self.mode = mode
+        self.fields = model._fields if fields is None else fields
+        self.lines = []
+        self.namespace = {
+            "_path_string" : _path_string,
+            "_DocumentError" : DocumentError,
+            "_ErrorLimitReached" : _ErrorLimitReached,
+            "_parallel_errors" : _parallel_errors,
+            "_parallel_valid" : _parallel_valid,
+        }
+        self.key = None
+
+    def compile(self):
+        self.emit(0, "def validate(%s):" % self.SIGNATURES[self.mode])
+        self.emit(1, "get = document.get")
+        for key, definition in self.fields.items():
+            self.key = key
+            self.emit(1, "v0 = get(%r)" % (key, ))
+            self.field(definition, "v0", "(parent, %r)" % (key, ), 1, 0)
+        self.emit(1, "return True" if self.mode == "valid" else "pass")
+        return self.build()
+
+    def compile_values(self, definition):
+        """Compile validate(items, ...) that checks the value of each (key, value) of items with definition,
+        the errors are the same as for a field of the model at the path (parent, key)."""
+        self.emit(0, "def validate(%s):" % self.SIGNATURES[self.mode].replace("document", "items"))
+        self.emit(1, "for i0, v1 in items:")
+        self.field(definition, "v1", "(parent, i0)", 2, 1)
+        self.emit(2, "pass")
+        self.emit(1, "return True" if self.mode == "valid" else "pass")
+        return self.build()
+
+    def build(self):
+        source = "\n".join(self.lines)
+        exec(compile(source, "<%s validator %s>" % (self.mode, self.model.__qualname__), "exec"), self.namespace)
+        return self.namespace["validate"]
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def constant(self, value):
+        name = "_c%d" % len(self.namespace)
+        self.namespace[name] = value
+        return name
+
+    def error(self, indent, node, error, value=None):
+        if self.mode == "valid":
+            self.emit(indent, "return False")
+        elif self.mode == "errors":
+            if value is None:
+                self.emit(indent, "errors.append((_path_string(%s), %r))" % (node, error))
+            else:
+                self.emit(indent, "errors.append((_path_string(%s), %r, %s))" % (node, error, value))
+        else:
+            if value is None:
+                self.emit(indent, "errors.append(_DocumentError(%s, %r))" % (node, error))
+            else:
+                self.emit(indent, "errors.append(_DocumentError(%s, %r, %s))" % (node, error, value))
+            self.emit(indent, "if len(errors) >= limit:")
+            self.emit(indent + 1, "raise _ErrorLimitReached()")
+
+    def field(self, definition, value, node, indent, depth):
+        checks = _INLINED_CHECKS.get(getattr(type(definition), "errors", None), False)
+        if checks is False:
+            self.custom_field(definition, value, node, indent)
+            return
+        # the checks for non None values are generated first, so that an empty block can be left out.
+        lines, self.lines = self.lines, []
+        if definition.choices is not None:
+            self.emit(indent + 1, "if %s not in %s:" % (value, self.constant(definition.choices)))
+            self.error(indent + 2, node, Field.ERROR_VALUE, value)
+        if checks is not None:
+            checks(self, definition, value, node, indent + 1, depth)
+        lines, self.lines = self.lines, lines
+
+        if definition.is_required:
+            self.emit(indent, "if %s is None:" % value)
+            self.error(indent + 1, node, Field.ERROR_IS_REQUIRED)
+            if lines:
+                self.emit(indent, "else:")
+        elif lines:
+            self.emit(indent, "if %s is not None:" % value)
+        self.lines.extend(lines)
+
+    def custom_field(self, definition, value, node, indent):
+        definition = self.constant(definition)
+        if self.mode == "valid":
+            # the key is only used to build the errors, which are never read here
+            self.emit(indent, "for _ in %s.errors(%s, %r):" % (definition, value, self.key))
+            self.emit(indent + 1, "return False")
+        elif self.mode == "errors":
+            self.emit(indent, "errors.extend(%s.errors(%s, _path_string(%s)))" % (definition, value, node))
+        else:
+            self.emit(indent, "for e in %s.errors(%s, _path_string(%s)):" % (definition, value, node))
+            self.emit(indent + 1, "errors.append(_DocumentError((None, e[0]), *e[1:]))")
+            self.emit(indent + 1, "if len(errors) >= limit:")
+            self.emit(indent + 2, "raise _ErrorLimitReached()")
+
+    def loop(self, indent, depth, node, value, is_map):
+        """Start a loop over the values of a ListField or MapField, returns the node of the values"""
+        if self.mode == "valid":
+            self.emit(indent, "for v%d in %s%s:" % (depth + 1, value, ".values()" if is_map else ""))
+            return None
+        self.emit(indent, "n%d = %s" % (depth, node))
+        if is_map:
+            self.emit(indent, "for i%d, v%d in %s.items():" % (depth, depth + 1, value))
+        else:
+            self.emit(indent, "for i%d, v%d in enumerate(%s):" % (depth, depth + 1, value))
+        return "(n%d, i%d)" % (depth, depth)
+
+    def typed_checks(self, definition, value, node, indent, depth):
+        self.emit(indent, "if not isinstance(%s, %s):" % (value, self.constant(definition.allowed_type)))
+        self.error(indent + 1, node, Field.ERROR_TYPE, value)
+
+    def number_checks(self, definition, value, node, indent, depth):
+        self.typed_checks(definition, value, node, indent, depth)
+        conditions = []
+        if definition.min is not None:
+            conditions.append("%s < %s" % (value, self.constant(definition.min)))
+        if definition.max is not None:
+            conditions.append("%s > %s" % (value, self.constant(definition.max)))
+        if conditions:
+            self.emit(indent, "if %s:" % " or ".join(conditions))
+            self.error(indent + 1, node, Field.ERROR_VALUE, value)
+
+    def datetime_checks(self, definition, value, node, indent, depth):
+        self.emit(indent, "if not isinstance(%s, %s):" % (value, self.constant(datetime.datetime)))
+        self.error(indent + 1, node, Field.ERROR_TYPE, value)
+
+    def parallel(self, definition, value, node, indent):
+        """Send the values of a ListField or MapField with a parallel_threshold to _parallel_errors
+        if there are enough of them, returns the indent of the serial loop"""
+        if definition.parallel_threshold is None or self.mode == "limited":
+            return indent
+        self.emit(indent, "if len(%s) >= %d:" % (value, definition.parallel_threshold))
+        if self.mode == "valid":
+            self.emit(indent + 1, "if not _parallel_valid(%s, %s):" % (self.constant(definition), value))
+            self.emit(indent + 2, "return False")
+        else:
+            self.emit(indent + 1, "_parallel_errors(%s, %s, %s, errors)" % (self.constant(definition), value, node))
+        self.emit(indent, "else:")
+        return indent + 1
+
+    def list_checks(self, definition, value, node, indent, depth):
+        self.typed_checks(definition, value, node, indent, depth)
+        if definition.inner_type is not None:
+            self.emit(indent, "if isinstance(%s, list):" % value)
+            loop_indent = self.parallel(definition, value, node, indent + 1)
+            inner_node = self.loop(loop_indent, depth, node, value, False)
+            self.field(definition.inner_type, "v%d" % (depth + 1), inner_node, loop_indent + 1, depth + 1)
+            self.emit(loop_indent + 1, "pass")
+
+    def map_checks(self, definition, value, node, indent, depth):
+        self.typed_checks(definition, value, node, indent, depth)
+        self.emit(indent, "if isinstance(%s, dict):" % value)
+        loop_indent = self.parallel(definition, value, node, indent + 1)
+        inner_node = self.loop(loop_indent, depth, node, value, True)
+        self.field(definition.inner_type, "v%d" % (depth + 1), inner_node, loop_indent + 1, depth + 1)
+        self.emit(loop_indent + 1, "pass")
+
+    def defined_dict_checks(self, definition, value, node, indent, depth):
+        self.typed_checks(definition, value, node, indent, depth)
+        self.emit(indent, "if isinstance(%s, dict):" % value)
+        model = self.constant(definition.model)
+        if self.mode == "valid":
+            self.emit(indent + 1, "if not %s._compiled_valid(%s):" % (model, value))
+            self.emit(indent + 2, "return False")
+        elif self.mode == "errors":
+            self.emit(indent + 1, "%s._compiled_errors(%s, %s, errors)" % (model, value, node))
+        else:
+            self.emit(indent + 1, "%s._compiled_limited(%s, %s, errors, limit)" % (model, value, node))
+
+
+# maps the errors method of a field to the checks that replace it, see _ValidatorCompiler.field
+_INLINED_CHECKS = {
+    Field.errors : None,
+    TypedField.errors : _ValidatorCompiler.typed_checks,
+    NumberField.errors : _ValidatorCompiler.number_checks,
+    DateTimeField.errors : _ValidatorCompiler.datetime_checks,
+    ListField.errors : _ValidatorCompiler.list_checks,
+    MapField.errors : _ValidatorCompiler.map_checks,
+    DefinedDictField.errors : _ValidatorCompiler.defined_dict_checks,
+}
+
+#################################### Clean Plans ####################################
+"""
+The cleaning of a model is planned once, the first time it is cleaned (see DefinedDictMetaClass).
+
+The plan is a tuple of (key, step) for each field, where step(document, key, set_default, remove_undefined)
+does what Field.clean of that field would do. The steps of the builtin fields are specialized for the field
+(defaults, ensure_list/ensure_dict, None removal, cleaning of nested models) so that nothing has to be
+looked up again for each document. Fields with their own clean method are cleaned by calling it.
+"""
+
+def _custom_clean_step(definition):
+    def step(document, key, set_default, remove_undefined):
+        definition.clean(document, key, set_default=set_default, remove_undefined=remove_undefined)
+    return step
+
+
+def _default_step(definition):
+    make_default = definition.make_default
+    def step(document, key, set_default, remove_undefined):
+        if key not in document and set_default:
+            document[key] = make_default()
+    return step
+
+
+def _list_step(definition):
+    make_default = definition.make_default
+    ensure_list = definition.ensure_list
+    remove_none_value = definition.remove_none_value
+    threshold = definition.parallel_threshold
+    clean_item = None
+    if isinstance(definition.inner_type, DefinedDictField):
+        clean_item = definition.inner_type.model.clean_document
+    def step(document, key, set_default, remove_undefined):
+        value = document.get(key)
+        if value is None:
+            if set_default and key not in document:
+                value = document[key] = make_default()
+            if value is None and ensure_list:
+                value = document[key] = []
+        if remove_none_value and isinstance(value, list):
+            value = document[key] = [ item for item in value if item is not None ]
+        if clean_item is not None and value:
+            if threshold is not None and isinstance(value, list) and len(value) >= threshold:
+                _parallel_clean(definition, value, set_default, remove_undefined)
+                return
+            for item in value:
+                clean_item(item, set_default=set_default, remove_undefined=remove_undefined)
+    return step
+
+
+def _map_step(definition):
+    make_default = definition.make_default
+    ensure_dict = definition.ensure_dict
+    remove_none_value = definition.remove_none_value
+    threshold = definition.parallel_threshold
+    inner_step = _clean_step(definition.inner_type)
+    if inner_step is _FIELD_CLEAN_STEP:
+        # Field.clean only sets missing keys, there are none when iterating the map.
+        inner_step = None
+    def step(document, key, set_default, remove_undefined):
+        value = document.get(key)
+        if value is None:
+            if set_default and key not in document:
+                value = document[key] = make_default()
+            if value is None:
+                if not ensure_dict:
+                    return
+                value = document[key] = {}
+        if remove_none_value:
+            for k in [ k for k, v in value.items() if v is None ]:
+                value.pop(k)
+        if inner_step is not None:
+            if threshold is not None and len(value) >= threshold:
+                _parallel_clean(definition, value, set_default, remove_undefined)
+                return
+            for k in value.keys():
+                inner_step(value, k, set_default, remove_undefined)
+    return step
+
+
+def _defined_dict_step(definition):
+    make_default = definition.make_default
+    clean_document = definition.model.clean_document
+    def step(document, key, set_default, remove_undefined):
+        value = document.get(key)
+        if value is None and set_default and key not in document:
+            value = document[key] = make_default()
+        if value is not None:
+            clean_document(value, set_default=set_default, remove_undefined=remove_undefined)
+    return step
+
+
+_FIELD_CLEAN_STEP = object()
+
+# maps the clean method of a field to the function that builds its step, see _clean_step
+_CLEAN_STEPS = {
+    Field.clean : _FIELD_CLEAN_STEP,
+    ListField.clean : _list_step,
+    MapField.clean : _map_step,
+    DefinedDictField.clean : _defined_dict_step,
+}
+
+
+def _clean_step(definition):
+    """Return the step that cleans the definition, or _FIELD_CLEAN_STEP if it only sets the default"""
+    builder = _CLEAN_STEPS.get(getattr(type(definition), "clean", None), _custom_clean_step)
+    if builder is _FIELD_CLEAN_STEP:
+        return builder
+    return builder(definition)
+
+
+def _compile_clean_plan(model):
+    plan = []
+    for key, definition in model._fields.items():
+        step = _clean_step(definition)
+        if step is _FIELD_CLEAN_STEP:
+            step = _default_step(definition)
+        plan.append((key, step))
+    return tuple(plan)
+
+#################################### Paths ####################################
+_WHOLE_PATH = None
+
+
+def _child_path(path, key):
+    if path is None:
+        return key if isinstance(key, str) else str(key)
+    return "%s.%s" % (path, key)
+
+
+def _model_path_errors(model, document, parent, tree, errors):
+    """Errors of the paths of tree in the document, in the order of the model fields"""
+    for key, definition in model._fields.items():
+        if key in tree:
+            _field_path_errors(definition, document.get(key), _child_path(parent, key), tree[key], errors)
+
+
+def _field_path_errors(definition, value, key, tree, errors):
+    if tree is _WHOLE_PATH:
+        if type(definition).errors is DefinedDictField.errors:
+            errors.extend(TypedField.errors(definition, value, key))
+            if isinstance(value, dict):
+                definition.model._compiled_errors(value, (None, key), errors)
+        else:
+            errors.extend(definition.errors(value, key))
+        return
+
+    if type(definition).errors in (TypedField.errors, ListField.errors, MapField.errors, DefinedDictField.errors):
+        errors.extend(TypedField.errors(definition, value, key))
+    else:
+        errors.extend(e for e in definition.errors(value, key) if e[0] == key)
+
+    if isinstance(definition, DefinedDictField):
+        if isinstance(value, dict):
+            _model_path_errors(definition.model, value, key, tree, errors)
+    elif isinstance(definition, MapField):
+        if isinstance(value, dict):
+            if len(tree) == 1:
+                items = [ (k, value[k]) for k in tree if k in value ]
+            else:
+                items = [ (k, v) for k, v in value.items() if k in tree ]
+            for k, v in items:
+                _field_path_errors(definition.inner_type, v, _child_path(key, k), tree[k], errors)
+    elif isinstance(definition, ListField):
+        if definition.inner_type is not None and isinstance(value, list):
+            indexes = sorted(int(k) for k in tree if k.isdigit() and str(int(k)) == k)
+            for index in indexes:
+                if index < len(value):
+                    _field_path_errors(definition.inner_type, value[index], _child_path(key, index),
+                                       tree[str(index)], errors)
+
+
+#################################### Records ####################################
+class DefinedRecord(object):
+    """Base class of the record classes generated by DefinedDict.record_class.
+
+    A record stores the fields of a model in __slots__ instead of a dict. DefinedDictField values
+    (also inside a ListField or MapField) are stored as records of their model.
+    """
+    __slots__ = ()
+    _model = None
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (_record_from_dict, (self._model, self.to_dict()))
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__qualname__,
+                           ", ".join("%s=%r" % (key, getattr(self, key)) for key in self.__slots__))
+
+
+def _record_from_dict(model, document):
+    return model.record_class().from_dict(document)
+
+
+class _RecordCompiler(object):
+    """Generate the record class of a model, with from_dict, __init__ and to_dict"""
+
+    def __init__(self, model):
+        self.model = model
+        self.namespace = {
+            "_MISSING" : _NO_VALUE,
+            "_DefinedRecord" : DefinedRecord,
+        }
+
+    def compile(self):
+        fields = self.model._fields
+        for key in fields:
+            # the keys are slots and attributes, and are used in the generated code
+            if (not isinstance(key, str) or not key.isidentifier() or keyword.iskeyword(key) or
+                    (key.startswith("__") and not key.endswith("__"))):
+                raise DictFieldError(message="%r is not a valid attribute name, %s has no record class" % (
+                    key, self.model.__name__))
+            if hasattr(DefinedRecord, key) or key in ("from_dict", "to_dict"):
+                raise DictFieldError(message="%s cannot be stored in a record of %s" % (
+                    key, self.model.__name__))
+
+        load = []
+        for key, definition in fields.items():
+            load.extend(self.load(key, definition))
+        dump = []
+        for key, definition in fields.items():
+            dump.append("        %r : %s," % (key, self.dump(definition, "self.%s" % (key, ))))
+
+        lines = [ "def from_dict(cls, document):", "    self = _new(cls)" ]
+        lines.extend(load)
+        lines.append("    return self")
+        lines.append("def __init__(self, **document):")
+        lines.extend(load or [ "    pass" ])
+        lines.append("def to_dict(self):")
+        lines.append("    return {")
+        lines.extend(dump)
+        lines.append("    }")
+        source = "\n".join(lines)
+        self.namespace["_new"] = object.__new__
+        exec(compile(source, "<record %s>" % (self.model.__qualname__, ), "exec"), self.namespace)
+
+        record = type(self.model.__name__ + "Record", (DefinedRecord, ), {
+            "__slots__" : tuple(fields),
+            "__module__" : self.model.__module__,
+            "__qualname__" : self.model.__qualname__ + "Record",
+            "_model" : self.model,
+            "from_dict" : classmethod(self.namespace["from_dict"]),
+            "__init__" : self.namespace["__init__"],
+            "to_dict" : self.namespace["to_dict"],
+        })
+        return record
+
+    def constant(self, value):
+        name = "_c%d" % len(self.namespace)
+        self.namespace[name] = value
+        return name
+
+    def nested(self, definition):
+        """Name of the record class that values of definition are converted to, if any"""
+        if isinstance(definition, DefinedDictField):
+            return self.constant(definition.model.record_class())
+        return None
+
+    def load(self, key, definition):
+        if (type(definition).make_default is Field.make_default and definition.default is None):
+            yield "    v = document.get(%r)" % (key, )
+        else:
+            yield "    v = document.get(%r, _MISSING)" % (key, )
+            yield "    if v is _MISSING:"
+            yield "        v = %s()" % (self.constant(definition.make_default), )
+
+        record = self.nested(definition)
+        inner = None
+        if record is None and isinstance(definition, (ListField, MapField)):
+            inner = self.nested(definition.inner_type)
+        if record is not None:
+            yield "    if isinstance(v, dict):"
+            yield "        v = %s.from_dict(v)" % (record, )
+        elif inner is not None and isinstance(definition, ListField):
+            yield "    if isinstance(v, list):"
+            yield "        v = [ %s.from_dict(i) if isinstance(i, dict) else i for i in v ]" % (inner, )
+        elif inner is not None:
+            yield "    if isinstance(v, dict):"
+            yield "        v = { k : %s.from_dict(i) if isinstance(i, dict) else i for k, i in v.items() }" % (inner, )
+        yield "    self.%s = v" % (key, )
+
+    def dump(self, definition, value):
+        if isinstance(definition, DefinedDictField):
+            return "%s.to_dict() if isinstance(%s, _DefinedRecord) else %s" % (value, value, value)
+        if isinstance(definition, (ListField, MapField)) and isinstance(definition.inner_type, DefinedDictField):
+            if isinstance(definition, ListField):
+                convert = "[ i.to_dict() if isinstance(i, _DefinedRecord) else i for i in %s ]" % (value, )
+                kind = "list"
+            else:
+                convert = "{ k : i.to_dict() if isinstance(i, _DefinedRecord) else i for k, i in %s.items() }" % (value, )
+                kind = "dict"
+            return "%s if isinstance(%s, %s) else %s" % (convert, value, kind, value)
+        return value
+
+
+#################################### Batches ####################################
+"""
+Helpers for DefinedDict.validate_many and DefinedDict.clean_many.
+
+Documents are read from the iterable in chunks. If there are workers, each chunk is sent to a
+process pool together with the import path of the model ("module:QualifiedName"), which the worker
+imports to run the method on the chunk. At most 2 chunks per worker are in flight, so the iterable is
+never read far ahead of the results, which are yielded in the order of the documents.
+"""
+
+def _model_path(model):
+    if "<locals>" in model.__qualname__:
+        raise DictValueError(message="%s cannot be imported by path, define it at module level" % model.__qualname__)
+    return "%s:%s" % (model.__module__, model.__qualname__)
+
+
+_imported_models = {}
+
+def _import_model(path):
+    model = _imported_models.get(path)
+    if model is None:
+        module, qualname = path.split(":")
+        model = importlib.import_module(module)
+        for name in qualname.split("."):
+            model = getattr(model, name)
+        _imported_models[path] = model
+    return model
+
+
+def _run_chunk(path, method, chunk, kwargs):
+    run = getattr(_import_model(path), method)
+    return [ run(document, **kwargs) for document in chunk ]
+
+
+def _run_many(model, method, documents, kwargs, workers, chunksize):
+    documents = iter(documents)
+    chunk = list(itertools.islice(documents, chunksize))
+    if workers is None or workers <= 1 or len(chunk) < chunksize:
+        # not worth starting processes, run everything here
+        run = getattr(model, method)
+        for document in itertools.chain(chunk, documents):
+            yield run(document, **kwargs)
+        return
+
+    path = _model_path(model)
+    import concurrent.futures
+    executor = concurrent.futures.ProcessPoolExecutor(workers)
+    pending = collections.deque()
+    try:
+        while chunk:
+            pending.append(executor.submit(_run_chunk, path, method, chunk, kwargs))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+            chunk = list(itertools.islice(documents, chunksize))
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+#################################### Parallel ####################################
+"""
+Helpers for the parallel_threshold of ListField and MapField.
+
+The (index or key, value) of a list or map are split into 4 chunks per worker, which are validated or
+cleaned on a pool shared by the fields with the same parallel_executor and parallel_workers. Process
+workers are sent the import path of the model of the values (see _model_path) and a copy of each chunk,
+the cleaned values are copied back into the values of the list or map.
+
+The errors of the chunks are added in the order of the values, the same errors the serial loop of the
+compiled validator adds. If cleaning a value raises, the values of the other chunks may be cleaned already.
+Only the errors and valid validators are parallel, get_document_errors with max_errors is serial.
+"""
+
+_PARALLEL_EXECUTORS = ("process", "thread")
+# { (parallel_executor, workers) : pool }
+_parallel_pools = {}
+
+
+def _set_parallel(field, threshold, workers, executor):
+    if threshold is not None:
+        inner_type = field.inner_type
+        if not (isinstance(inner_type, DefinedDictField) and type(inner_type).errors is DefinedDictField.errors
+                and type(inner_type).clean is DefinedDictField.clean):
+            raise DictFieldError(message="parallel_threshold needs the inner_type to be a DefinedDictField")
+    if executor not in _PARALLEL_EXECUTORS:
+        raise DictFieldError(message="parallel_executor needs to be one of %s" % ", ".join(_PARALLEL_EXECUTORS))
+    field.parallel_threshold = threshold
+    field.parallel_workers = workers
+    field.parallel_executor = executor
+
+
+def _parallel_pool(definition):
+    workers = definition.parallel_workers or os.cpu_count() or 1
+    pool = _parallel_pools.get((definition.parallel_executor, workers))
+    if pool is None:
+        import concurrent.futures
+        if definition.parallel_executor == "process":
+            pool = concurrent.futures.ProcessPoolExecutor(workers)
+        else:
+            pool = concurrent.futures.ThreadPoolExecutor(workers)
+        _parallel_pools[(definition.parallel_executor, workers)] = pool
+    return pool, workers
+
+
+def _parallel_submit(definition, values, function, *args):
+    """Submit function(model, is_required, chunk, *args) for each chunk of values, return [ (chunk, future) ]"""
+    pool, workers = _parallel_pool(definition)
+    items = list(values.items()) if isinstance(values, dict) else list(enumerate(values))
+    size = max(1, -(-len(items) // (workers * 4)))
+    model = definition.inner_type.model
+    if definition.parallel_executor == "process":
+        model = _model_path(model)
+    is_required = definition.inner_type.is_required
+    return [ (chunk, pool.submit(function, model, is_required, chunk, *args))
+             for chunk in (items[i:i + size] for i in range(0, len(items), size)) ]
+
+
+def _parallel_results(submitted):
+    """Yield (chunk, result) in the order of the chunks, the chunks not done are cancelled on error"""
+    try:
+        for chunk, future in submitted:
+            yield chunk, future.result()
+    finally:
+        for chunk, future in submitted:
+            future.cancel()
+
+
+def _chunk_errors(model, is_required, chunk, node):
+    model = _import_model(model) if isinstance(model, str) else model
+    errors = []
+    for index, value in chunk:
+        if value is None:
+            if is_required:
+                errors.append((_path_string((node, index)), Field.ERROR_IS_REQUIRED))
+        elif not isinstance(value, dict):
+            errors.append((_path_string((node, index)), Field.ERROR_TYPE, value))
+        else:
+            model._compiled_errors(value, (node, index), errors)
+    return errors
+
+
+def _chunk_valid(model, is_required, chunk):
+    model = _import_model(model) if isinstance(model, str) else model
+    for index, value in chunk:
+        if value is None:
+            if is_required:
+                return False
+        elif not isinstance(value, dict) or not model._compiled_valid(value):
+            return False
+    return True
+
+
+def _chunk_clean(model, is_required, chunk, set_default, remove_undefined):
+    model = _import_model(model) if isinstance(model, str) else model
+    return [ model.clean_document(value, set_default=set_default, remove_undefined=remove_undefined)
+             for index, value in chunk ]
+
+
+def _parallel_errors(definition, values, node, errors):
+    for chunk, chunk_errors in _parallel_results(_parallel_submit(definition, values, _chunk_errors, node)):
+        errors.extend(chunk_errors)
+
+
+def _parallel_valid(definition, values):
+    for chunk, valid in _parallel_results(_parallel_submit(definition, values, _chunk_valid)):
+        if not valid:
+            return False
+    return True
+
+
+def _parallel_clean(definition, values, set_default, remove_undefined):
+    submitted = _parallel_submit(definition, values, _chunk_clean, set_default, remove_undefined)
+    for chunk, cleaned in _parallel_results(submitted):
+        for (index, value), new_value in zip(chunk, cleaned):
+            if new_value is value:
+                continue
+            if isinstance(value, dict):
+                # keep the dict of the value, as cleaning it here would
+                value.clear()
+                value.update(new_value)
+            else:
+                values[index] = new_value
+
 #################################### Documents ####################################
+class LazyClassAttribute(object):
+    """Class attribute built by build(cls) the first time it is read, on the class or on a subclass, which
+    then replaces it on that class. Used by the models for what is expensive to build and not always used
+    (compiled validators, codecs), so that creating the class stays cheap.
+
+        cls._codec = LazyClassAttribute("_codec", _build_codec)
+
+    build may return a staticmethod or a classmethod, it is stored as it is and read back.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+
+    def __get__(self, instance, owner):
+        setattr(owner, self.name, self.build(owner))
+        return getattr(owner, self.name)
+
+
+def _replan(models):
+    """Plan again the cleaning of the models with fields of models, so that their steps call the current
+    clean_document of these models (see _compile_clean_plan). Used by the extensions that replace it."""
+    pending = list(DefinedDict.__subclasses__())
+    while pending:
+        other = pending.pop()
+        pending.extend(other.__subclasses__())
+        if isinstance(other.__dict__.get("_clean_plan"), LazyClassAttribute):
+            # not planned yet, it will use the current clean_document when it is
+            continue
+        if any(_uses_model(definition, models) for definition in other._fields.values()):
+            other._clean_plan = _compile_clean_plan(other)
+
+
+def _uses_model(definition, models):
+    if isinstance(definition, DefinedDictField):
+        return definition.model in models
+    inner_type = getattr(definition, "inner_type", None)
+    return inner_type is not None and _uses_model(inner_type, models)
+
+
+def _compiled_validator(mode):
+    def build(cls):
+        return staticmethod(_ValidatorCompiler(cls, mode).compile())
+    return build
+
+
 class DefinedDictMetaClass(type):
 
     def __init__(cls, name, bases, cdict):
@@ -407,15 +1287,23 @@ class DefinedDictMetaClass(type):
             if hasattr(base, "_fields"):
                 cls._fields.update(base._fields)
         cls._fields.update({ k : v for k, v in cdict.items() if isinstance(v, Field) })
-        # stores all mixin in _mixins, and also retrieve all mixin from parent.
+        # stores all mixin in _mixins, and also retrieve all mixin from parent. The models in bases are
+        # also subclasses of their mixins, only their _mixins are looked at, and each mixin is applied once.
         for base in bases:
-            if issubclass(base, Mixin):
-                base._apply_mixin(cls, name, bases, cdict)
-                cls._mixins.append(base)
-            if hasattr(base, "_mixins"):
-                for m in base._mixins:
+            mixins = base._mixins if isinstance(base, DefinedDictMetaClass) else [ base ]
+            for m in mixins:
+                if issubclass(m, Mixin) and m not in cls._mixins:
                     m._apply_mixin(cls, name, bases, cdict)
                     cls._mixins.append(m)
+        # the validators are compiled when they are first used, see _ValidatorCompiler
+        cls._compiled_errors = LazyClassAttribute("_compiled_errors", _compiled_validator("errors"))
+        cls._compiled_valid = LazyClassAttribute("_compiled_valid", _compiled_validator("valid"))
+        cls._compiled_limited = LazyClassAttribute("_compiled_limited", _compiled_validator("limited"))
+        # the cleaning is planned when it is first used, see _compile_clean_plan
+        cls._field_keys = frozenset(cls._fields)
+        cls._clean_plan = LazyClassAttribute("_clean_plan", _compile_clean_plan)
+        # the record class is only generated when asked for, see record_class
+        cls._record_class = None
 
 
 class DefinedDict(object, metaclass=DefinedDictMetaClass):
@@ -431,16 +1319,68 @@ class DefinedDict(object, metaclass=DefinedDictMetaClass):
             yield from definition.errors(value, with_key=key_string)
 
     @classmethod
-    def get_document_errors(cls, document):
-        return list(cls._yield_errors(document))
+    def get_document_errors(cls, document, max_errors=None):
+        """Return the errors of the document as (key, error[, value]) tuples.
+
+        max_errors          if provided, stop after max_errors errors and return them as DocumentError,
+                            whose key is only built when it is read.
+        """
+        errors = []
+        if max_errors is None:
+            cls._compiled_errors(document, None, errors)
+        elif max_errors > 0:
+            try:
+                cls._compiled_limited(document, None, errors, max_errors)
+            except _ErrorLimitReached:
+                pass
+        return errors
 
     @classmethod
     def is_document_valid(cls, document):
-        try:
-            next(cls._yield_errors(document))
-            return False
-        except StopIteration:
-            return True
+        return cls._compiled_valid(document)
+
+    @classmethod
+    def validate_many(cls, documents, workers=None, chunksize=1000, **kwargs):
+        """Yield get_document_errors(document, **kwargs) for each document, in the same order.
+
+        documents           any iterable, it is consumed lazily.
+        workers             number of processes to validate with. If None, or if there are less than
+                            chunksize documents, the documents are validated in this process.
+        chunksize           number of documents sent to a worker at once.
+
+        The model must be importable from its module to be validated by the workers.
+        """
+        return _run_many(cls, "get_document_errors", documents, kwargs, workers, chunksize)
+
+    @classmethod
+    def clean_many(cls, documents, workers=None, chunksize=1000, **kwargs):
+        """Yield clean_document(document, **kwargs) for each document, in the same order.
+
+        See validate_many for the arguments.
+        The documents cleaned by the workers are copies, the documents passed in are not modified.
+        """
+        return _run_many(cls, "clean_document", documents, kwargs, workers, chunksize)
+
+    @classmethod
+    def _check_document(cls, document, clean=True):
+        """Clean and validate a document, see process_json_lines"""
+        if clean:
+            cls.clean_document(document)
+        return (document, cls.get_document_errors(document))
+
+    @classmethod
+    def record_class(cls):
+        """Return the record class of this model, a DefinedRecord with a slot for each field.
+
+            record = User.record_class().from_dict(document)    # missing keys get their make_default
+            document = record.to_dict()
+
+        Records take much less memory than dicts. Undefined keys are dropped.
+        Raise DictFieldError if a key cannot be an attribute ("class", "first-name", ...).
+        """
+        if cls._record_class is None:
+            cls._record_class = _RecordCompiler(cls).compile()
+        return cls._record_class
 
     @classmethod
     def make_default(cls):
@@ -450,21 +1390,204 @@ class DefinedDict(object, metaclass=DefinedDictMetaClass):
     def clean_document(cls, document, set_default=True, remove_undefined=True):
         if document is None:
             return document
-        for key, definition in cls._fields.items():
-            definition.clean(document, key, set_default=set_default, remove_undefined=remove_undefined)
+        for key, step in cls._clean_plan:
+            step(document, key, set_default, remove_undefined)
 
         if remove_undefined:
-            for key in set(document.keys()) - set(cls._fields.keys()) : # remove all the undefined keys
+            field_keys = cls._field_keys
+            for key in [ key for key in document if key not in field_keys ]: # remove all the undefined keys
                 document.pop(key)
         return document
 
     @classmethod
-    def update(cls, document, new_value):
+    def update(cls, document, new_value, changed=None, parent=None):
         """
         Recursively update the dictionary
+
+        changed             if provided, a set that the dotted path of every modified value is added to.
+                            The set is returned, and can be passed to get_errors_for_paths.
+                            Fields that override update need to accept the changed and path keywords.
+        parent              the dotted path of the document, used with changed.
         """
         for key, value in new_value.items():
             if key in cls._fields:
                 definition = cls._fields.get(key)
-                definition.update(document, key, value)
+                if changed is None:
+                    definition.update(document, key, value)
+                else:
+                    definition.update(document, key, value, changed=changed, path=_child_path(parent, key))
+        return changed
 
+    @classmethod
+    def get_errors_for_paths(cls, document, paths):
+        """Return the errors of the values at the dotted paths, and of their descendants.
+
+        The fields on the way to each path are checked too (is_required, type, ...), but not their
+        other values. The result is get_document_errors(document) restricted to these keys, in the
+        same order.
+
+            changed = Model.update(document, patch, changed=set())
+            errors = Model.get_errors_for_paths(document, changed)
+        """
+        tree = {}
+        for path in paths:
+            node = tree
+            parts = path.split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if node is _WHOLE_PATH:
+                    break
+            else:
+                node[parts[-1]] = _WHOLE_PATH
+        errors = []
+        _model_path_errors(cls, document, None, tree, errors)
+        return errors
+
+#################################### JSON Lines ####################################
+def _count_field_errors(counter, errors):
+    """Count the (key, error) of errors in counter, list indexes in the key are replaced with *"""
+    for error in errors:
+        key = ".".join("*" if part.isdigit() else part for part in error[0].split("."))
+        counter[(key, error[1])] += 1
+
+
+class PipelineStats(object):
+    """Counters of process_json_lines
+
+    documents           number of documents read
+    accepted            number of documents written to the output
+    rejected            number of documents written to the rejected output, including invalid json
+    invalid_json        number of lines that are not a json object
+    bytes               number of bytes (or characters for text input) read
+    field_errors        Counter of (key, error), list indexes in the key are replaced with *
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid_json = 0
+        self.bytes = 0
+        self.field_errors = collections.Counter()
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def documents_per_second(self):
+        return self.documents / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add_errors(self, errors):
+        _count_field_errors(self.field_errors, errors)
+
+    def as_dict(self):
+        return {
+            "documents" : self.documents,
+            "accepted" : self.accepted,
+            "rejected" : self.rejected,
+            "invalid_json" : self.invalid_json,
+            "bytes" : self.bytes,
+            "elapsed" : self.elapsed,
+            "documents_per_second" : self.documents_per_second,
+            "bytes_per_second" : self.bytes_per_second,
+            "field_errors" : { "%s:%s" % key : count for key, count in self.field_errors.items() },
+        }
+
+
+def _read_json_lines(source, rejected, stats, numbers):
+    """Yield the json objects of source and append their line number to numbers.
+
+    Invalid lines are written to rejected.
+    """
+    for number, line in enumerate(source, 1):
+        stats.bytes += len(line)
+        if not line.strip():
+            continue
+        try:
+            document = json.loads(line)
+            if not isinstance(document, dict):
+                raise ValueError("not a json object")
+        except ValueError as e:
+            stats.invalid_json += 1
+            stats.rejected += 1
+            if rejected is not None:
+                _write_json_line(rejected, { "line" : number, "errors" : [ [ None, "json", str(e) ] ] })
+            continue
+        stats.documents += 1
+        numbers.append(number)
+        yield document
+
+
+def _write_json_line(sink, document):
+    sink.write(json.dumps(document, default=str))
+    sink.write("\n")
+
+
+def process_json_lines(model, source, output=None, rejected=None, clean=True, batch_size=1000, workers=None, stats=None):
+    """Clean and validate newline delimited json documents with model.
+
+    source              iterable of lines (a file opened in text or binary mode)
+    output              file like object, documents without errors are written to it as json lines
+    rejected            file like object, documents with errors are written to it as { "line", "document", "errors" }
+    clean               clean the documents with clean_document before validating them
+    batch_size          number of documents processed at once (by a worker if workers is set, see validate_many)
+    workers             number of processes to use, see validate_many
+    stats               PipelineStats to update
+
+    Documents are streamed from source to the outputs, at most a few batches are held in memory.
+    Return the PipelineStats.
+    """
+    stats = stats or PipelineStats()
+    numbers = collections.deque()
+    documents = _read_json_lines(source, rejected, stats, numbers)
+    for document, errors in _run_many(model, "_check_document", documents, { "clean" : clean }, workers, batch_size):
+        number = numbers.popleft()
+        if errors:
+            stats.rejected += 1
+            stats.add_errors(errors)
+            if rejected is not None:
+                _write_json_line(rejected, { "line" : number, "document" : document, "errors" : errors })
+        else:
+            stats.accepted += 1
+            if output is not None:
+                _write_json_line(output, document)
+    return stats
+
+
+def main(argv=None):
+    """python -m dict_model module:Model [input] [-o output] [-r rejected]"""
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m dict_model", description="Clean and validate json lines with a model")
+    parser.add_argument("model", help="import path of the model, module:Model")
+    parser.add_argument("input", nargs="?", help="json lines file to read (default: stdin)")
+    parser.add_argument("-o", "--output", help="file for the valid documents (default: stdout)")
+    parser.add_argument("-r", "--rejected", help="file for the rejected documents")
+    parser.add_argument("--no-clean", action="store_true", help="do not clean the documents before validating them")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    model = _import_model(args.model)
+    source = open(args.input, "rb") if args.input else sys.stdin.buffer
+    output = open(args.output, "w") if args.output else sys.stdout
+    rejected = open(args.rejected, "w") if args.rejected else None
+    try:
+        stats = process_json_lines(model, source, output, rejected, clean=not args.no_clean,
+                batch_size=args.batch_size, workers=args.workers)
+    finally:
+        for f in (source, output, rejected):
+            if f is not None and f not in (sys.stdin.buffer, sys.stdout):
+                f.close()
+    json.dump(stats.as_dict(), sys.stderr, indent=4, sort_keys=True)
+    sys.stderr.write("\n")
+    return 1 if stats.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
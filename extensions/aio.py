@@ -0,0 +1,362 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+asyncio plugin
+
+AsyncMixin adds coroutine versions of get_document_errors, clean_document and update, which give control back
+to the event loop while they walk a large document:
+
+    errors = await User.aget_document_errors(document)
+    await User.aclean_document(document)
+    changed = await User.aupdate(document, patch, changed=set())
+
+They return the same results and modify the document the same way as the methods they are named after.
+The values of lists and maps, and the nested models with lists, maps or other such models in them, are walked
+one value at a time. Every `every` values, or once `interval` seconds passed, the loop is given control
+(await asyncio.sleep(0)). The other fields are checked and cleaned by the compiled validators and clean plan,
+a value (or a chunk of `every` values of a list or map) at a time.
+
+offload_threshold   if provided, documents of at least this size (see document_size) are given to the
+                    synchronous method on executor (loop.run_in_executor, None for the default executor)
+                    instead. The loop still has to share the GIL with the executor thread.
+
+The document (and the patch) must not be modified by other tasks until the coroutine is done.
+max_errors is not supported.
+"""
+
+import asyncio
+import functools
+import itertools
+import time
+from ..dict_model import *
+from ..dict_model import _ValidatorCompiler, _child_path, _clean_step, _FIELD_CLEAN_STEP, _path_string
+
+ASYNC_YIELD_EVERY = 1000
+ASYNC_YIELD_INTERVAL = 0.001
+
+
+class AsyncMixin(Mixin):
+
+    @classmethod
+    async def aget_document_errors(cls, document, every=ASYNC_YIELD_EVERY, interval=ASYNC_YIELD_INTERVAL,
+                                   offload_threshold=None, executor=None):
+        if offload_threshold is not None and document_size(document) >= offload_threshold:
+            return await asyncio.get_running_loop().run_in_executor(executor, cls.get_document_errors, document)
+        errors = []
+        await _model_errors(cls, document, None, errors, _Pacer(every, interval))
+        return errors
+
+    @classmethod
+    async def aclean_document(cls, document, set_default=True, remove_undefined=True, every=ASYNC_YIELD_EVERY,
+                              interval=ASYNC_YIELD_INTERVAL, offload_threshold=None, executor=None):
+        if offload_threshold is not None and document_size(document) >= offload_threshold:
+            clean = functools.partial(cls.clean_document, document, set_default=set_default,
+                                      remove_undefined=remove_undefined)
+            return await asyncio.get_running_loop().run_in_executor(executor, clean)
+        await _clean_model(cls, document, set_default, remove_undefined, _Pacer(every, interval))
+        return document
+
+    @classmethod
+    async def aupdate(cls, document, new_value, changed=None, parent=None, every=ASYNC_YIELD_EVERY,
+                      interval=ASYNC_YIELD_INTERVAL, offload_threshold=None, executor=None):
+        if offload_threshold is not None and document_size(new_value) >= offload_threshold:
+            update = functools.partial(cls.update, document, new_value, changed=changed, parent=parent)
+            return await asyncio.get_running_loop().run_in_executor(executor, update)
+        await _update_model(cls, document, new_value, changed, parent, _Pacer(every, interval))
+        return changed
+
+
+def document_size(document):
+    """Return the number of keys of the document and of the values of its lists and dicts, not counting
+    the values nested deeper"""
+    if not isinstance(document, dict):
+        return 0
+    return len(document) + sum(len(value) for value in document.values() if isinstance(value, (list, dict)))
+
+
+# the clock is read every _CLOCK_EVERY values walked
+_CLOCK_EVERY = 32
+
+
+class _Pacer(object):
+    """Decides when the loop is given control"""
+
+    def __init__(self, every, interval):
+        self.every = every
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.check = min(self.every, _CLOCK_EVERY)
+        self.deadline = time.perf_counter() + self.interval
+
+    def tick(self, count=1):
+        """Count values walked, return True if the loop should be given control"""
+        self.count += count
+        if self.count < self.check:
+            return False
+        if self.count >= self.every or time.perf_counter() >= self.deadline:
+            return True
+        self.check = min(self.every, self.count + _CLOCK_EVERY)
+        return False
+
+    async def pause(self):
+        await asyncio.sleep(0)
+        self.reset()
+
+#################################### Validation ####################################
+def _walked(definition):
+    """Return True if the values of definition are walked instead of validated at once"""
+    method = type(definition).errors
+    if method is DefinedDictField.errors:
+        return not _is_flat(definition.model)
+    if method is ListField.errors:
+        return definition.inner_type is not None
+    return method is MapField.errors
+
+
+@functools.lru_cache(maxsize=None)
+def _errors_plan(model):
+    """Return [ (key, definition) ] of the walked fields, and (None, validate(document, parent, errors))
+    for each run of the other fields"""
+    plan = []
+    fields = {}
+    for key, definition in model._fields.items():
+        if _walked(definition):
+            if fields:
+                plan.append((None, _ValidatorCompiler(model, "errors", fields).compile()))
+                fields = {}
+            plan.append((key, definition))
+        else:
+            fields[key] = definition
+    if fields:
+        plan.append((None, _ValidatorCompiler(model, "errors", fields).compile()))
+    return tuple(plan)
+
+
+def _is_flat(model):
+    return all(key is None for key, entry in _errors_plan(model))
+
+
+@functools.lru_cache(maxsize=None)
+def _values_validator(definition):
+    return _ValidatorCompiler(DefinedDict, "errors", {}).compile_values(definition)
+
+
+async def _model_errors(model, document, parent, errors, pacer):
+    get = document.get
+    for key, entry in _errors_plan(model):
+        if key is None:
+            entry(document, parent, errors)
+        else:
+            await _value_errors(entry, get(key), (parent, key), errors, pacer)
+        if pacer.tick():
+            await pacer.pause()
+
+
+async def _value_errors(definition, value, node, errors, pacer):
+    method = type(definition).errors
+    if method is DefinedDictField.errors and isinstance(value, dict):
+        await _model_errors(definition.model, value, node, errors, pacer)
+        return
+    if method is ListField.errors and isinstance(value, list):
+        items = enumerate(value)
+    elif method is MapField.errors and isinstance(value, dict):
+        items = iter(value.items())
+    else:
+        _values_validator(definition)(((node[1], value), ), node[0], errors)
+        return
+    # the checks of the list or map itself, its values are checked below
+    errors.extend(TypedField.errors(definition, value, _path_string(node)))
+    inner_type = definition.inner_type
+    if _walked(inner_type):
+        for index, inner in items:
+            await _value_errors(inner_type, inner, (node, index), errors, pacer)
+            if pacer.tick():
+                await pacer.pause()
+    else:
+        validate = _values_validator(inner_type)
+        while True:
+            chunk = list(itertools.islice(items, pacer.every))
+            if not chunk:
+                break
+            validate(chunk, node, errors)
+            if pacer.tick(len(chunk)):
+                await pacer.pause()
+
+#################################### Cleaning ####################################
+def _clean_walked(definition):
+    """Return True if the values of definition are cleaned one by one instead of by its clean step"""
+    method = type(definition).clean
+    if method is DefinedDictField.clean:
+        return not _clean_is_flat(definition.model)
+    if method is ListField.clean:
+        return isinstance(definition.inner_type, DefinedDictField)
+    return method is MapField.clean and _inner_step(definition) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _clean_is_flat(model):
+    return not any(_clean_walked(definition) for definition in model._fields.values())
+
+
+@functools.lru_cache(maxsize=None)
+def _inner_step(definition):
+    """Return the clean step of the values of a MapField, None if there is nothing to clean"""
+    step = _clean_step(definition.inner_type)
+    return None if step is _FIELD_CLEAN_STEP else step
+
+
+def _is_async_model(model, method):
+    """Return True if the method of model is the one of DefinedDict, which can be walked here"""
+    return getattr(model, method).__func__ is getattr(DefinedDict, method).__func__
+
+
+async def _clean_model(model, document, set_default, remove_undefined, pacer):
+    if not isinstance(document, dict) or _clean_is_flat(model) or not _is_async_model(model, "clean_document"):
+        model.clean_document(document, set_default=set_default, remove_undefined=remove_undefined)
+        return
+    fields = model._fields
+    for key, step in model._clean_plan:
+        definition = fields[key]
+        if _clean_walked(definition):
+            await _clean_field(definition, document, key, step, set_default, remove_undefined, pacer)
+        else:
+            step(document, key, set_default, remove_undefined)
+        if pacer.tick():
+            await pacer.pause()
+
+    if remove_undefined:
+        field_keys = model._field_keys
+        for key in [ key for key in document if key not in field_keys ]:
+            document.pop(key)
+
+
+async def _clean_field(definition, document, key, step, set_default, remove_undefined, pacer):
+    """Do what the clean step of definition does to document[key], see _defined_dict_step, _list_step and
+    _map_step"""
+    method = type(definition).clean
+    value = document.get(key)
+    if method is DefinedDictField.clean:
+        if value is None and set_default and key not in document:
+            value = document[key] = definition.make_default()
+        if value is not None:
+            await _clean_model(definition.model, value, set_default, remove_undefined, pacer)
+
+    elif method is ListField.clean:
+        if value is None:
+            if set_default and key not in document:
+                value = document[key] = definition.make_default()
+            if value is None and definition.ensure_list:
+                value = document[key] = []
+        if definition.remove_none_value and isinstance(value, list):
+            value = document[key] = [ item for item in value if item is not None ]
+        if value:
+            model = definition.inner_type.model
+            walk = not _clean_is_flat(model) and _is_async_model(model, "clean_document")
+            clean_document = model.clean_document
+            for item in value:
+                if walk and isinstance(item, dict):
+                    await _clean_model(model, item, set_default, remove_undefined, pacer)
+                else:
+                    clean_document(item, set_default=set_default, remove_undefined=remove_undefined)
+                if pacer.tick():
+                    await pacer.pause()
+
+    else:
+        if value is None:
+            if set_default and key not in document:
+                value = document[key] = definition.make_default()
+            if value is None:
+                if not definition.ensure_dict:
+                    return
+                value = document[key] = {}
+        if definition.remove_none_value:
+            for k in [ k for k, v in value.items() if v is None ]:
+                value.pop(k)
+        inner_type = definition.inner_type
+        inner_step = _inner_step(definition)
+        walked = _clean_walked(inner_type)
+        for k in list(value.keys()):
+            if walked:
+                await _clean_field(inner_type, value, k, inner_step, set_default, remove_undefined, pacer)
+            else:
+                inner_step(value, k, set_default, remove_undefined)
+            if pacer.tick():
+                await pacer.pause()
+
+#################################### Update ####################################
+async def _update_model(model, document, new_value, changed, parent, pacer):
+    if not _is_async_model(model, "update"):
+        if changed is None:
+            model.update(document, new_value)
+        else:
+            model.update(document, new_value, changed=changed, parent=parent)
+        return
+    for key, value in new_value.items():
+        if key in model._fields:
+            definition = model._fields.get(key)
+            path = None if changed is None else _child_path(parent, key)
+            await _update_field(definition, document, key, value, changed, path, pacer)
+            if pacer.tick():
+                await pacer.pause()
+
+
+async def _update_field(definition, document, key, value, changed, path, pacer):
+    """Do what definition.update does, see DefinedDictField.update and MapField.update"""
+    method = type(definition).update
+    if method is DefinedDictField.update and isinstance(value, dict) and document.get(key) is not None:
+        await _update_model(definition.model, document[key], value, changed, path, pacer)
+
+    elif method is MapField.update and isinstance(value, dict):
+        if document.get(key) is None:
+            document[key] = {}
+            if changed is not None:
+                changed.add(path)
+        inner_type = definition.inner_type
+        defined_dict = isinstance(inner_type, DefinedDictField)
+        for k, v in value.items():
+            child = None if changed is None else _child_path(path, k)
+            values = document[key]
+            if defined_dict:
+                if values.get(k) is None or v is None:
+                    values[k] = v
+                    if changed is not None:
+                        changed.add(child)
+                else:
+                    await _update_model(inner_type.model, values[k], v, changed, child, pacer)
+            elif values.get(k) is None:
+                values[k] = v
+                if changed is not None:
+                    changed.add(child)
+            elif changed is None:
+                inner_type.update(values, k, v)
+            else:
+                inner_type.update(values, k, v, changed=changed, path=child)
+            if pacer.tick():
+                await pacer.pause()
+
+    elif changed is None:
+        definition.update(document, key, value)
+    else:
+        definition.update(document, key, value, changed=changed, path=path)
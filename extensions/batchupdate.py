@@ -0,0 +1,336 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+batch update plugin
+
+Coalesce a stream of (document_id, patch) and apply the patches of each document with model.update, with one
+load and one write per document and flush:
+
+    def write(document_id, document, changed):     # changed : the dotted paths changed, see DefinedDict.update
+        ...
+
+    with BatchUpdater(User, load=users.get, write=write) as updater:
+        for document_id, patch in events:
+            updater.add(document_id, patch)
+    updater.stats.as_dict()
+
+The patches of a document are merged as they are added, with the semantics of DefinedDict.update and of the
+update of the fields : the last value wins for the fields that are replaced (ints given to a FloatField are
+converted), DictField values are merged with dict.update, DefinedDictField values and MapField entries are
+merged key by key. Applying the merged patch gives the document that applying the patches one after the other
+gives. When that depends on the document (a MapField entry of a DefinedDictField set to None then updated,
+an int for a FloatField that is only converted if its MapField entry is not empty, ...) or when a field has
+its own update, the patch starts a new round : the rounds of a document are applied in order, with a single
+load and write.
+
+The pending patches are flushed
+
+    when flush_size patches are pending
+    when the oldest pending patch is flush_window seconds old, this is checked by add and poll
+    by flush, and at the end of the with block
+
+The documents are loaded, updated and written in the order of their first pending patch. If load returns None
+the patches of the document are dropped and counted as missing. If load, update or write raise, the flush stops
+and the patches of that document and of the following ones stay pending, the next flush loads the document again
+and applies all of them : load should then return the document as it was stored, not the one that was updated.
+
+Patches that model.update raises on (a DefinedDictField holding a value that is not a dict, ...) are not
+supported, merged with other patches they may not raise.
+"""
+
+import time
+from ..dict_model import *
+
+_CONFLICT = object()
+_UNCHANGED = object()
+_REPLACE, _FLOAT, _DICT, _MODEL, _MAP = range(5)
+# the builtin updates, the fields with their own update are not merged
+_KINDS = {
+    Field.update : _REPLACE,
+    FloatField.update : _FLOAT,
+    DictField.update : _DICT,
+    DefinedDictField.update : _MODEL,
+    MapField.update : _MAP,
+}
+
+
+class BatchStats(object):
+    """Counters of a BatchUpdater
+
+    patches             number of patches added
+    merged              number of patches merged into a pending patch of the same document
+    rounds              number of merged patches applied with model.update
+    documents           number of documents written
+    missing             number of documents that load did not find
+    flushes             number of flushes with pending patches
+    """
+
+    def __init__(self):
+        self.patches = 0
+        self.merged = 0
+        self.rounds = 0
+        self.documents = 0
+        self.missing = 0
+        self.flushes = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def patches_per_second(self):
+        return self.patches / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def documents_per_second(self):
+        return self.documents / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "patches" : self.patches,
+            "merged" : self.merged,
+            "rounds" : self.rounds,
+            "documents" : self.documents,
+            "missing" : self.missing,
+            "flushes" : self.flushes,
+            "elapsed" : self.elapsed,
+            "patches_per_second" : self.patches_per_second,
+            "documents_per_second" : self.documents_per_second,
+        }
+
+
+class BatchUpdater(object):
+    """Merge the patches of the documents of model and apply them in batches.
+
+    load                load(document_id), return the document to update or None
+    write               write(document_id, document, changed), called once per document and flush (optional)
+    flush_size          flush when this many patches are pending, None to only flush on time or by flush
+    flush_window        flush when the oldest pending patch is this many seconds old, None to not flush on time
+    stats               BatchStats to update
+    """
+
+    def __init__(self, model, load, write=None, flush_size=1000, flush_window=1.0, stats=None):
+        self.model = model
+        self.load = load
+        self.write = write
+        self.flush_size = flush_size
+        self.flush_window = flush_window
+        self.stats = stats or BatchStats()
+        # { document_id : (number of patches, [ patch, ... ]) } the rounds of each document, the patches are
+        # copies merged in place
+        self._pending = {}
+        self._count = 0
+        self._oldest = None
+
+    def __len__(self):
+        """Number of pending patches"""
+        return self._count
+
+    def add(self, document_id, patch):
+        """Add a patch of the document, and flush if flush_size or flush_window is reached"""
+        if not isinstance(patch, dict):
+            raise DictValueError(message="patch needs to be a dict, not %s" % type(patch).__name__)
+        self.stats.patches += 1
+        pending = self._pending.get(document_id)
+        if pending is None:
+            self._pending[document_id] = (1, [ _copy_patch(self.model, patch) ])
+        else:
+            count, rounds = pending
+            if _merge_into(self.model, rounds[-1], patch):
+                self.stats.merged += 1
+            else:
+                rounds.append(_copy_patch(self.model, patch))
+            self._pending[document_id] = (count + 1, rounds)
+        self._count += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if self.flush_size is not None and self._count >= self.flush_size:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self):
+        """Flush if the oldest pending patch is flush_window seconds old, return the number of documents written"""
+        if (self._oldest is not None and self.flush_window is not None and
+                time.monotonic() - self._oldest >= self.flush_window):
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Apply the pending patches and write the documents, return the number of documents written"""
+        pending = self._pending
+        if not pending:
+            return 0
+        stats = self.stats
+        stats.flushes += 1
+        written = 0
+        while pending:
+            document_id = next(iter(pending))
+            count, rounds = pending[document_id]
+            document = self.load(document_id)
+            if document is None:
+                stats.missing += 1
+            else:
+                changed = set()
+                for patch in rounds:
+                    self.model.update(document, patch, changed=changed)
+                if self.write is not None:
+                    self.write(document_id, document, changed)
+                stats.rounds += len(rounds)
+                stats.documents += 1
+                written += 1
+            # only dropped once written, the patches stay pending if anything above raises
+            del pending[document_id]
+            self._count -= count
+        self._oldest = None
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.flush()
+
+
+def _copy_patch(model, patch):
+    """The patch without the keys that update ignores, it is merged into in place"""
+    fields = model._fields
+    return { key : value for key, value in patch.items() if key in fields }
+
+
+def _merge_into(model, merged, patch):
+    """Merge patch into the pending patch merged, return False (and leave merged as it is) if they cannot be merged"""
+    fields = model._fields
+    values = {}
+    for key, value in patch.items():
+        definition = fields.get(key)
+        if definition is None:
+            continue
+        if key in merged:
+            value = _merge_value(definition, merged[key], value, False)
+            if value is _CONFLICT:
+                return False
+        values[key] = value
+    merged.update(values)
+    return True
+
+
+def _merge_patch(model, a, b):
+    """Merge the patches a and b of an embedded document, a can also be the document (see _merge_value)"""
+    fields = model._fields
+    merged = dict(a)
+    for key, value in b.items():
+        definition = fields.get(key)
+        if definition is None:
+            continue
+        if key in a:
+            value = _merge_value(definition, a[key], value, True)
+        else:
+            value = _stored(definition, value)
+            if value is _UNCHANGED:
+                continue
+        if value is _CONFLICT:
+            return _CONFLICT
+        merged[key] = value
+    return merged
+
+
+def _stored(definition, value):
+    """The value that definition.update stores for a missing key"""
+    kind = _KINDS.get(type(definition).update)
+    if kind is _REPLACE:
+        return value
+    if kind is _FLOAT:
+        return float(value) if isinstance(value, int) else value
+    if kind is None:
+        return _CONFLICT
+    if not isinstance(value, dict):
+        return _UNCHANGED
+    return dict(value) if kind is _MAP else value
+
+
+def _merge_value(definition, a, b, stored):
+    """Return the value that updating the field with a then b is the same as updating it with, or _CONFLICT.
+
+    stored              a can also be stored in the document as it is (a DefinedDictField that was None is set to
+                        its patch), the merged value must then also be what updating a with b stores.
+    """
+    kind = _KINDS.get(type(definition).update)
+    if kind is _REPLACE:
+        return b
+    if kind is _FLOAT:
+        return float(b) if isinstance(b, int) else b
+    if kind is None:
+        return _CONFLICT
+    # dicts, models and maps are not changed by a value that is not a dict
+    if not isinstance(b, dict):
+        return a
+    if not isinstance(a, dict):
+        return b if a is None or not stored else _CONFLICT
+    if kind is _DICT:
+        merged = dict(a)
+        merged.update(b)
+        return merged
+    if kind is _MODEL:
+        return _merge_patch(definition.model, a, b)
+    inner_type = definition.inner_type
+    merged = dict(a)
+    for key, value in b.items():
+        if key in a:
+            value = _merge_entry(inner_type, a[key], value)
+            if value is _CONFLICT:
+                return _CONFLICT
+        merged[key] = value
+    return merged
+
+
+def _merge_entry(inner_type, a, b):
+    """Same as _merge_value for an entry of a MapField, which is set when it is None and updated otherwise"""
+    kind = _KINDS.get(type(inner_type).update)
+    if kind is _MODEL:
+        if b is None:
+            return None
+        if isinstance(a, dict) and isinstance(b, dict):
+            return _merge_patch(inner_type.model, a, b)
+        return _CONFLICT
+    if kind is _REPLACE:
+        return b
+    if kind is _FLOAT:
+        # the int is only converted if the entry is not None
+        if a is None:
+            return _CONFLICT if isinstance(b, int) else b
+        return float(b) if isinstance(b, int) else b
+    if kind is None:
+        return _CONFLICT
+    if a is None:
+        return b
+    if not isinstance(b, dict):
+        return a
+    if not isinstance(a, dict):
+        return _CONFLICT
+    if kind is _DICT:
+        merged = dict(a)
+        merged.update(b)
+        return merged
+    return _merge_value(inner_type, a, b, True)
@@ -0,0 +1,715 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+binary plugin
+
+Pack documents into a compact binary form, using the fields of the model instead of repeating the keys.
+
+    buf = Model.pack(document)
+    document = Model.unpack(buf)
+
+A packed document starts with the 8 bytes fingerprint of the schema, and unpack refuses the buffers of
+another schema. The fields follow in the order of _fields, each as a one byte tag and its value :
+
+    missing, None       the tag only
+    typed value         int64 for IntField, double for FloatField, the tag for BoolField,
+                        int64 microseconds since 1970 for naive DateTimeField, length + utf8 for StringField,
+                        count + values for ListField, count + keys + values for MapField,
+                        the fields of the model for DefinedDictField.
+    block               lists and map values of int, float or str, packed together (an array of int64
+                        or double, or the strings joined with \\0).
+    choices             the index of the value in choices (uint16)
+    anything else       a self describing value (None, bool, int, float, str, bytes, list, tuple, dict, datetime,
+                        date), subclasses of these types are packed as the type. Other values raise DictValueError.
+
+Values that do not match their field are packed as self describing values, so unpack(pack(document)) returns
+the same document, except that
+
+    the keys that are not fields of their model are left out, at every depth (the keys of DictField and
+    MapField values, and of the dicts in generic values, are kept).
+    subclasses of the supported types come back as the type (an OrderedDict as a dict).
+    the tzinfo of aware datetimes comes back as a datetime.timezone with the same utc offset.
+"""
+
+import sys
+import array
+import struct
+import hashlib
+import datetime
+import functools
+from ..dict_model import *
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_INT64 = 1 << 63
+
+_B = struct.Struct("<B").pack
+_BQ = struct.Struct("<Bq").pack
+_BD = struct.Struct("<Bd").pack
+_BI = struct.Struct("<BI").pack
+_BH = struct.Struct("<BH").pack
+_U = struct.Struct("<I").pack
+_QQ = struct.Struct("<qq").pack
+_Q = struct.Struct("<q").unpack_from
+_D = struct.Struct("<d").unpack_from
+_I = struct.Struct("<I").unpack_from
+_H = struct.Struct("<H").unpack_from
+_UNPACK_QQ = struct.Struct("<qq").unpack_from
+_BYTESWAP = sys.byteorder != "little"
+
+# field tags
+MISSING, NONE, TYPED, GENERIC, CHOICE, FALSE, TRUE, BLOCK = range(8)
+
+FINGERPRINT_SIZE = 8
+
+
+class BinaryMixin(Mixin):
+
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        # the codec is compiled when the model first packs or unpacks, see LazyClassAttribute
+        new_cls._binary_fingerprint = LazyClassAttribute("_binary_fingerprint", _binary_fingerprint)
+        new_cls._binary_encode = LazyClassAttribute("_binary_encode", _binary_encode)
+        new_cls._binary_decode = LazyClassAttribute("_binary_decode", _binary_decode)
+
+    @classmethod
+    def pack(cls, document):
+        """Return the document packed as bytes, undefined keys are left out"""
+        out = [ cls._binary_fingerprint ]
+        cls._binary_encode(document, out)
+        return b"".join(out)
+
+    @classmethod
+    def unpack(cls, buf):
+        """Return the document packed in buf (bytes, bytearray or memoryview).
+
+        Raise DictValueError if buf was packed with another schema or is corrupted.
+        """
+        if bytes(buf[:FINGERPRINT_SIZE]) != cls._binary_fingerprint:
+            raise DictValueError(message="buffer was not packed with the schema of %s" % (cls.__name__, ))
+        try:
+            document, position = cls._binary_decode(buf, FINGERPRINT_SIZE)
+        except (struct.error, IndexError, KeyError, ValueError, OverflowError) as e:
+            raise DictValueError(message="corrupted buffer for %s : %s" % (cls.__name__, e))
+        if position != len(buf):
+            raise DictValueError(message="corrupted buffer for %s : %d bytes read out of %d" % (
+                cls.__name__, position, len(buf)))
+        return document
+
+#################################### Codec ####################################
+class _Codec(object):
+
+    def __init__(self, fingerprint, encode, decode):
+        self.fingerprint = fingerprint
+        self.encode = encode
+        self.decode = decode
+
+
+@functools.lru_cache(maxsize=None)
+def _model_codec(model):
+    """Compile the codec of a model (any DefinedDict), nested models are compiled once and shared"""
+    schema = repr(_model_schema(model)).encode("utf-8")
+    fingerprint = hashlib.blake2b(schema, digest_size=FINGERPRINT_SIZE).digest()
+    encode, decode = _CodecCompiler(model).compile()
+    return _Codec(fingerprint, encode, decode)
+
+
+def _binary_fingerprint(model):
+    return _model_codec(model).fingerprint
+
+
+def _binary_encode(model):
+    return staticmethod(_model_codec(model).encode)
+
+
+def _binary_decode(model):
+    return staticmethod(_model_codec(model).decode)
+
+
+@functools.lru_cache(maxsize=None)
+def _field_codecs(model):
+    """The codec of each field of a model, see _CodecCompiler.compile_fields"""
+    return _CodecCompiler(model).compile_fields()
+
+
+def _field_kind(definition):
+    if isinstance(definition, BoolField):
+        return "bool"
+    if isinstance(definition, IntField):
+        return "int"
+    if isinstance(definition, FloatField):
+        return "float"
+    if isinstance(definition, DateTimeField):
+        return "datetime"
+    if isinstance(definition, StringField):
+        return "str"
+    if isinstance(definition, DefinedDictField):
+        return "model"
+    if isinstance(definition, MapField):
+        return "map"
+    if isinstance(definition, ListField) and definition.inner_type is not None:
+        return "list"
+    return "generic"
+
+
+def _choice_list(choices):
+    """The choices in a stable order, None if they cannot be indexed"""
+    if choices is None:
+        return None
+    if isinstance(choices, (set, frozenset)):
+        choices = sorted(choices, key=repr)
+    choices = list(choices)
+    if len(choices) > 0xffff:
+        return None
+    try:
+        { (type(choice), choice) for choice in choices }
+    except TypeError:
+        return None
+    return choices
+
+
+def _field_schema(definition):
+    kind = _field_kind(definition)
+    choices = _choice_list(getattr(definition, "choices", None))
+    if kind == "model":
+        return (kind, _model_schema(definition.model))
+    if kind in ("map", "list"):
+        return (kind, repr(choices), _field_schema(definition.inner_type))
+    return (kind, repr(choices))
+
+
+def _model_schema(model):
+    return tuple((key, _field_schema(definition)) for key, definition in model._fields.items())
+
+
+class _CodecCompiler(object):
+    """Generate encode(document, out) and decode(buf, position) -> (document, position) of a model
+
+    Consecutive int, float, bool and datetime fields are packed and unpacked with one struct when they
+    all hold a typed value. Lists and maps of int, float or str are packed as one block when they can be.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.namespace = {
+            "_MISSING" : _MISSING,
+            "_EPOCH" : _EPOCH,
+            "_MICROSECOND" : _MICROSECOND,
+            "_INT64" : _INT64,
+            "_timedelta" : datetime.timedelta,
+            "_datetime" : datetime.datetime,
+            "_put" : _put,
+            "_get" : _get,
+            "_BQ" : _BQ, "_BD" : _BD, "_BI" : _BI, "_BH" : _BH,
+            "_Q" : _Q, "_D" : _D, "_I" : _I, "_H" : _H,
+            "_pack_strings" : _pack_strings, "_unpack_strings" : _unpack_strings,
+            "_corrupted" : _corrupted,
+        }
+        self.lines = []
+
+    def compile(self):
+        groups = self.groups()
+        self.emit(0, "def encode(document, out):")
+        self.emit(1, "put = out.append")
+        self.emit(1, "get = document.get")
+        for group in groups:
+            if len(group) > 1:
+                self.encode_run(group)
+            else:
+                key, definition = group[0]
+                self.emit(1, "v0 = get(%r, _MISSING)" % (key, ))
+                self.encode(definition, "v0", 1, 0, missing=True)
+        self.emit(0, "def decode(buf, p):")
+        self.emit(1, "document = {}")
+        for group in groups:
+            if len(group) > 1:
+                self.decode_run(group)
+            else:
+                key, definition = group[0]
+                self.decode(definition, "document[%r] = %%s" % (key, ), 1, 0, missing=True)
+        self.emit(1, "return document, p")
+        source = "\n".join(self.lines)
+        exec(compile(source, "<binary codec %s>" % (self.model.__qualname__, ), "exec"), self.namespace)
+        return self.namespace["encode"], self.namespace["decode"]
+
+    def compile_fields(self):
+        """Generate [ (key, encode(value, out), decode(buf, p) -> (value, p)) ] for each field.
+
+        The value is _MISSING for a missing key, and the fields encoded one after the other are the same
+        bytes as encode(document, out).
+        """
+        keys = list(self.model._fields)
+        for index, definition in enumerate(self.model._fields.values()):
+            self.emit(0, "def encode_%d(v0, out):" % (index, ))
+            self.emit(1, "put = out.append")
+            self.encode(definition, "v0", 1, 0, missing=True)
+            self.emit(0, "def decode_%d(buf, p):" % (index, ))
+            self.emit(1, "value = _MISSING")
+            self.decode(definition, "value = %s", 1, 0, missing=True)
+            self.emit(1, "return value, p")
+        source = "\n".join(self.lines)
+        exec(compile(source, "<binary fields %s>" % (self.model.__qualname__, ), "exec"), self.namespace)
+        return [ (key, self.namespace["encode_%d" % (index, )], self.namespace["decode_%d" % (index, )])
+                 for index, key in enumerate(keys) ]
+
+    def groups(self):
+        """Split the fields into runs of fixed size fields, and single fields"""
+        groups = []
+        for key, definition in self.model._fields.items():
+            fixed = (_field_kind(definition) in _FIXED_FORMATS and
+                     _choice_list(getattr(definition, "choices", None)) is None)
+            if fixed and groups and groups[-1][0]:
+                groups[-1][1].append((key, definition))
+            else:
+                groups.append((fixed, [ (key, definition) ]))
+        return [ fields for fixed, fields in groups ]
+
+    def emit(self, indent, line):
+        self.lines.append("    " * indent + line)
+
+    def constant(self, value):
+        name = "_c%d" % len(self.namespace)
+        self.namespace[name] = value
+        return name
+
+    def run_struct(self, run):
+        return struct.Struct("<" + "".join(_FIXED_FORMATS[_field_kind(definition)] for key, definition in run))
+
+    def encode_run(self, run):
+        conditions = []
+        values = []
+        for index, (key, definition) in enumerate(run):
+            value = "f%d" % (index, )
+            self.emit(1, "%s = get(%r, _MISSING)" % (value, key))
+            kind = _field_kind(definition)
+            if kind == "bool":
+                conditions.append("%s.__class__ is bool" % (value, ))
+                values.append("%d if %s else %d" % (TRUE, value, FALSE))
+            elif kind == "int":
+                conditions.append("%s.__class__ is int and -_INT64 <= %s < _INT64" % (value, value))
+                values.extend([ str(TYPED), value ])
+            elif kind == "float":
+                conditions.append("%s.__class__ is float" % (value, ))
+                values.extend([ str(TYPED), value ])
+            else:
+                conditions.append("%s.__class__ is _datetime and %s.tzinfo is None" % (value, value))
+                values.extend([ str(TYPED), "(%s - _EPOCH) // _MICROSECOND" % (value, ) ])
+        self.emit(1, "if %s:" % (" and ".join(conditions), ))
+        self.emit(2, "put(%s(%s))" % (self.constant(self.run_struct(run).pack), ", ".join(values)))
+        self.emit(1, "else:")
+        for index, (key, definition) in enumerate(run):
+            self.encode(definition, "f%d" % (index, ), 2, 0, missing=True)
+
+    def decode_run(self, run):
+        unpack = self.run_struct(run)
+        names = []
+        conditions = []
+        assignments = []
+        for index, (key, definition) in enumerate(run):
+            kind = _field_kind(definition)
+            names.append("t%d" % (index, ))
+            if kind == "bool":
+                conditions.append("(t%d == %d or t%d == %d)" % (index, TRUE, index, FALSE))
+                assignments.append("document[%r] = t%d == %d" % (key, index, TRUE))
+                continue
+            names.append("x%d" % (index, ))
+            conditions.append("t%d == %d" % (index, TYPED))
+            if kind == "datetime":
+                assignments.append("document[%r] = _EPOCH + _timedelta(0, 0, x%d)" % (key, index))
+            else:
+                assignments.append("document[%r] = x%d" % (key, index))
+        self.emit(1, "if len(buf) - p >= %d:" % (unpack.size, ))
+        self.emit(2, "%s = %s(buf, p)" % (", ".join(names), self.constant(unpack.unpack_from)))
+        self.emit(2, "fast = %s" % (" and ".join(conditions), ))
+        self.emit(1, "else:")
+        self.emit(2, "fast = False")
+        self.emit(1, "if fast:")
+        for assignment in assignments:
+            self.emit(2, assignment)
+        self.emit(2, "p += %d" % (unpack.size, ))
+        self.emit(1, "else:")
+        for key, definition in run:
+            self.decode(definition, "document[%r] = %%s" % (key, ), 2, 0, missing=True)
+
+    def encode(self, definition, value, indent, depth, missing=False):
+        """Emit the code packing value (a variable) with its tag"""
+        kind = _field_kind(definition)
+        choices = _choice_list(getattr(definition, "choices", None))
+        branch = _Branches(self, indent)
+        if choices is not None:
+            indexes = self.constant({ (type(choice), choice) : index for index, choice in enumerate(choices) })
+            types = self.constant(frozenset(type(choice) for choice in choices))
+            self.emit(indent, "c = %s.get((%s.__class__, %s)) if %s.__class__ in %s else None" % (
+                indexes, value, value, value, types))
+            branch("c is not None")
+            self.emit(indent + 1, "put(_BH(%d, c))" % (CHOICE, ))
+
+        if kind == "bool":
+            branch("%s is True" % (value, ))
+            self.emit(indent + 1, "put(%r)" % (bytes((TRUE, )), ))
+            branch("%s is False" % (value, ))
+            self.emit(indent + 1, "put(%r)" % (bytes((FALSE, )), ))
+        elif kind == "int":
+            branch("%s.__class__ is int and -_INT64 <= %s < _INT64" % (value, value))
+            self.emit(indent + 1, "put(_BQ(%d, %s))" % (TYPED, value))
+        elif kind == "float":
+            branch("%s.__class__ is float" % (value, ))
+            self.emit(indent + 1, "put(_BD(%d, %s))" % (TYPED, value))
+        elif kind == "datetime":
+            branch("%s.__class__ is _datetime and %s.tzinfo is None" % (value, value))
+            self.emit(indent + 1, "put(_BQ(%d, (%s - _EPOCH) // _MICROSECOND))" % (TYPED, value))
+        elif kind == "str":
+            branch("%s.__class__ is str" % (value, ))
+            self.emit(indent + 1, "b = %s.encode('utf-8', 'surrogatepass')" % (value, ))
+            self.emit(indent + 1, "put(_BI(%d, len(b)))" % (TYPED, ))
+            self.emit(indent + 1, "put(b)")
+        elif kind == "model":
+            encode = self.constant(_model_codec(definition.model).encode)
+            branch("isinstance(%s, dict)" % (value, ))
+            self.emit(indent + 1, "put(%r)" % (bytes((TYPED, )), ))
+            self.emit(indent + 1, "%s(%s, out)" % (encode, value))
+        elif kind == "list":
+            item = "v%d" % (depth + 1, )
+            block = _field_kind(definition.inner_type)
+            branch("%s.__class__ is list" % (value, ))
+            inner = indent + 1
+            if block in _PACK_BLOCK:
+                self.emit(inner, "b = %s(%s)" % (self.constant(_PACK_BLOCK[block]), value))
+                self.emit(inner, "if b is not None:")
+                self.emit(inner + 1, "put(_BI(%d, len(%s)))" % (BLOCK, value))
+                self.emit(inner + 1, "put(b)")
+                self.emit(inner, "else:")
+                inner += 1
+            self.emit(inner, "put(_BI(%d, len(%s)))" % (TYPED, value))
+            self.emit(inner, "for %s in %s:" % (item, value))
+            self.encode(definition.inner_type, item, inner + 1, depth + 1)
+        elif kind == "map":
+            item = "v%d" % (depth + 1, )
+            keys = "keys%d" % (depth + 1, )
+            block = _field_kind(definition.inner_type)
+            self.emit(indent, "%s = _pack_strings(%s) if isinstance(%s, dict) else None" % (keys, value, value))
+            branch("%s is not None" % (keys, ))
+            inner = indent + 1
+            if block in _PACK_BLOCK:
+                self.emit(inner, "b = %s(list(%s.values()))" % (self.constant(_PACK_BLOCK[block]), value))
+                self.emit(inner, "if b is not None:")
+                self.emit(inner + 1, "put(_BI(%d, len(%s)))" % (BLOCK, value))
+                self.emit(inner + 1, "put(%s)" % (keys, ))
+                self.emit(inner + 1, "put(b)")
+                self.emit(inner, "else:")
+                inner += 1
+            self.emit(inner, "put(_BI(%d, len(%s)))" % (TYPED, value))
+            self.emit(inner, "put(%s)" % (keys, ))
+            self.emit(inner, "for %s in %s.values():" % (item, value))
+            self.encode(definition.inner_type, item, inner + 1, depth + 1)
+
+        branch("%s is None" % (value, ))
+        self.emit(indent + 1, "put(%r)" % (bytes((NONE, )), ))
+        if missing:
+            branch("%s is _MISSING" % (value, ))
+            self.emit(indent + 1, "put(%r)" % (bytes((MISSING, )), ))
+        self.emit(indent, "else:")
+        self.emit(indent + 1, "put(%r)" % (bytes((GENERIC, )), ))
+        self.emit(indent + 1, "_put(%s, out)" % (value, ))
+
+    def decode(self, definition, target, indent, depth, missing=False):
+        """Emit the code reading a tagged value at p, and storing it with target % value"""
+        kind = _field_kind(definition)
+        choices = _choice_list(getattr(definition, "choices", None))
+        branch = _Branches(self, indent)
+        self.emit(indent, "t = buf[p]")
+        self.emit(indent, "p += 1")
+
+        if kind == "bool":
+            branch("t == %d" % (TRUE, ))
+            self.emit(indent + 1, target % "True")
+            branch("t == %d" % (FALSE, ))
+            self.emit(indent + 1, target % "False")
+        elif kind in ("int", "float", "datetime"):
+            branch("t == %d" % (TYPED, ))
+            if kind == "int":
+                self.emit(indent + 1, target % "_Q(buf, p)[0]")
+            elif kind == "float":
+                self.emit(indent + 1, target % "_D(buf, p)[0]")
+            else:
+                self.emit(indent + 1, target % "_EPOCH + _timedelta(0, 0, _Q(buf, p)[0])")
+            self.emit(indent + 1, "p += 8")
+        elif kind == "str":
+            branch("t == %d" % (TYPED, ))
+            self.emit(indent + 1, "n = _I(buf, p)[0] + p + 4")
+            self.emit(indent + 1, target % "str(buf[p + 4:n], 'utf-8', 'surrogatepass')")
+            self.emit(indent + 1, "p = n")
+        elif kind == "model":
+            decode = self.constant(_model_codec(definition.model).decode)
+            branch("t == %d" % (TYPED, ))
+            self.emit(indent + 1, "x, p = %s(buf, p)" % (decode, ))
+            self.emit(indent + 1, target % "x")
+        elif kind in ("list", "map"):
+            items = "l%d" % (depth + 1, )
+            block = _field_kind(definition.inner_type)
+            branch("t == %d" % (TYPED, ))
+            self.emit(indent + 1, "n = _I(buf, p)[0]")
+            self.emit(indent + 1, "p += 4")
+            if kind == "list":
+                self.emit(indent + 1, "%s = []" % (items, ))
+                self.emit(indent + 1, "for _ in range(n):")
+                self.decode(definition.inner_type, items + ".append(%s)", indent + 2, depth + 1)
+            else:
+                name = "k%d" % (depth + 1, )
+                self.emit(indent + 1, "keys, p = _unpack_strings(buf, p, n)")
+                self.emit(indent + 1, "%s = {}" % (items, ))
+                self.emit(indent + 1, "for %s in keys:" % (name, ))
+                self.decode(definition.inner_type, "%s[%s] = %%s" % (items, name), indent + 2, depth + 1)
+            self.emit(indent + 1, target % items)
+            if block in _UNPACK_BLOCK:
+                branch("t == %d" % (BLOCK, ))
+                self.emit(indent + 1, "n = _I(buf, p)[0]")
+                self.emit(indent + 1, "p += 4")
+                if kind == "list":
+                    self.emit(indent + 1, "x, p = %s(buf, p, n)" % (self.constant(_UNPACK_BLOCK[block]), ))
+                    self.emit(indent + 1, target % "x")
+                else:
+                    self.emit(indent + 1, "keys, p = _unpack_strings(buf, p, n)")
+                    self.emit(indent + 1, "x, p = %s(buf, p, n)" % (self.constant(_UNPACK_BLOCK[block]), ))
+                    self.emit(indent + 1, target % "dict(zip(keys, x))")
+
+        branch("t == %d" % (NONE, ))
+        self.emit(indent + 1, target % "None")
+        branch("t == %d" % (GENERIC, ))
+        self.emit(indent + 1, "x, p = _get(buf, p)")
+        self.emit(indent + 1, target % "x")
+        if choices is not None:
+            branch("t == %d" % (CHOICE, ))
+            self.emit(indent + 1, target % ("%s[_H(buf, p)[0]]" % (self.constant(tuple(choices)), )))
+            self.emit(indent + 1, "p += 2")
+        if missing:
+            branch("t != %d" % (MISSING, ))
+        else:
+            self.emit(indent, "else:")
+        self.emit(indent + 1, "_corrupted(t)")
+
+
+class _Branches(object):
+    """Emit the conditions of an if / elif chain"""
+
+    def __init__(self, compiler, indent):
+        self.compiler = compiler
+        self.indent = indent
+        self.first = True
+
+    def __call__(self, condition):
+        self.compiler.emit(self.indent, "%s %s:" % ("if" if self.first else "elif", condition))
+        self.first = False
+
+
+_FIXED_FORMATS = { "int" : "Bq", "float" : "Bd", "bool" : "B", "datetime" : "Bq" }
+
+
+_MISSING = object()
+
+
+def _corrupted(tag):
+    raise DictValueError(message="unknown tag %d" % (tag, ))
+
+#################################### Blocks ####################################
+def _pack_array(typecode, kind):
+    def pack(values):
+        if not set(map(type, values)) <= kind:
+            return None
+        try:
+            values = array.array(typecode, values)
+        except OverflowError:
+            return None
+        if _BYTESWAP:
+            values.byteswap()
+        return values.tobytes()
+    return pack
+
+
+def _unpack_array(typecode):
+    def unpack(buf, p, n):
+        end = p + 8 * n
+        values = array.array(typecode)
+        values.frombytes(buf[p:end])
+        if len(values) != n:
+            raise ValueError("truncated block")
+        if _BYTESWAP:
+            values.byteswap()
+        return values.tolist(), end
+    return unpack
+
+
+def _pack_strings(values):
+    """Join the strings with \\0, None if they are not all str or contain \\0"""
+    if not set(map(type, values)) <= _STR:
+        return None
+    joined = "\x00".join(values)
+    if joined.count("\x00") != max(len(values) - 1, 0):
+        return None
+    b = joined.encode("utf-8", "surrogatepass")
+    return _U(len(b)) + b
+
+
+def _unpack_strings(buf, p, n):
+    end = _I(buf, p)[0] + p + 4
+    values = str(buf[p + 4:end], "utf-8", "surrogatepass").split("\x00") if n else []
+    if len(values) != n:
+        raise ValueError("truncated block")
+    return values, end
+
+
+_STR = frozenset((str, ))
+_PACK_BLOCK = {
+    "int" : _pack_array("q", frozenset((int, ))),
+    "float" : _pack_array("d", frozenset((float, ))),
+    "str" : _pack_strings,
+}
+_UNPACK_BLOCK = {
+    "int" : _unpack_array("q"),
+    "float" : _unpack_array("d"),
+    "str" : _unpack_strings,
+}
+
+#################################### Self describing values ####################################
+def _put_str(value, out):
+    b = value.encode("utf-8", "surrogatepass")
+    out.append(_BI(ord("s"), len(b)))
+    out.append(b)
+
+
+def _put_int(value, out):
+    if -_INT64 <= value < _INT64:
+        out.append(_BQ(ord("i"), value))
+    else:
+        b = str(value).encode("ascii")
+        out.append(_BI(ord("I"), len(b)))
+        out.append(b)
+
+
+def _put_bytes(value, out):
+    out.append(_BI(ord("b"), len(value)))
+    out.append(bytes(value))
+
+
+def _put_list(value, out, tag=ord("l")):
+    out.append(_BI(tag, len(value)))
+    for item in value:
+        _put(item, out)
+
+
+def _put_tuple(value, out):
+    _put_list(value, out, ord("u"))
+
+
+def _put_dict(value, out):
+    out.append(_BI(ord("d"), len(value)))
+    for k, v in value.items():
+        _put(k, out)
+        _put(v, out)
+
+
+def _put_datetime(value, out):
+    if value.tzinfo is None:
+        out.append(_BQ(ord("t"), (value - _EPOCH) // _MICROSECOND))
+    else:
+        offset = value.utcoffset()
+        out.append(_B(ord("z")))
+        out.append(_QQ((value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND, offset // _MICROSECOND))
+
+
+_PUT = {
+    type(None) : lambda value, out: out.append(b"N"),
+    bool : lambda value, out: out.append(b"T" if value else b"F"),
+    int : _put_int,
+    float : lambda value, out: out.append(_BD(ord("f"), value)),
+    str : _put_str,
+    bytes : _put_bytes,
+    list : _put_list,
+    tuple : _put_tuple,
+    dict : _put_dict,
+    datetime.datetime : _put_datetime,
+    datetime.date : lambda value, out: out.append(_BQ(ord("D"), value.toordinal())),
+}
+# datetime before date, which it subclasses
+_PUT_BASES = (bool, int, float, str, bytes, list, tuple, dict, datetime.datetime, datetime.date)
+
+
+def _put(value, out):
+    put = _PUT.get(value.__class__)
+    if put is None:
+        for base in _PUT_BASES:
+            if isinstance(value, base):
+                put = _PUT[base]
+                break
+        else:
+            raise DictValueError(message="cannot pack a value of type %s" % (type(value).__name__, ))
+    put(value, out)
+
+
+def _get(buf, p):
+    """Read the self describing value at p, return (value, p)"""
+    t = buf[p]
+    p += 1
+    if t == 0x73: # s
+        n = _I(buf, p)[0] + p + 4
+        return str(buf[p + 4:n], "utf-8", "surrogatepass"), n
+    if t == 0x69: # i
+        return _Q(buf, p)[0], p + 8
+    if t == 0x66: # f
+        return _D(buf, p)[0], p + 8
+    if t == 0x4e: # N
+        return None, p
+    if t == 0x54: # T
+        return True, p
+    if t == 0x46: # F
+        return False, p
+    if t == 0x6c or t == 0x75: # l, u
+        items = []
+        count = _I(buf, p)[0]
+        p += 4
+        for _ in range(count):
+            item, p = _get(buf, p)
+            items.append(item)
+        return (items if t == 0x6c else tuple(items)), p
+    if t == 0x64: # d
+        items = {}
+        count = _I(buf, p)[0]
+        p += 4
+        for _ in range(count):
+            k, p = _get(buf, p)
+            items[k], p = _get(buf, p)
+        return items, p
+    if t == 0x74: # t
+        return _EPOCH + datetime.timedelta(0, 0, _Q(buf, p)[0]), p + 8
+    if t == 0x7a: # z
+        value, offset = _UNPACK_QQ(buf, p)
+        tz = datetime.timezone(datetime.timedelta(0, 0, offset))
+        return (_EPOCH + datetime.timedelta(0, 0, value)).replace(tzinfo=tz), p + 16
+    if t == 0x44: # D
+        return datetime.date.fromordinal(_Q(buf, p)[0]), p + 8
+    if t == 0x62: # b
+        n = _I(buf, p)[0] + p + 4
+        return bytes(buf[p + 4:n]), n
+    if t == 0x49: # I
+        n = _I(buf, p)[0] + p + 4
+        return int(str(buf[p + 4:n], "ascii")), n
+    _corrupted(t)
@@ -0,0 +1,287 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+validation cache plugin
+
+Caches the errors of the documents of a model, for documents that are validated again and again (the same
+address or config block embedded in many documents):
+
+    Address.enable_validation_cache(maxsize=4096)
+    with validation_batch():
+        for document in documents:
+            User.get_document_errors(document)      # the addresses in the users are looked up in the cache
+    Address.validation_cache_info()
+
+The errors of a document are found in the cache
+
+    by identity         inside validation_batch(), the same dict object is only validated once.
+    by structure        with structural=True, the document is frozen into a hashable key (keys, types and
+                        values, in order), so equal documents share their errors across batches. Documents with
+                        values that are not str, int, float, bool, None, datetime, bytes, or lists and dicts of
+                        them, or with more than max_values values, are not cached by structure.
+                        Freezing a document costs several times what the compiled checks of the builtin fields
+                        cost, it only pays for models with slow validators (custom errors, regex, ...).
+
+The errors are kept with keys relative to the document, and are given the path of each document they are
+used for. Errors holding a list or dict value are not cached by structure, as the value could be changed.
+
+update, clean_document, map_to_mongo, map_from_mongo and clean_labels of the models with the cache enabled
+increase a global mutation epoch, which invalidates what was cached by identity. Other changes to a document
+inside a batch must be followed by invalidate_validation_caches().
+
+The cache replaces the validators of the model (and its update, clean_document, ...) when it is enabled,
+disable_validation_cache puts them back. get_document_errors with max_errors does not use the cache.
+"""
+
+import collections
+import contextlib
+import datetime
+from ..dict_model import *
+from ..dict_model import _path_string, _replan
+
+VALIDATION_CACHE_SIZE = 1024
+VALIDATION_CACHE_MAX_VALUES = 256
+
+# the methods that change documents, they increase the epoch
+_MUTATING_METHODS = ("update", "clean_document", "map_to_mongo", "map_from_mongo", "clean_labels")
+_ATOMS = frozenset((str, int, float, bool, type(None), datetime.datetime, datetime.date, bytes))
+_INHERITED = object()
+_INVALID = (None, )
+_UNFROZEN = object()
+_STR_KEYS = frozenset((str, ))
+# [ epoch, batch, depth of validation_batch ]
+_STATE = [ 0, 0, 0 ]
+
+
+class ValidationCacheMixin(Mixin):
+    """
+    Models with this mixin can cache the errors of their documents, see enable_validation_cache.
+    """
+
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        new_cls._validation_cache = None
+
+    @classmethod
+    def enable_validation_cache(cls, maxsize=VALIDATION_CACHE_SIZE, max_values=VALIDATION_CACHE_MAX_VALUES,
+                                structural=False):
+        """
+        maxsize             number of documents kept, by identity and by structure, the least recently
+                            used are evicted first.
+        max_values          documents with more values than this (counting the values of their lists and
+                            nested dicts) are not cached by structure.
+        structural          if True, the documents are also cached by structure.
+        """
+        if cls.__dict__.get("_validation_cache") is not None:
+            cls.disable_validation_cache()
+        cache = ValidationCache(cls, maxsize, max_values, structural)
+        cache.install()
+        cls._validation_cache = cache
+
+    @classmethod
+    def disable_validation_cache(cls):
+        cache = cls.__dict__.get("_validation_cache")
+        if cache is not None:
+            cache.uninstall()
+            cls._validation_cache = None
+
+    @classmethod
+    def validation_cache_info(cls):
+        """Return the stats of the cache, None if it is not enabled"""
+        cache = cls.__dict__.get("_validation_cache")
+        return None if cache is None else cache.info()
+
+
+@contextlib.contextmanager
+def validation_batch():
+    """Cache the errors of the documents by identity until the end of the block"""
+    _STATE[1] += 1
+    _STATE[2] += 1
+    try:
+        yield
+    finally:
+        _STATE[2] -= 1
+        _STATE[1] += 1
+
+
+def invalidate_validation_caches():
+    """Forget what was cached by identity, to be called after changing a document inside a batch"""
+    _STATE[0] += 1
+
+
+class ValidationCache(object):
+
+    def __init__(self, model, maxsize, max_values, structural):
+        self.model = model
+        self.maxsize = maxsize
+        self.max_values = max_values
+        self.structural = structural
+        # { id(document) : (document, epoch, errors) }, for _STATE[1]
+        self.identities = collections.OrderedDict()
+        self.batch = None
+        # { frozen document : errors }
+        self.structures = collections.OrderedDict()
+        self.stats = collections.Counter()
+        self.saved = None
+
+    def info(self):
+        info = { key : self.stats[key] for key in ("identity_hits", "structure_hits", "misses", "uncached",
+                                                   "evictions", "invalidations") }
+        info.update({ "identities" : len(self.identities), "structures" : len(self.structures),
+                      "maxsize" : self.maxsize })
+        return info
+
+    def install(self):
+        model = self.model
+        methods = {
+            "_compiled_errors" : staticmethod(self.errors),
+            "_compiled_valid" : staticmethod(self.valid),
+        }
+        for name in _MUTATING_METHODS:
+            if hasattr(model, name):
+                methods[name] = _mutating_method(model, name)
+        self.original_errors = model._compiled_errors
+        self.original_valid = model._compiled_valid
+        self.saved = { name : model.__dict__.get(name, _INHERITED) for name in methods }
+        for name, value in methods.items():
+            setattr(model, name, value)
+        _replan((model,))
+
+    def uninstall(self):
+        for name, value in self.saved.items():
+            if value is _INHERITED:
+                delattr(self.model, name)
+            else:
+                setattr(self.model, name, value)
+        self.saved = None
+        _replan((self.model,))
+
+    def lookup(self, document, valid=False):
+        """Return the errors of the document, with keys relative to the document.
+
+        valid               only tell if the document is valid: if it is not in the cache, it is checked with the
+                            validator of is_document_valid (which stops at the first error), and _INVALID is
+                            returned without caching anything when it is not valid.
+        """
+        stats = self.stats
+        identities = None
+        if _STATE[2]:
+            identities = self.identities
+            if self.batch != _STATE[1]:
+                identities.clear()
+                self.batch = _STATE[1]
+            entry = identities.get(id(document))
+            if entry is not None and entry[0] is document:
+                if entry[1] == _STATE[0]:
+                    stats["identity_hits"] += 1
+                    identities.move_to_end(id(document))
+                    return entry[2]
+                stats["invalidations"] += 1
+
+        structures = self.structures
+        key = _freeze(document, self.max_values) if self.structural else None
+        errors = None if key is None else structures.get(key)
+        if errors is not None:
+            stats["structure_hits"] += 1
+            structures.move_to_end(key)
+        else:
+            if valid:
+                if not self.original_valid(document):
+                    stats["uncached" if key is None else "misses"] += 1
+                    return _INVALID
+                errors = ()
+            else:
+                errors = []
+                self.original_errors(document, None, errors)
+                errors = tuple(errors)
+            if key is None:
+                stats["uncached"] += 1
+            else:
+                stats["misses"] += 1
+                if not any(len(e) > 2 and isinstance(e[2], (list, dict)) for e in errors):
+                    structures[key] = errors
+                    if len(structures) > self.maxsize:
+                        self._evict(structures)
+
+        if identities is not None:
+            identities[id(document)] = (document, _STATE[0], errors)
+            if len(identities) > self.maxsize:
+                self._evict(identities)
+        return errors
+
+    def _evict(self, entries):
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def errors(self, document, parent, errors):
+        cached = self.lookup(document)
+        if parent is None:
+            errors.extend(cached)
+        elif cached:
+            prefix = _path_string(parent) + "."
+            errors.extend((prefix + e[0], ) + e[1:] for e in cached)
+
+    def valid(self, document):
+        return not self.lookup(document, True)
+
+
+def _freeze(document, max_values):
+    """Return a hashable key equal for equal documents (same keys in the same order, same types and values),
+    None if the document has other values or more than max_values values"""
+    if type(document) is not dict:
+        return None
+    key = _freeze_value(document, [ max_values ])
+    return None if key is _UNFROZEN else key
+
+
+def _freeze_value(value, budget):
+    kind = type(value)
+    if kind is dict:
+        if not _STR_KEYS.issuperset(map(type, value)):
+            return _UNFROZEN
+        values = tuple(value.values())
+    elif kind is list:
+        values = tuple(value)
+    elif kind in _ATOMS:
+        return value
+    else:
+        return _UNFROZEN
+    budget[0] -= len(values)
+    if budget[0] < 0:
+        return _UNFROZEN
+    types = tuple(map(type, values))
+    if not _ATOMS.issuperset(types):
+        values = tuple(v if t in _ATOMS else _freeze_value(v, budget) for v, t in zip(values, types))
+        if _UNFROZEN in values:
+            return _UNFROZEN
+    if kind is dict:
+        return (kind, tuple(value), types, values)
+    return (kind, types, values)
+
+
+def _mutating_method(model, name):
+    original = getattr(model, name).__func__
+    def method(cls, *args, **kwargs):
+        _STATE[0] += 1
+        return original(cls, *args, **kwargs)
+    return classmethod(method)
@@ -0,0 +1,369 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+collection plugin
+
+An in memory collection of the documents of one model, with indexes chosen from the fields :
+
+    hash index          fields with choices and BoolField
+    sorted index        IntField, FloatField and DateTimeField
+
+    users = ModelCollection(User, documents)
+    users.find(status="active", age__gte=18, age__lt=30)
+
+Conditions are key=value (equality) or key__op=value with op in eq, in, lt, lte, gt, gte, and are all
+required to match. The conditions on the same field are merged (a range is a single bisect), the
+most selective index gives the candidates and the other conditions are checked on them, unless their
+index is small enough to intersect with. Only the top level fields are indexed.
+"""
+
+import bisect
+import datetime
+from ..dict_model import *
+
+_OPERATORS = frozenset(("eq", "in", "lt", "lte", "gt", "gte"))
+_AFTER = float("inf")
+_NO_IDS = frozenset()
+
+
+def _compare(op, value, operand):
+    """value op operand, False when value is None or cannot be compared"""
+    if op == "eq":
+        return value == operand
+    if op == "in":
+        return value in operand
+    if value is None:
+        return False
+    try:
+        if op == "lt":
+            return value < operand
+        if op == "lte":
+            return value <= operand
+        if op == "gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        return False
+
+
+class _HashIndex(object):
+    """{ value : ids }, unhashable values are kept in unindexed"""
+
+    operators = frozenset(("eq", "in"))
+    # find returns the sets of the index, intersecting them costs the size of the candidates
+    shared = True
+
+    def __init__(self):
+        self.values = {}
+        self.unindexed = set()
+
+    def add(self, id, value):
+        try:
+            ids = self.values.get(value)
+        except TypeError:
+            self.unindexed.add(id)
+            return
+        if ids is None:
+            self.values[value] = { id }
+        else:
+            ids.add(id)
+
+    def add_many(self, pairs):
+        for id, value in pairs:
+            self.add(id, value)
+
+    def discard(self, id, value):
+        try:
+            ids = self.values.get(value)
+        except TypeError:
+            self.unindexed.discard(id)
+            return
+        if ids is not None:
+            ids.discard(id)
+            if not ids:
+                del self.values[value]
+
+    def _ids(self, op, operand):
+        for value in ((operand, ) if op == "eq" else operand):
+            try:
+                yield self.values.get(value, _NO_IDS)
+            except TypeError:
+                # an unhashable value can only be equal to the unindexed values
+                pass
+
+    def estimate(self, conditions):
+        return min(sum(len(ids) for ids in self._ids(op, operand)) for op, operand in conditions)
+
+    def find(self, conditions):
+        """The ids of the indexed values matching all the conditions, [ (op, operand) ].
+
+        The set can be the one of the index, it must not be modified.
+        """
+        found = []
+        for op, operand in conditions:
+            sets = list(self._ids(op, operand))
+            found.append(sets[0] if len(sets) == 1 else set().union(*sets))
+        return found[0].intersection(*found[1:]) if len(found) > 1 else found[0]
+
+
+class _SortedIndex(object):
+    """Sorted list of (value, id), None values are kept in none and the values that cannot be sorted
+    (another type, nan, timezone aware datetime) in unindexed.
+    """
+
+    operators = _OPERATORS
+    shared = False
+
+    def __init__(self, types):
+        self.types = types
+        self.entries = []
+        self.none = set()
+        self.unindexed = set()
+
+    def _sortable(self, id, value):
+        if value is None:
+            self.none.add(id)
+        elif value.__class__ not in self.types or value != value or getattr(value, "tzinfo", None) is not None:
+            self.unindexed.add(id)
+        else:
+            return True
+        return False
+
+    def add(self, id, value):
+        if self._sortable(id, value):
+            bisect.insort(self.entries, (value, id))
+
+    def add_many(self, pairs):
+        entries = [ (value, id) for id, value in pairs if self._sortable(id, value) ]
+        if entries:
+            self.entries.extend(entries)
+            self.entries.sort()
+
+    def discard(self, id, value):
+        if value is None:
+            self.none.discard(id)
+        elif id in self.unindexed:
+            self.unindexed.discard(id)
+        else:
+            entries = self.entries
+            index = bisect.bisect_left(entries, (value, id))
+            if index < len(entries) and entries[index][1] == id:
+                del entries[index]
+
+    def _bounds(self, conditions):
+        """(start, stop) of the entries matching all the conditions, None if they are not all ranges"""
+        entries = self.entries
+        start = 0
+        stop = len(entries)
+        for op, operand in conditions:
+            if op == "in" or operand is None:
+                return None
+            if operand != operand:
+                return (0, 0)
+            try:
+                if op in ("eq", "gte"):
+                    start = max(start, bisect.bisect_left(entries, (operand, )))
+                elif op == "gt":
+                    start = max(start, bisect.bisect_left(entries, (operand, _AFTER)))
+                if op in ("eq", "lte"):
+                    stop = min(stop, bisect.bisect_left(entries, (operand, _AFTER)))
+                elif op == "lt":
+                    stop = min(stop, bisect.bisect_left(entries, (operand, )))
+            except TypeError:
+                # the operand cannot be compared with the values of this field
+                return (0, 0)
+        return (start, max(start, stop))
+
+    def _find(self, op, operand):
+        if op == "in":
+            ids = set()
+            for value in operand:
+                ids.update(self._find("eq", value))
+            return ids
+        if operand is None:
+            return set(self.none) if op == "eq" else set()
+        start, stop = self._bounds([ (op, operand) ])
+        return { id for value, id in self.entries[start:stop] }
+
+    def estimate(self, conditions):
+        bounds = self._bounds(conditions)
+        if bounds is None:
+            return len(self.find(conditions))
+        return bounds[1] - bounds[0]
+
+    def find(self, conditions):
+        """The ids of the indexed values matching all the conditions, [ (op, operand) ]"""
+        bounds = self._bounds(conditions)
+        if bounds is not None:
+            return { id for value, id in self.entries[bounds[0]:bounds[1]] }
+        found = [ self._find(op, operand) for op, operand in conditions ]
+        return found[0].intersection(*found[1:])
+
+
+def _index_for(definition):
+    if definition.choices is not None or isinstance(definition, BoolField):
+        return _HashIndex()
+    if isinstance(definition, (IntField, FloatField)):
+        return _SortedIndex(frozenset((int, float, bool)))
+    if isinstance(definition, DateTimeField):
+        return _SortedIndex(frozenset((datetime.datetime, )))
+    return None
+
+
+class ModelCollection(object):
+    """Documents of model, indexed by their fields.
+
+    Each document gets an id when it is inserted. The documents are not copied, update them with
+    update(id, patch) (or call reindex(id) after changing them) to keep the indexes in sync.
+    """
+
+    def __init__(self, model, documents=None):
+        self.model = model
+        self._documents = {}
+        self._next_id = 0
+        self._indexes = {}
+        for key, definition in model._fields.items():
+            index = _index_for(definition)
+            if index is not None:
+                self._indexes[key] = index
+        self._keys = tuple(self._indexes)
+        # the indexed values of each document, as they were indexed
+        self._values = {}
+        if documents is not None:
+            self.insert_many(documents)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __iter__(self):
+        return iter(self._documents.values())
+
+    def __contains__(self, id):
+        return id in self._documents
+
+    def get(self, id):
+        return self._documents[id]
+
+    def items(self):
+        """(id, document) in the order they were inserted"""
+        return self._documents.items()
+
+    def insert(self, document):
+        """Add a document and return its id"""
+        id = self._next_id
+        self._next_id += 1
+        self._documents[id] = document
+        values = self._values[id] = tuple(document.get(key) for key in self._keys)
+        for index, value in zip(self._indexes.values(), values):
+            index.add(id, value)
+        return id
+
+    def insert_many(self, documents):
+        """Add the documents and return their ids, the indexes are sorted once"""
+        ids = []
+        for document in documents:
+            id = self._next_id
+            self._next_id += 1
+            self._documents[id] = document
+            self._values[id] = tuple(document.get(key) for key in self._keys)
+            ids.append(id)
+        for position, index in enumerate(self._indexes.values()):
+            index.add_many([ (id, self._values[id][position]) for id in ids ])
+        return ids
+
+    def remove(self, id):
+        """Remove the document with this id and return it"""
+        document = self._documents.pop(id)
+        for index, value in zip(self._indexes.values(), self._values.pop(id)):
+            index.discard(id, value)
+        return document
+
+    def update(self, id, patch):
+        """Apply model.update(document, patch) and update the indexes of the fields it changed.
+
+        Return the changed paths, see DefinedDict.update.
+        """
+        document = self._documents[id]
+        changed = self.model.update(document, patch, changed=set())
+        touched = { path.split(".", 1)[0] for path in changed }
+        if not touched.isdisjoint(self._indexes):
+            self._reindex(id, document, touched)
+        return changed
+
+    def reindex(self, id):
+        """Update the indexes of a document that was changed without update"""
+        self._reindex(id, self._documents[id], self._indexes)
+
+    def _reindex(self, id, document, keys):
+        old_values = self._values[id]
+        values = self._values[id] = tuple(document.get(key) for key in self._keys)
+        for position, (key, index) in enumerate(self._indexes.items()):
+            if key in keys:
+                index.discard(id, old_values[position])
+                index.add(id, values[position])
+
+    def find_ids(self, **conditions):
+        """Return the ids of the documents matching all the conditions, in the order they were inserted"""
+        checks = []
+        indexed = {}
+        for condition, operand in conditions.items():
+            key, separator, op = condition.rpartition("__")
+            if not separator or op not in _OPERATORS:
+                key, op = condition, "eq"
+            if key not in self.model._fields:
+                raise DictValueError(message="%s is not a field of %s" % (key, self.model.__name__))
+            index = self._indexes.get(key)
+            if index is not None and op in index.operators:
+                indexed.setdefault(key, []).append((op, operand))
+            else:
+                checks.append((key, op, operand))
+
+        # start from the most selective index, and only intersect with the indexes that are not much
+        # larger than the candidates left, the other conditions are checked on the documents
+        documents = self._documents
+        plans = sorted((self._indexes[key].estimate(conditions), key, conditions)
+                       for key, conditions in indexed.items())
+        candidates = None
+        for estimate, key, conditions in plans:
+            index = self._indexes[key]
+            if candidates is not None and not index.shared and estimate > 4 * len(candidates):
+                checks.extend((key, op, operand) for op, operand in conditions)
+                continue
+            ids = index.find(conditions)
+            unindexed = [ id for id in index.unindexed
+                          if all(_compare(op, documents[id].get(key), operand) for op, operand in conditions) ]
+            if unindexed:
+                ids = ids.union(unindexed)
+            candidates = ids if candidates is None else candidates & ids
+
+        ids = list(documents) if candidates is None else sorted(candidates)
+        for key, op, operand in checks:
+            ids = [ id for id in ids if _compare(op, documents[id].get(key), operand) ]
+        return ids
+
+    def find(self, **conditions):
+        """Return the documents matching all the conditions, see find_ids"""
+        documents = self._documents
+        return [ documents[id] for id in self.find_ids(**conditions) ]
+
+    def count(self, **conditions):
+        return len(self.find_ids(**conditions))
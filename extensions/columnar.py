@@ -0,0 +1,209 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+columnar plugin, requires numpy (optional)
+
+Validate a batch of flat documents one column (field) at a time.
+Without numpy, every document is validated with get_document_errors.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..dict_model import *
+from ..dict_model import _ValidatorCompiler
+
+_NUMBER_TYPES = frozenset((int, float, bool))
+_ARRAY_TYPES = { "b" : bool, "i" : int, "u" : int, "f" : float }
+
+
+class ColumnarMixin(Mixin):
+    """
+    The number fields, bool fields and fields with choices of the model are checked for all the documents
+    at once with numpy. The other fields are validated document by document, and the errors of each
+    document are returned in the same order as get_document_errors.
+    """
+
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        new_cls._columnar_validators = {}
+
+    @classmethod
+    def get_columnar_errors(cls, documents):
+        """Return [ get_document_errors(document) for document in documents ]"""
+        documents = documents if isinstance(documents, list) else list(documents)
+        if numpy is None:
+            return [ cls.get_document_errors(document) for document in documents ]
+        columns = {}
+        for key, definition in cls._fields.items():
+            if _column_kind(definition) is not None:
+                columns[key] = [ document.get(key) for document in documents ]
+        return cls._errors_by_column(columns, len(documents), documents.__getitem__)
+
+    @classmethod
+    def get_column_errors(cls, columns):
+        """Validate documents that are already stored by column.
+
+        columns             { key : values }, with one value per document. A missing key is a column of None.
+                            numpy arrays of bool, int or float are checked without creating python objects,
+                            their values are checked as the python bool, int or float they hold.
+
+        Return the errors of each document, as get_document_errors would for { key : values[index] }.
+        """
+        count = len(next(iter(columns.values()))) if columns else 0
+        def document(index):
+            return { key : values[index] for key, values in columns.items() }
+        if numpy is None:
+            return [ cls.get_document_errors(document(index)) for index in range(count) ]
+        return cls._errors_by_column(columns, count, document)
+
+    @classmethod
+    def _errors_by_column(cls, columns, count, document):
+        positions = {}
+        others = {}
+        found = {} # index of document : errors found in the columns
+        for position, (key, definition) in enumerate(cls._fields.items()):
+            positions[key] = position
+            column = None
+            if _column_kind(definition) is not None:
+                column = _column_errors(definition, key, columns.get(key, [ None ] * count))
+            if column is None:
+                others[key] = definition
+                continue
+            for index, errors in column.items():
+                found.setdefault(index, []).extend(errors)
+
+        if not others:
+            return [ found.get(index, []) for index in range(count) ]
+        results = []
+        validate = cls._columnar_validator(others)
+        for index in range(count):
+            errors = []
+            validate(document(index), None, errors)
+            if index in found:
+                if errors:
+                    errors.extend(found[index])
+                    errors.sort(key=lambda error: positions[error[0].split(".", 1)[0]])
+                else:
+                    errors = found[index]
+            results.append(errors)
+        return results
+
+    @classmethod
+    def _columnar_validator(cls, fields):
+        """Compiled validator for the fields that are not checked by column, cached by keys"""
+        keys = frozenset(fields)
+        validator = cls._columnar_validators.get(keys)
+        if validator is None:
+            validator = _ValidatorCompiler(cls, "errors", fields=fields).compile()
+            cls._columnar_validators[keys] = validator
+        return validator
+
+
+def _column_kind(definition):
+    errors = getattr(type(definition), "errors", None)
+    if errors is NumberField.errors:
+        return "number"
+    if errors is TypedField.errors and (definition.allowed_type == (bool, ) or definition.choices is not None):
+        return "typed"
+    if errors is Field.errors and definition.choices is not None:
+        return "field"
+    return None
+
+
+def _object_array(values):
+    return numpy.fromiter(values, object, len(values))
+
+
+def _column_errors(definition, key, values):
+    """Check a column, return { index : errors } or None if the column cannot be checked with numpy
+
+    The errors of a value are found in the same order as Field.errors (required, choices, type, min/max).
+    """
+    kind = _column_kind(definition)
+    count = len(values)
+    is_array = isinstance(values, numpy.ndarray) and values.dtype.kind in _ARRAY_TYPES
+    if is_array:
+        types = { _ARRAY_TYPES[values.dtype.kind] }
+        has_none = False
+        value_at = values.item
+    else:
+        types = set(map(type, values))
+        has_none = type(None) in types
+        types.discard(type(None))
+        value_at = values.__getitem__
+    choices = definition.choices
+    if choices is not None and not isinstance(choices, (list, tuple)) and any(t.__hash__ is None for t in types):
+        return None # unhashable values raise on choices lookup, leave that to get_document_errors
+    ranged = kind == "number" and (definition.min is not None or definition.max is not None)
+    if ranged and not types <= _NUMBER_TYPES:
+        return None # min/max comparison with other types, leave that to get_document_errors
+    bad_types = [] if kind == "field" else [ t for t in types if not issubclass(t, definition.allowed_type) ]
+    if not (has_none and definition.is_required) and choices is None and not bad_types and not ranged:
+        return {}
+
+    if is_array:
+        objects = data = values
+        is_none = numpy.zeros(count, dtype=bool)
+    else:
+        objects = _object_array(values)
+        is_none = numpy.equal(objects, None) if has_none else numpy.zeros(count, dtype=bool)
+        # the None values are replaced so that min/max can be compared, they are masked by present
+        data = numpy.where(is_none, 0, objects) if has_none else objects
+        if types and types <= _NUMBER_TYPES and (float not in types or types == { float }):
+            try:
+                data = data.astype(numpy.float64 if float in types else numpy.int64)
+            except OverflowError:
+                pass
+    present = ~is_none
+
+    checks = []
+    if definition.is_required and has_none:
+        checks.append((is_none, Field.ERROR_IS_REQUIRED))
+    if choices is not None:
+        choices = list(choices)
+        tested = data if data.dtype != object and all(type(c) in _NUMBER_TYPES for c in choices) else objects
+        checks.append((present & ~numpy.isin(tested, _object_array(choices)), Field.ERROR_VALUE))
+    if bad_types:
+        if len(types) == 1:
+            checks.append((present, Field.ERROR_TYPE))
+        else:
+            value_types = numpy.fromiter(map(type, values), object, count)
+            checks.append((present & numpy.isin(value_types, _object_array(bad_types)), Field.ERROR_TYPE))
+    if ranged:
+        out_of_range = numpy.zeros(count, dtype=bool)
+        if definition.min is not None:
+            out_of_range |= data < definition.min
+        if definition.max is not None:
+            out_of_range |= data > definition.max
+        checks.append((present & out_of_range, Field.ERROR_VALUE))
+
+    column = {}
+    for mask, error in checks:
+        for index in numpy.flatnonzero(mask).tolist():
+            if error == Field.ERROR_IS_REQUIRED:
+                column.setdefault(index, []).append((key, error))
+            else:
+                column.setdefault(index, []).append((key, error, value_at(index)))
+    return column
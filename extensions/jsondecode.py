@@ -0,0 +1,631 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+json decoder plugin
+
+Decode json into the cleaned document of a model and its errors, in one pass:
+
+    document, errors = Model.decode_json(data)
+
+is the same as
+
+    document = json.loads(data)
+    Model.clean_document(document)
+    errors = Model.get_document_errors(document)
+
+except that the strings found where the model has a DateTimeField (fields, items of the lists, values of the maps,
+in the embedded documents) are parsed with parse_datetime.
+
+    data                str, bytes, or a file like object, which is read in chunks of CHUNK_SIZE.
+    parse_datetime      called with the strings of the DateTimeField, its result replaces the string unless it
+                        raises ValueError. None keeps the strings.
+
+The json is read once, with the fields of the model: the embedded documents (and their lists and maps) are built
+already cleaned and validated, the other values are read whole and validated when the object they are in ends, and the
+values of the undefined keys are skipped without being built when remove_undefined is True. The errors are in the
+order of get_document_errors.
+
+The json is parsed in python, which is slower than json.loads, but much less memory is used when a large part of
+the json is undefined keys, see benchmarks/bench_jsondecode.py.
+
+Differences with json.loads + clean_document + get_document_errors
+
+    the top level value must be an object.
+    parallel_threshold is not used.
+    the values that are skipped are only checked to be json tokens with matching brackets.
+    when clean_document would raise, the exception raised is the one of the first value in the json, which
+    is not always the one clean_document raises first.
+
+Fields with their own clean or errors methods, and models that replace clean_document, are decoded as json and
+cleaned and validated by their own methods.
+"""
+
+import re
+import json
+import codecs
+import datetime
+import functools
+from json.decoder import JSONDecodeError, scanstring
+from ..dict_model import *
+from ..dict_model import _ValidatorCompiler, _clean_step, _default_step, _FIELD_CLEAN_STEP
+
+# number of characters (or bytes) read at once from a file
+CHUNK_SIZE = 65536
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_WS = " \t\n\r"
+# a key without escapes and the colon after it
+_KEY = re.compile(r'"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*')
+_COMMA = re.compile(r"[ \t\n\r]*,[ \t\n\r]*")
+# the json tokens other than the brackets, and what separates them, see _skip
+_TOKENS = re.compile(r"""(?:[ \t\n\r,:]|"[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"|"""
+                     r"""-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?(?![0-9.eE])|true|false|null)*""")
+
+_scan_once = json.JSONDecoder().scan_once
+_CLEAN_DOCUMENT = DefinedDict.clean_document.__func__
+
+
+class JsonDecoderMixin(Mixin):
+
+    @classmethod
+    def decode_json(cls, data, set_default=True, remove_undefined=True, parse_datetime=datetime.datetime.fromisoformat):
+        """Return (document, errors), see decode_json"""
+        return decode_json(cls, data, set_default, remove_undefined, parse_datetime)
+
+    @classmethod
+    def decode_json_lines(cls, source, **kwargs):
+        """Yield (document, errors) for each line of source that is not blank, see decode_json"""
+        return decode_json_lines(cls, source, **kwargs)
+
+
+def decode_json(model, data, set_default=True, remove_undefined=True, parse_datetime=datetime.datetime.fromisoformat):
+    """Return the document of model decoded from data, cleaned, and its errors as (document, errors)"""
+    inp = _Input(data)
+    context = _Context(set_default, remove_undefined, parse_datetime)
+    c = _ws(inp)
+    if c != "{":
+        if c == "":
+            raise JSONDecodeError("Expecting value", inp.text, inp.idx)
+        _skip(inp)
+        _end(inp)
+        raise ValueError("not a json object")
+    if _decodes(model):
+        document, errors = _decode_model(_model_plan(model), inp, context, None)
+    else:
+        document = _object_reader(model)(inp, context)
+        model.clean_document(document, set_default=set_default, remove_undefined=remove_undefined)
+        errors = model.get_document_errors(document)
+    _end(inp)
+    return document, errors
+
+
+def decode_json_lines(model, source, **kwargs):
+    """Yield decode_json(model, line, **kwargs) for each line of source that is not blank"""
+    for line in source:
+        if line.strip():
+            yield decode_json(model, line, **kwargs)
+
+
+class _Context(object):
+
+    __slots__ = ("set_default", "remove_undefined", "parse_datetime")
+
+    def __init__(self, set_default, remove_undefined, parse_datetime):
+        self.set_default = set_default
+        self.remove_undefined = remove_undefined
+        self.parse_datetime = parse_datetime
+
+#################################### Input ####################################
+class _Input(object):
+    """The json being decoded, text is the part of it that is read and idx the position in text.
+
+    The text of a file is read in chunks, the text before idx is dropped when a chunk is read.
+    """
+
+    __slots__ = ("text", "idx", "eof", "read")
+
+    def __init__(self, data):
+        self.idx = 0
+        if hasattr(data, "read"):
+            self.text = ""
+            self.eof = False
+            self.read = _chunk_reader(data)
+            return
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode(json.detect_encoding(data), "surrogatepass")
+        elif data.startswith("\ufeff"):
+            raise JSONDecodeError("Unexpected UTF-8 BOM (decode using utf-8-sig)", data, 0)
+        self.text = data
+        self.eof = True
+        self.read = None
+
+
+def _chunk_reader(f):
+    """Return read(size) that returns the next text of f, or None at the end of f"""
+    decoder = None
+    def read(size):
+        nonlocal decoder
+        chunk = f.read(size)
+        if isinstance(chunk, str):
+            return chunk or None
+        if decoder is None:
+            # the encoding is detected from the first bytes, as json.load does
+            while 0 < len(chunk) < 4:
+                more = f.read(4 - len(chunk))
+                if not more:
+                    break
+                chunk += more
+            decoder = codecs.getincrementaldecoder(json.detect_encoding(chunk))("surrogatepass")
+        if not chunk:
+            decoder.decode(b"", True)
+            return None
+        return decoder.decode(chunk)
+    return read
+
+
+def _fill(inp):
+    """Read more of the file, at least as much as what is left to decode, so that a value that does not fit
+    is read again at most log(size) times"""
+    text = inp.read(max(CHUNK_SIZE, len(inp.text) - inp.idx))
+    if text is None:
+        inp.eof = True
+    else:
+        inp.text = inp.text[inp.idx:] + text
+        inp.idx = 0
+
+
+def _ws(inp):
+    """Skip the whitespace at inp.idx and return the next character, "" at the end of the json"""
+    while True:
+        text = inp.text
+        idx = inp.idx
+        if idx < len(text) and text[idx] not in _WS:
+            return text[idx]
+        idx = inp.idx = _WHITESPACE.match(text, idx).end()
+        if idx < len(text):
+            return text[idx]
+        if inp.eof:
+            return ""
+        _fill(inp)
+
+
+def _end(inp):
+    if _ws(inp) != "":
+        raise JSONDecodeError("Extra data", inp.text, inp.idx)
+
+#################################### Parsing ####################################
+def _scan(inp):
+    """Decode the json value at inp.idx with json"""
+    while True:
+        text = inp.text
+        try:
+            value, end = _scan_once(text, inp.idx)
+        except StopIteration as e:
+            if inp.eof:
+                raise JSONDecodeError("Expecting value", text, e.value) from None
+        except JSONDecodeError:
+            if inp.eof:
+                raise
+        else:
+            # a number that ends with the text read so far, or before a "." or an exponent, can go on after it
+            if inp.eof or (end < len(text) and text[end] not in ".eE"):
+                inp.idx = end
+                return value
+        _fill(inp)
+
+
+def _key(inp):
+    """Read the key of an object member and the colon after it, return the key"""
+    text = inp.text
+    match = _KEY.match(text, inp.idx)
+    if match is not None and match.end() < len(text):
+        inp.idx = match.end()
+        return match.group(1)
+    while True:
+        text = inp.text
+        idx = inp.idx
+        if idx >= len(text) or text[idx] != '"':
+            raise JSONDecodeError("Expecting property name enclosed in double quotes", text, idx)
+        try:
+            key, inp.idx = scanstring(text, idx + 1)
+            break
+        except JSONDecodeError:
+            if inp.eof:
+                raise
+        _fill(inp)
+    if _ws(inp) != ":":
+        raise JSONDecodeError("Expecting ':' delimiter", inp.text, inp.idx)
+    inp.idx += 1
+    if _ws(inp) == "":
+        raise JSONDecodeError("Expecting value", inp.text, inp.idx)
+    return key
+
+
+def _open(inp, close):
+    """Read the opening bracket of an array or object, return False if it is empty (the closing one is read too)"""
+    inp.idx += 1
+    c = _ws(inp)
+    if c == close:
+        inp.idx += 1
+        return False
+    if c == "":
+        raise JSONDecodeError("Expecting value", inp.text, inp.idx)
+    return True
+
+
+def _next(inp, close):
+    """Read what follows a value of an array or object, return False if it was the last one"""
+    text = inp.text
+    match = _COMMA.match(text, inp.idx)
+    if match is not None and match.end() < len(text):
+        inp.idx = match.end()
+        return True
+    c = _ws(inp)
+    inp.idx += 1
+    if c == close:
+        return False
+    if c != ",":
+        raise JSONDecodeError("Expecting ',' delimiter", inp.text, inp.idx - 1)
+    if _ws(inp) == "":
+        raise JSONDecodeError("Expecting value", inp.text, inp.idx)
+    return True
+
+
+def _skip(inp):
+    """Read the json value at inp.idx without building it.
+
+    Only the tokens and the brackets of the arrays and objects are checked, not what separates them.
+    """
+    if inp.text[inp.idx] not in "[{":
+        _scan(inp)
+        return
+    closing = []
+    while True:
+        text = inp.text
+        idx = _TOKENS.match(text, inp.idx).end()
+        c = text[idx] if idx < len(text) else ""
+        if c == "[" or c == "{":
+            closing.append("]" if c == "[" else "}")
+        elif c == "]" or c == "}":
+            if closing.pop() != c:
+                raise JSONDecodeError("Unexpected %r" % c, text, idx)
+            if not closing:
+                inp.idx = idx + 1
+                return
+        elif inp.eof:
+            raise JSONDecodeError("Expecting value", text, idx)
+        else:
+            # the end of the text read so far, its last token can go on after it: the tokens since the last bracket
+            # are read again with more text
+            _fill(inp)
+            continue
+        inp.idx = idx + 1
+
+#################################### Readers ####################################
+"""
+A reader, read(inp, context), returns the json value at inp.idx as json.loads would, except for the strings where
+the definition it was made for has a DateTimeField, which are parsed with context.parse_datetime.
+"""
+
+def _read(inp, context):
+    return _scan(inp)
+
+
+def _read_datetime(inp, context):
+    value = _scan(inp)
+    if type(value) is str and context.parse_datetime is not None:
+        try:
+            value = context.parse_datetime(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _reader(definition):
+    """Return the reader of the values of definition"""
+    if definition is None or not _has_datetime(definition, set()):
+        return _read
+    if isinstance(definition, DateTimeField):
+        return _read_datetime
+    if isinstance(definition, DefinedDictField):
+        return _object_reader(definition.model)
+    read_value = _reader(definition.inner_type)
+    if isinstance(definition, MapField):
+        def read(inp, context):
+            if inp.text[inp.idx] != "{":
+                return _scan(inp)
+            values = {}
+            if _open(inp, "}"):
+                while True:
+                    key = _key(inp)
+                    values[key] = read_value(inp, context)
+                    if not _next(inp, "}"):
+                        break
+            return values
+        return read
+    def read(inp, context):
+        if inp.text[inp.idx] != "[":
+            return _scan(inp)
+        values = []
+        if _open(inp, "]"):
+            while True:
+                values.append(read_value(inp, context))
+                if not _next(inp, "]"):
+                    break
+        return values
+    return read
+
+
+def _object_reader(model):
+    def read(inp, context):
+        if inp.text[inp.idx] != "{":
+            return _scan(inp)
+        # looked up when used, the model can embed itself
+        readers = _model_readers(model)
+        document = {}
+        if _open(inp, "}"):
+            while True:
+                key = _key(inp)
+                document[key] = readers.get(key, _read)(inp, context)
+                if not _next(inp, "}"):
+                    break
+        return document
+    return read
+
+
+@functools.lru_cache(maxsize=None)
+def _model_readers(model):
+    return { key : _reader(definition) for key, definition in model._fields.items() }
+
+
+def _has_datetime(definition, seen):
+    if isinstance(definition, DateTimeField):
+        return True
+    if isinstance(definition, DefinedDictField):
+        if definition.model in seen:
+            return False
+        seen.add(definition.model)
+        return any(_has_datetime(inner, seen) for inner in definition.model._fields.values())
+    if isinstance(definition, (ListField, MapField)):
+        return definition.inner_type is not None and _has_datetime(definition.inner_type, seen)
+    return False
+
+#################################### Documents ####################################
+"""
+The fields of a model are decoded in one of three ways:
+
+    plain fields        fields that Field.clean cleans (only a missing key is set). Their values are read with a
+                        reader and validated by a validator compiled for the consecutive plain fields, when the
+                        object of the document ends.
+    streamed values     the embedded documents, the lists of embedded documents and the maps of the streamed values,
+                        when their fields and models do not replace clean, clean_document or errors. They are built
+                        already cleaned and their errors are found as they are read, see _streamer.
+    other values        read whole with a reader, cleaned with the clean step of the field (see _clean_step) and
+                        validated with a validator compiled for the field.
+
+The lists and maps of other values are read whole too, the C scanner of json is much faster than reading
+their items one by one.
+"""
+
+class _ModelPlan(object):
+    """How the documents of a model are decoded
+
+    readers             { key : read(inp, context) } of the plain fields
+    members             { key : member(inp, context, document, key, parent) } of the other fields, see _member
+    steps               ((key, step), ...) that clean the fields that are not in the json, in the order of the fields
+    validators          ((key, validate(document, parent, errors)), ...) in the order of the fields, key is None for
+                        the validators of plain fields, the others are not used for the values that are streamed.
+    """
+
+    def __init__(self, model):
+        self.readers = {}
+        self.members = {}
+        self.steps = []
+        self.validators = []
+        plain = {}
+        for key, definition in model._fields.items():
+            step = _clean_step(definition)
+            if step is _FIELD_CLEAN_STEP:
+                self.readers[key] = _reader(definition)
+                self.steps.append((key, _default_step(definition)))
+                plain[key] = definition
+                continue
+            self.members[key] = _member(definition)
+            self.steps.append((key, step))
+            if plain:
+                self.validators.append((None, _ValidatorCompiler(model, "errors", plain).compile()))
+                plain = {}
+            self.validators.append((key, _ValidatorCompiler(model, "errors", { key : definition }).compile()))
+        if plain:
+            self.validators.append((None, _ValidatorCompiler(model, "errors", plain).compile()))
+
+
+@functools.lru_cache(maxsize=None)
+def _model_plan(model):
+    return _ModelPlan(model)
+
+
+def _decodes(model):
+    """True if the documents of model can be cleaned as they are decoded"""
+    return getattr(model.clean_document, "__func__", None) is _CLEAN_DOCUMENT
+
+
+def _decode_model(plan, inp, context, parent):
+    """Decode the object at inp.idx as a document of the model of plan, return (document, errors)"""
+    document = {}
+    # { key : errors of the streamed value, or None } of the other fields that are in the json
+    found = {}
+    readers = plan.readers
+    members = plan.members
+    if _open(inp, "}"):
+        while True:
+            # the fast path of _key
+            text = inp.text
+            match = _KEY.match(text, inp.idx)
+            if match is not None and match.end() < len(text):
+                key = match.group(1)
+                inp.idx = match.end()
+            else:
+                key = _key(inp)
+            read = readers.get(key)
+            if read is not None:
+                document[key] = read(inp, context)
+            else:
+                member = members.get(key)
+                if member is not None:
+                    found[key] = member(inp, context, document, key, parent)
+                elif context.remove_undefined:
+                    _skip(inp)
+                else:
+                    document[key] = _scan(inp)
+            # the fast path of _next
+            text = inp.text
+            match = _COMMA.match(text, inp.idx)
+            if match is not None and match.end() < len(text):
+                inp.idx = match.end()
+            elif not _next(inp, "}"):
+                break
+    set_default = context.set_default
+    remove_undefined = context.remove_undefined
+    for key, step in plan.steps:
+        if key not in document and key not in found:
+            step(document, key, set_default, remove_undefined)
+    errors = []
+    for key, validate in plan.validators:
+        field_errors = found.get(key)
+        if field_errors is None:
+            validate(document, parent, errors)
+        else:
+            errors.extend(field_errors)
+    return document, errors
+
+
+@functools.lru_cache(maxsize=None)
+def _values_validator(definition):
+    return _ValidatorCompiler(DefinedDict, "errors", {}).compile_values(definition)
+
+
+def _member(definition):
+    """Return member(inp, context, document, key, parent) that reads the value of definition into document[key] and
+    returns its errors if it is streamed, otherwise cleans it with the clean step of definition and returns None"""
+    stream, opening = _streamer(definition, True)
+    read = _reader(definition)
+    step = _clean_step(definition)
+    if step is _FIELD_CLEAN_STEP:
+        step = None
+    def member(inp, context, document, key, parent):
+        if stream is not None and inp.text[inp.idx] == opening:
+            document[key], errors = stream(inp, context, (parent, key))
+            return errors
+        document[key] = read(inp, context)
+        if step is not None:
+            step(document, key, context.set_default, context.remove_undefined)
+        return None
+    return member
+
+
+def _streamer(definition, cleaned):
+    """Return (stream(inp, context, node), opening character) for the values of definition that are streamed,
+    stream returns (value, errors). cleaned is True if the values are cleaned by the clean method of definition,
+    False for the items of a list, which are only cleaned by the model of a DefinedDictField.
+    """
+    if definition is None or definition.choices is not None:
+        return None, None
+    kind = type(definition)
+    if kind.errors is DefinedDictField.errors:
+        model = definition.model
+        if (cleaned and kind.clean is not DefinedDictField.clean) or not _decodes(model):
+            return None, None
+        def stream(inp, context, node):
+            # looked up when used, the model can embed itself
+            return _decode_model(_model_plan(model), inp, context, node)
+        return stream, "{"
+    if not cleaned:
+        return None, None
+    if kind.errors is ListField.errors and kind.clean is ListField.clean:
+        if isinstance(definition.inner_type, DefinedDictField) and _streamer(definition.inner_type, False)[0]:
+            return _list_streamer(definition), "["
+    if kind.errors is MapField.errors and kind.clean is MapField.clean:
+        if _streamer(definition.inner_type, True)[0] is not None:
+            return _map_streamer(definition), "{"
+    return None, None
+
+
+def _list_streamer(definition):
+    """The items are cleaned with the model of inner_type, as ListField.clean does"""
+    stream_item = _streamer(definition.inner_type, False)[0]
+    read = _reader(definition.inner_type)
+    clean = definition.inner_type.model.clean_document
+    validate = _values_validator(definition.inner_type)
+    remove_none_value = definition.remove_none_value
+    def stream(inp, context, node):
+        values = []
+        errors = []
+        if _open(inp, "]"):
+            while True:
+                if inp.text[inp.idx] == "{":
+                    value, item_errors = stream_item(inp, context, (node, len(values)))
+                    values.append(value)
+                    errors.extend(item_errors)
+                else:
+                    value = read(inp, context)
+                    if value is not None or not remove_none_value:
+                        clean(value, set_default=context.set_default, remove_undefined=context.remove_undefined)
+                        validate(((len(values), value), ), node, errors)
+                        values.append(value)
+                if not _next(inp, "]"):
+                    break
+        return values, errors
+    return stream
+
+
+def _map_streamer(definition):
+    member = _member(definition.inner_type)
+    validate = _values_validator(definition.inner_type)
+    remove_none_value = definition.remove_none_value
+    def stream(inp, context, node):
+        values = {}
+        found = {}
+        nones = set()
+        if _open(inp, "}"):
+            while True:
+                key = _key(inp)
+                if remove_none_value and inp.text[inp.idx] == "n":
+                    # the None values are removed before the others are cleaned
+                    values[key] = _scan(inp)
+                    nones.add(key)
+                else:
+                    found[key] = member(inp, context, values, key, node)
+                    nones.discard(key)
+                if not _next(inp, "}"):
+                    break
+        for key in nones:
+            del values[key]
+        errors = []
+        for key, value in values.items():
+            value_errors = found[key]
+            if value_errors is None:
+                validate(((key, value), ), node, errors)
+            else:
+                errors.extend(value_errors)
+        return values, errors
+    return stream
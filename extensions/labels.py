@@ -21,35 +21,91 @@
 
 from ..dict_model import *
 
+# the number of (labels, exclude) pairs whose projection each model keeps, see LabelMixin
+LABEL_PROJECTION_CACHE_SIZE = 256
+
 class LabelMixin(Mixin):
     """
     Cleaner mixin allows you to specify a label and allow you to run a "clean_label" method
     to clean inclusive/exclusive fields
+
+    The keys to remove for a (labels, exclude) pair are computed once for the model and its nested
+    models, and kept in a dict on each model, see label_projection. A model keeps the projections of
+    LABEL_PROJECTION_CACHE_SIZE pairs at most, the oldest is dropped first: programs use a few label sets,
+    the limit only matters when the labels come from the input.
+    The labels of a field are turned into a set then, the first time a projection reads it.
     """
 
     @classmethod
     def _apply_mixin(cls, new_cls, name, bases, cdict):
-        for key, definition in new_cls._fields.items():
-            if hasattr(definition, "labels"):
-                if isinstance(definition.labels, str):
-                    definition.labels = set([definition.labels])
-                if not isinstance(definition.labels, set):
-                    definition.labels = set(definition.labels)
+        new_cls._label_projections = {}
 
     @classmethod
     def clean_labels(cls, document, labels, exclude=None):
-        exclude = exclude or set()
-        if exclude is not None and isinstance(exclude, str):
-            exclude = (exclude, )
-        if isinstance(labels, str):
-            labels = (labels, )
-        labels = set(labels)
-        exclude = set(exclude)
-
-        for key, definition in cls._fields.items():
-            if key in document and hasattr(definition, "labels"):
-                if ((labels is None and len(definition.labels) > 0) or (len(labels & definition.labels) > 0)) and len(definition.labels & exclude) == 0:
-                    document.pop(key)
-            if isinstance(definition, DefinedDictField) and document.get(key) is not None and CleanerMixin in definition.model._mixins:
-                definition.model.clean_labels(document.get(key), labels, exclude=exclude)
+        """Remove the fields with any of the labels, unless they also have one of the exclude labels.
+        If labels is None, all the fields with labels are removed.
+        """
+        _apply_projection(document, cls.label_projection(labels, exclude))
+
+    @classmethod
+    def label_projection(cls, labels, exclude=None):
+        """Return (removed keys, ((key, projection of the nested model), ...)) for clean_labels"""
+        return _label_projection(cls, _label_set(labels), _label_set(exclude) or frozenset())
+
+
+def _label_set(labels):
+    if labels is None:
+        return None
+    if isinstance(labels, str):
+        return frozenset((labels, ))
+    return frozenset(labels)
+
+
+def _cached_projection(projections, key, build, *args):
+    """Return projections[key], set to build(*args) if missing. The oldest entry is dropped when there are
+    LABEL_PROJECTION_CACHE_SIZE entries."""
+    projection = projections.get(key)
+    if projection is None:
+        if len(projections) >= LABEL_PROJECTION_CACHE_SIZE:
+            projections.pop(next(iter(projections)), None)
+        projection = projections[key] = build(*args)
+    return projection
+
+
+def _label_projection(model, labels, exclude):
+    return _cached_projection(model._label_projections, (labels, exclude), _build_label_projection, model, labels,
+                              exclude)
+
+
+def _build_label_projection(model, labels, exclude):
+    removed = []
+    nested = []
+    for key, definition in model._fields.items():
+        field_labels = _field_labels(definition)
+        if field_labels is not None:
+            if (field_labels if labels is None else labels & field_labels) and not field_labels & exclude:
+                removed.append(key)
+                continue
+        if isinstance(definition, DefinedDictField) and issubclass(definition.model, LabelMixin):
+            projection = _label_projection(definition.model, labels, exclude)
+            if projection[0] or projection[1]:
+                nested.append((key, projection))
+    return (tuple(removed), tuple(nested))
+
+
+def _field_labels(definition):
+    """Return the labels of the field as a set, None if it has none"""
+    labels = getattr(definition, "labels", None)
+    if labels is not None and not isinstance(labels, set):
+        definition.labels = labels = set([labels]) if isinstance(labels, str) else set(labels)
+    return labels
+
 
+def _apply_projection(document, projection):
+    removed, nested = projection
+    for key in removed:
+        document.pop(key, None)
+    for key, projection in nested:
+        value = document.get(key)
+        if value is not None:
+            _apply_projection(value, projection)
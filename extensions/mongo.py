@@ -21,65 +21,358 @@
 
 """
 mongo plugin, requires labels
+
+The conversion of each model is planned once, the first time one of these is read (see LazyClassAttribute):
+
+    _mongo_encoders         [ (key, encode(document, value)) ] for the fields stored differently in mongo
+                            (choices, datetime, store_field, nested models), the other fields are not looked at.
+    _mongo_decoders         [ (key, has_store_field, store_field, decode(value)) ], decode is None if only
+                            the key has to be renamed.
+    _mongo_lazy_decoders    { key : (decode(value), materialize(value)) } used by LazyMongoDocument.
+    _mongo_encoder_map      { key : encode(document, value) }, same as _mongo_encoders.
+    _mongo_store_fields     True if any field has a store_field.
 """
 
-import arrow
-import shortuuid
+import copy
+import datetime
+import collections.abc
 from ..dict_model import *
-from .labels import LabelMixin
+from .labels import LabelMixin, _cached_projection
+try:
+    from dateutil import tz
+except ImportError:
+    tz = None
 
 DATETIME_STORE_PRECISION_V1 = 1e6
 
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_UTC = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# the datetimes read from mongo are in dateutil's tzutc, as arrow returned them, or in datetime.timezone.utc
+# without dateutil
+_EPOCH_READ = _EPOCH_UTC if tz is None else datetime.datetime(1970, 1, 1, tzinfo=tz.tzutc())
+
+_MONGO_CODECS = ("_mongo_encoders", "_mongo_decoders", "_mongo_lazy_decoders", "_mongo_encoder_map",
+                 "_mongo_store_fields")
+
 class MongoMixin(Mixin):
 
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        for codec in _MONGO_CODECS:
+            setattr(new_cls, codec, LazyClassAttribute(codec, _mongo_codec(codec)))
+        # the paths of mongo_label_projection, by label projection
+        new_cls._mongo_label_paths = {}
+
     @classmethod
     def map_to_mongo(cls, document):
         if document is None:
             return
-        for key, definition in cls._fields.items():
+        for key, encode in cls._mongo_encoders:
             value = document.get(key)
             if value is not None:
-                if isinstance(definition, DefinedDictField) and issubclass(definition.model, MapToMongoMixin):
-                    definition.model.map_to_mongo(value)
-                elif isinstance(definition, ListField) and isinstance(definition.inner_type, DefinedDictField):
-                    for v in value:
-                        definition.inner_type.model.map_to_mongo(v)
-                else:
-                    if hasattr(definition, "reversed_choices") and definition.reversed_choices is not None:
-                        if isinstance(definition, ListField):
-                            document[key] = [ definition.choices.get(v) for v in value ]
-                        else:
-                            document[key] = definition.choices.get(value)
-                    if isinstance(definition, DateTimeField):
-                        document[key] = arrow.get(value).float_timestamp * DATETIME_STORE_PRECISION_V1 # store all datetime microseconds
-                    if hasattr(definition, "store_field"):
-                        document[definition.store_field] = document[key]
-                        document.pop(key)
+                encode(document, value)
 
     @classmethod
     def map_from_mongo(cls, document):
         if document is None:
             return
-        for key, definition in cls._fields.items():
-            if hasattr(definition, "store_field") and definition.store_field in document:
-                document[key] = document.pop(definition.store_field)
-            value = document.get(key)
-            if value is not None:
-                if isinstance(definition, DefinedDictField) and issubclass(definition.model, MapToMongoMixin):
-                    definition.model.map_from_mongo(value)
-                elif isinstance(definition, ListField) and isinstance(definition.inner_type, DefinedDictField):
-                    for v in value:
-                        definition.inner_type.model.map_from_mongo(v)
+        for key, has_store_field, store_field, decode in cls._mongo_decoders:
+            if has_store_field and store_field in document:
+                document[key] = document.pop(store_field)
+            if decode is not None:
+                value = document.get(key)
+                if value is not None:
+                    document[key] = decode(value)
+
+    @classmethod
+    def lazy_from_mongo(cls, document):
+        """Return a LazyMongoDocument of a document read from mongo, document is not modified.
+
+        Only the keys that are read are decoded, materialize() returns what map_from_mongo would.
+        """
+        if document is None:
+            return None
+        return LazyMongoDocument(cls, document)
+
+
+    @classmethod
+    def diff(cls, old, new):
+        """Return the mongo update ({ "$set" : ..., "$unset" : ... }) that turns the stored old document
+        into the stored new document. Both documents are given as they are before map_to_mongo.
+
+        Only the fields of the model are compared, and None is the same as a missing key.
+        Embedded models, MapField and DictField values are compared key by key, other values
+        (including lists) are set as a whole, converted like map_to_mongo would.
+        """
+        sets = {}
+        unsets = {}
+        _diff_fields(cls, True, old, new, "", sets, unsets)
+        update = {}
+        if sets:
+            update["$set"] = sets
+        if unsets:
+            update["$unset"] = unsets
+        return update
+
+    @classmethod
+    def mongo_label_projection(cls, labels, exclude=None):
+        """Return the mongo projection leaving out the fields clean_labels(document, labels, exclude) removes,
+        using the stored keys. None if no field is removed. The model needs LabelMixin.
+        """
+        projection = cls.label_projection(labels, exclude)
+        paths = _cached_projection(cls._mongo_label_paths, projection, _projection_paths, cls, projection)
+        return { path : 0 for path in paths } or None
+
+
+def _projection_paths(model, projection):
+    removed, nested = projection
+    paths = [ _stored_key(model, key) for key in removed ]
+    for key, projection in nested:
+        prefix = _stored_key(model, key) + "."
+        paths.extend(prefix + path for path in _projection_paths(model._fields[key].model, projection))
+    return tuple(paths)
+
+
+def _diff_fields(model, mapped, old, new, prefix, sets, unsets):
+    """Add the changes between the fields of old and new to sets and unsets
+
+    mapped is False when map_to_mongo is not run on the documents (in a MapField, or in a model without MongoMixin).
+    """
+    mapped = mapped and issubclass(model, MongoMixin)
+    for key, definition in model._fields.items():
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if old_value is None and new_value is None:
+            continue
+        path = prefix + (_stored_key(model, key) if mapped else key)
+        if new_value is None:
+            unsets[path] = ""
+        elif old_value != new_value:
+            if isinstance(old_value, dict) and isinstance(new_value, dict):
+                if isinstance(definition, DefinedDictField):
+                    _diff_fields(definition.model, mapped, old_value, new_value, path + ".", sets, unsets)
+                    continue
+                if isinstance(definition, DictField):
+                    _diff_dict(definition, old_value, new_value, path + ".", sets, unsets)
+                    continue
+            sets[path] = _mongo_value(model, key, new_value) if mapped else new_value
+
+
+def _diff_dict(definition, old, new, prefix, sets, unsets):
+    """Add the changes between the values of a MapField or DictField, map_to_mongo does not convert them"""
+    inner_type = getattr(definition, "inner_type", None)
+    for k, old_value in old.items():
+        if k not in new:
+            unsets[prefix + k] = ""
+    for k, new_value in new.items():
+        old_value = old.get(k)
+        if k in old and old_value == new_value:
+            continue
+        if isinstance(inner_type, DefinedDictField) and isinstance(old_value, dict) and isinstance(new_value, dict):
+            _diff_fields(inner_type.model, False, old_value, new_value, prefix + k + ".", sets, unsets)
+        else:
+            sets[prefix + k] = new_value
+
+
+def _mongo_value(model, key, value):
+    """Return the value of a field as map_to_mongo would store it"""
+    encode = model._mongo_encoder_map.get(key)
+    if encode is None:
+        return value
+    document = { key : copy.deepcopy(value) }
+    encode(document, document[key])
+    return next(iter(document.values()))
+
+
+def _stored_key(model, key):
+    """Return the key a field is stored under by map_to_mongo"""
+    definition = model._fields[key]
+    if not issubclass(model, MongoMixin) or not hasattr(definition, "store_field"):
+        return key
+    if isinstance(definition, DefinedDictField) and issubclass(definition.model, MongoMixin):
+        return key
+    if isinstance(definition, ListField) and isinstance(definition.inner_type, DefinedDictField):
+        return key
+    return definition.store_field
+
+
+class LazyMongoDocument(collections.abc.Mapping):
+    """Read only view of a document read from mongo, see MongoMixin.lazy_from_mongo
+
+    A value is decoded the first time its key is read, and the decoded value is kept.
+    Embedded models (also in ListField) are wrapped in their own LazyMongoDocument.
+    """
+
+    __slots__ = ("model", "raw", "_decoded", "_sources")
+
+    def __init__(self, model, raw):
+        self.model = model
+        self.raw = raw
+        self._decoded = {}
+        self._sources = None
+
+    def sources(self):
+        """Return { key : key in raw } in the order of the keys after map_from_mongo"""
+        if self._sources is None:
+            sources = { key : key for key in self.raw }
+            if self.model._mongo_store_fields:
+                for key, has_store_field, store_field, decode in self.model._mongo_decoders:
+                    if has_store_field and store_field in sources:
+                        sources[key] = sources.pop(store_field)
+            self._sources = sources
+        return self._sources
+
+    def __getitem__(self, key):
+        decoded = self._decoded
+        if key in decoded:
+            return decoded[key]
+        value = self.raw[self.sources()[key] if self.model._mongo_store_fields else key]
+        if value is not None and key in self.model._mongo_lazy_decoders:
+            value = self.model._mongo_lazy_decoders[key][0](value)
+        decoded[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in (self.sources() if self.model._mongo_store_fields else self.raw)
+
+    def __iter__(self):
+        return iter(self.sources() if self.model._mongo_store_fields else self.raw)
+
+    def __len__(self):
+        return len(self.sources() if self.model._mongo_store_fields else self.raw)
+
+    def materialize(self):
+        """Return the decoded document as a dict, the same as map_from_mongo on the raw document"""
+        document = {}
+        lazy_decoders = self.model._mongo_lazy_decoders
+        for key in self:
+            value = self[key]
+            if value is not None and key in lazy_decoders and lazy_decoders[key][1] is not None:
+                value = lazy_decoders[key][1](value)
+            document[key] = value
+        return document
+
+    def __repr__(self):
+        return "LazyMongoDocument(%s, %r)" % (self.model.__name__, self.raw)
+
+
+def _mongo_codec(codec):
+    """Return the build of the codec attribute for LazyClassAttribute, which sets all the codecs of the model"""
+    def build(model):
+        codecs = _mongo_codecs(model)
+        for name, value in codecs.items():
+            setattr(model, name, value)
+        return codecs[codec]
+    return build
+
+
+def _mongo_codecs(model):
+    encoders = []
+    decoders = []
+    lazy_decoders = {}
+    store_fields = False
+    for key, definition in model._fields.items():
+        has_store_field = hasattr(definition, "store_field")
+        store_field = getattr(definition, "store_field", None)
+        encode, decode, lazy_decode = _mongo_converters(key, definition, has_store_field, store_field)
+        if encode is not None:
+            encoders.append((key, encode))
+        if decode is not None or has_store_field:
+            decoders.append((key, has_store_field, store_field, decode))
+        if lazy_decode is not None:
+            lazy_decoders[key] = lazy_decode
+        store_fields = store_fields or has_store_field
+    return {
+        "_mongo_encoders" : encoders,
+        "_mongo_decoders" : decoders,
+        "_mongo_lazy_decoders" : lazy_decoders,
+        "_mongo_encoder_map" : dict(encoders),
+        "_mongo_store_fields" : store_fields,
+    }
+
+
+def _materialize(value):
+    return value.materialize() if isinstance(value, LazyMongoDocument) else value
+
+
+def _materialize_list(value):
+    return [ _materialize(v) for v in value ]
+
+
+def _mongo_converters(key, definition, has_store_field, store_field):
+    """Return the (encode, decode, lazy_decode) of a field, None if there is nothing to convert
+
+    encode(document, value) converts the value of the field in document, value is not None.
+    decode(value) returns the value read from mongo converted, value is not None.
+    lazy_decode is (decode(value), materialize(decoded value)) for LazyMongoDocument.
+    """
+    if isinstance(definition, DefinedDictField) and issubclass(definition.model, MongoMixin):
+        model = definition.model
+        def encode(document, value):
+            model.map_to_mongo(value)
+        def decode(value):
+            model.map_from_mongo(value)
+            return value
+        return encode, decode, (model.lazy_from_mongo, _materialize)
+
+    if isinstance(definition, ListField) and isinstance(definition.inner_type, DefinedDictField):
+        model = definition.inner_type.model
+        def encode(document, value):
+            for v in value:
+                model.map_to_mongo(v)
+        def decode(value):
+            for v in value:
+                model.map_from_mongo(v)
+            return value
+        def lazy_decode(value):
+            return [ model.lazy_from_mongo(v) for v in value ]
+        return encode, decode, (lazy_decode, _materialize_list)
+
+    choices = reversed_choices = None
+    if getattr(definition, "reversed_choices", None) is not None:
+        choices, reversed_choices = definition.choices, definition.reversed_choices
+    is_list = isinstance(definition, ListField)
+    is_datetime = isinstance(definition, DateTimeField)
+
+    encode = decode = None
+    if choices is not None or is_datetime or has_store_field:
+        def encode(document, value):
+            if choices is not None:
+                if is_list:
+                    document[key] = [ choices.get(v) for v in value ]
+                else:
+                    document[key] = choices.get(value)
+            if is_datetime:
+                document[key] = datetime_to_microsecond(value)
+            if has_store_field:
+                document[store_field] = document[key]
+                document.pop(key)
+
+    if reversed_choices is not None or is_datetime:
+        def decode(value):
+            if reversed_choices is not None:
+                if is_list:
+                    value = [ reversed_choices.get(v) for v in value ]
                 else:
-                    if hasattr(definition, "reversed_choices") and definition.reversed_choices is not None:
-                        if isinstance(definition, ListField):
-                            document[key] = [ definition.reversed_choices.get(v) for v in value ]
-                        else:
-                            document[key] = definition.reversed_choices.get(value)
-                    if isinstance(definition, DateTimeField):
-                        document[key] = microsecond_to_datetime(document[key])
+                    value = reversed_choices.get(value)
+            if is_datetime:
+                value = microsecond_to_datetime(value)
+            return value
+
+    return encode, decode, (None if decode is None else (decode, None))
 
 
+def datetime_to_microsecond(value):
+    """convert datetime to the microseconds stored in mongo, naive datetime are in UTC.
+    same value as arrow.get(value).float_timestamp * DATETIME_STORE_PRECISION_V1
+    """
+    if not isinstance(value, datetime.datetime):
+        import arrow
+        return arrow.get(value).float_timestamp * DATETIME_STORE_PRECISION_V1
+    delta = value - (_EPOCH if value.utcoffset() is None else _EPOCH_UTC)
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return microseconds / 1000000 * DATETIME_STORE_PRECISION_V1
+
 
 def microsecond_to_datetime(microsecond):
     """convert microsecond to datetime properly.
@@ -89,4 +382,4 @@ def microsecond_to_datetime(microsecond):
     """
     seconds_part = int(microsecond//1e6)
     microseconds_part = int(microsecond%1e6)
-    return arrow.get(seconds_part).replace(microsecond=microseconds_part).datetime
+    return (_EPOCH_READ + datetime.timedelta(seconds=seconds_part)).replace(microsecond=microseconds_part)
@@ -0,0 +1,270 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+validation policy plugin
+
+Validate the documents of trusted producers only in part:
+
+    User.set_validation_policy(ValidationPolicy.sampled(100, key="id"), producer="billing")
+    User.set_validation_policy(ValidationPolicy.type_only(), producer="importer")
+
+    errors = User.get_policy_errors(document, producer="billing")
+    User.get_validation_policy("billing").stats.as_dict()
+
+Policies
+
+    always              get_document_errors.
+    sampled             get_document_errors for 1 in rate documents, the other ones are not validated (no errors).
+                        With key (the name of a field, or key(document)), the documents are chosen with the crc32 of
+                        the repr of the key, which is the same in every process and run : a document is always, or
+                        never, validated. Without key, every rate-th document is validated.
+    type_only           is_required and the type of the fields of the model (allowed_type for the TypedField,
+                        datetime for the DateTimeField). choices, min, max, and the values in lists, maps and
+                        embedded documents are not checked. For the builtin fields, the errors are the ones
+                        get_document_errors gives for these checks, in the same order.
+
+The policy of a call is the policy argument, else the policy of the producer set on the model, else the policy set
+for all producers (producer None), else the document is validated with get_document_errors. The policies are set
+on each model, subclasses do not inherit them.
+
+Each policy counts the documents it checked and the ones that failed in its PolicyStats. A policy can be used
+for several models and producers, it then counts them together.
+"""
+
+import zlib
+import collections
+import datetime
+from ..dict_model import *
+from ..dict_model import _ValidatorCompiler, _count_field_errors
+
+VALIDATE_ALWAYS = "always"
+VALIDATE_SAMPLED = "sampled"
+VALIDATE_TYPE_ONLY = "type_only"
+_MODES = (VALIDATE_ALWAYS, VALIDATE_SAMPLED, VALIDATE_TYPE_ONLY)
+
+
+class ValidationPolicyMixin(Mixin):
+    """
+    Models with this mixin can be validated with a ValidationPolicy, see get_policy_errors.
+    """
+
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        new_cls._validation_policies = {}
+        new_cls._compiled_type_errors = LazyClassAttribute("_compiled_type_errors", _type_only_validator("errors"))
+        new_cls._compiled_type_valid = LazyClassAttribute("_compiled_type_valid", _type_only_validator("valid"))
+
+    @classmethod
+    def set_validation_policy(cls, policy, producer=None):
+        """Validate the documents of producer with policy, producer None for all producers. policy None removes it."""
+        if policy is None:
+            cls._validation_policies.pop(producer, None)
+        else:
+            cls._validation_policies[producer] = policy
+
+    @classmethod
+    def get_validation_policy(cls, producer=None):
+        """Return the policy of producer, None if the documents are validated with get_document_errors"""
+        policies = cls._validation_policies
+        policy = policies.get(producer)
+        if policy is None:
+            policy = policies.get(None)
+        return policy
+
+    @classmethod
+    def get_policy_errors(cls, document, producer=None, policy=None):
+        """Return the errors of the document that the policy checks, an empty list if it is not validated"""
+        if policy is None:
+            policy = cls.get_validation_policy(producer)
+        if policy is None:
+            return cls.get_document_errors(document)
+        return policy.errors(cls, document)
+
+    @classmethod
+    def is_policy_valid(cls, document, producer=None, policy=None):
+        """Same as get_policy_errors, returns False on the first error"""
+        if policy is None:
+            policy = cls.get_validation_policy(producer)
+        if policy is None:
+            return cls.is_document_valid(document)
+        return policy.is_valid(cls, document)
+
+
+class PolicyStats(object):
+    """Counters of a ValidationPolicy
+
+    documents           number of documents given to the policy
+    validated           number of documents validated with get_document_errors (always, and sampled ones)
+    type_checked        number of documents checked with type_only
+    skipped             number of documents not validated by sampled
+    failures            number of documents with errors
+    sampled_failures    number of documents with errors among the sampled ones
+    field_errors        Counter of (key, error), list indexes in the key are replaced with *, only counted by
+                        get_policy_errors
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.validated = 0
+        self.type_checked = 0
+        self.skipped = 0
+        self.failures = 0
+        self.sampled_failures = 0
+        self.field_errors = collections.Counter()
+
+    @property
+    def failure_rate(self):
+        checked = self.validated + self.type_checked
+        return self.failures / checked if checked else 0.0
+
+    def add_errors(self, errors):
+        _count_field_errors(self.field_errors, errors)
+
+    def as_dict(self):
+        return {
+            "documents" : self.documents,
+            "validated" : self.validated,
+            "type_checked" : self.type_checked,
+            "skipped" : self.skipped,
+            "failures" : self.failures,
+            "sampled_failures" : self.sampled_failures,
+            "failure_rate" : self.failure_rate,
+            "field_errors" : { "%s:%s" % key : count for key, count in self.field_errors.items() },
+        }
+
+
+class ValidationPolicy(object):
+    """How the documents are validated, see the module
+
+    mode                VALIDATE_ALWAYS, VALIDATE_SAMPLED or VALIDATE_TYPE_ONLY
+    rate                for VALIDATE_SAMPLED, 1 in rate documents is validated
+    key                 for VALIDATE_SAMPLED, the name of a field or key(document) to choose the documents with,
+                        None to validate every rate-th document
+    stats               PolicyStats to update
+    """
+
+    def __init__(self, mode=VALIDATE_ALWAYS, rate=1, key=None, stats=None):
+        if mode not in _MODES:
+            raise DictValueError(message="Invalid validation policy mode : %r" % (mode, ))
+        if not isinstance(rate, int) or rate < 1:
+            raise DictValueError(message="Invalid sampling rate : %r" % (rate, ))
+        self.mode = mode
+        self.rate = rate
+        self.key = key
+        self.stats = stats or PolicyStats()
+        self._count = 0
+
+    @classmethod
+    def always(cls):
+        return cls(VALIDATE_ALWAYS)
+
+    @classmethod
+    def sampled(cls, rate, key=None):
+        return cls(VALIDATE_SAMPLED, rate, key)
+
+    @classmethod
+    def type_only(cls):
+        return cls(VALIDATE_TYPE_ONLY)
+
+    def is_sampled(self, document):
+        """True if the document is validated by VALIDATE_SAMPLED"""
+        if self.rate == 1:
+            return True
+        key = self.key
+        if key is None:
+            count = self._count
+            self._count = count + 1
+            return count % self.rate == 0
+        value = document.get(key) if isinstance(key, str) else key(document)
+        return zlib.crc32(repr(value).encode()) % self.rate == 0
+
+    def errors(self, model, document):
+        """Return the errors of the document that this policy checks, with model"""
+        stats = self.stats
+        stats.documents += 1
+        if self.mode == VALIDATE_TYPE_ONLY:
+            errors = []
+            model._compiled_type_errors(document, None, errors)
+            stats.type_checked += 1
+        elif self.mode == VALIDATE_SAMPLED and not self.is_sampled(document):
+            stats.skipped += 1
+            return []
+        else:
+            errors = model.get_document_errors(document)
+            stats.validated += 1
+        if errors:
+            stats.failures += 1
+            if self.mode == VALIDATE_SAMPLED:
+                stats.sampled_failures += 1
+            stats.add_errors(errors)
+        return errors
+
+    def is_valid(self, model, document):
+        """Same as errors, returns False on the first error"""
+        stats = self.stats
+        stats.documents += 1
+        if self.mode == VALIDATE_TYPE_ONLY:
+            valid = model._compiled_type_valid(document)
+            stats.type_checked += 1
+        elif self.mode == VALIDATE_SAMPLED and not self.is_sampled(document):
+            stats.skipped += 1
+            return True
+        else:
+            valid = model.is_document_valid(document)
+            stats.validated += 1
+        if not valid:
+            stats.failures += 1
+            if self.mode == VALIDATE_SAMPLED:
+                stats.sampled_failures += 1
+        return valid
+
+    def __repr__(self):
+        if self.mode == VALIDATE_SAMPLED:
+            return "ValidationPolicy(%r, %r, %r)" % (self.mode, self.rate, self.key)
+        return "ValidationPolicy(%r)" % (self.mode, )
+
+
+class _TypeOnlyCompiler(_ValidatorCompiler):
+    """Compile the validator of VALIDATE_TYPE_ONLY, is_required and the type of each field of the model"""
+
+    def field(self, definition, value, node, indent, depth):
+        if isinstance(definition, TypedField):
+            allowed_type = self.constant(definition.allowed_type)
+        elif isinstance(definition, DateTimeField):
+            allowed_type = self.constant(datetime.datetime)
+        else:
+            allowed_type = None
+        if definition.is_required:
+            self.emit(indent, "if %s is None:" % value)
+            self.error(indent + 1, node, Field.ERROR_IS_REQUIRED)
+            if allowed_type is not None:
+                self.emit(indent, "elif not isinstance(%s, %s):" % (value, allowed_type))
+                self.error(indent + 1, node, Field.ERROR_TYPE, value)
+        elif allowed_type is not None:
+            self.emit(indent, "if %s is not None and not isinstance(%s, %s):" % (value, value, allowed_type))
+            self.error(indent + 1, node, Field.ERROR_TYPE, value)
+
+
+def _type_only_validator(mode):
+    def build(cls):
+        return staticmethod(_TypeOnlyCompiler(cls, mode).compile())
+    return build
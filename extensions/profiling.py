@@ -0,0 +1,404 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+profiling plugin
+
+Records, for each model and each dotted path of its fields, the number of calls, the time spent, the errors
+found (by type) and the number of elements of the lists and maps, while validating, cleaning, updating and
+mapping to/from mongo.
+
+    enable_profiling()                  # all the models with ProfilingMixin, or enable_profiling(User)
+    ...
+    snapshot = profile_snapshot()
+    write_collapsed_stacks("profile.txt")   # flamegraph.pl profile.txt > profile.svg
+    disable_profiling()
+
+Profiling is off until it is enabled. Enabling a model replaces its validators, clean_document, update and
+map_to_mongo/map_from_mongo with versions that record what they do, disabling it puts the original ones
+back, so a model that is not profiled runs exactly the same code as without the mixin.
+
+The profiled versions are slower, they walk the fields one by one instead of using the compiled validators.
+get_document_errors with max_errors is not recorded.
+"""
+
+import inspect
+import threading
+import time
+from ..dict_model import *
+from ..dict_model import _path_string, _child_path, _replan, _ErrorLimitReached
+
+# the stats of each stack, { (operation, model, key, ..., nested model, key, ...) : [ calls, time, errors, elements ] }
+# errors is { error type : count }, "*" is used for the index of a list and the key of a map.
+_STATS = {}
+_PROFILED_MODELS = []
+_ENABLED = {}
+_INHERITED = object()
+_LOCAL = threading.local()
+
+
+class ProfilingMixin(Mixin):
+    """
+    Models with this mixin can be profiled, see enable_profiling.
+    """
+
+    @classmethod
+    def _apply_mixin(cls, new_cls, name, bases, cdict):
+        _PROFILED_MODELS.append(new_cls)
+
+    @classmethod
+    def enable_profiling(cls):
+        enable_profiling(cls)
+
+    @classmethod
+    def disable_profiling(cls):
+        disable_profiling(cls)
+
+
+def enable_profiling(*models):
+    """Start recording the models, all the models with ProfilingMixin if none are given"""
+    enabled = [ model for model in (models or _PROFILED_MODELS) if model not in _ENABLED ]
+    for model in enabled:
+        _ENABLED[model] = _instrument(model)
+    _replan(enabled)
+
+
+def disable_profiling(*models):
+    """Stop recording the models, all of them if none are given. What was recorded is kept."""
+    disabled = []
+    for model in (models or list(_ENABLED)):
+        saved = _ENABLED.pop(model, None)
+        if saved is None:
+            continue
+        for name, value in saved.items():
+            if value is _INHERITED:
+                delattr(model, name)
+            else:
+                setattr(model, name, value)
+        disabled.append(model)
+    _replan(disabled)
+
+
+def is_profiling(model):
+    return model in _ENABLED
+
+
+def reset_profile():
+    _STATS.clear()
+
+
+def profile_snapshot():
+    """Return what was recorded as { operation : { model name : { path : stats } } }
+
+    operation           "validate", "clean", "update", "map_to_mongo" or "map_from_mongo"
+    path                the dotted path in the model, "" for the whole document, "*" stands for any index
+                        of a list or key of a map.
+    stats               { "calls" : int, "time" : seconds, "errors" : { error type : count }, "elements" : int }
+                        time includes the time spent in the nested values, elements is the total number of
+                        elements of the lists and maps found at the path.
+
+    The fields of a nested model are recorded under the nested model.
+    """
+    snapshot = {}
+    for stack, (calls, seconds, errors, elements) in list(_STATS.items()):
+        index = max(i for i, frame in enumerate(stack) if isinstance(frame, type))
+        models = snapshot.setdefault(stack[0], {})
+        paths = models.setdefault(stack[index].__name__, {})
+        stats = paths.setdefault(".".join(stack[index + 1:]), { "calls" : 0, "time" : 0.0, "errors" : {}, "elements" : 0 })
+        stats["calls"] += calls
+        stats["time"] += seconds
+        stats["elements"] += elements
+        for error, count in errors.items():
+            stats["errors"][error] = stats["errors"].get(error, 0) + count
+    return snapshot
+
+
+def collapsed_stacks():
+    """Return what was recorded in the stack-collapsed format of flamegraph.pl, one line for each stack:
+
+        validate;User;addresses;*;Address;street 1520
+
+    The count is the time spent in the stack itself (without its children) in microseconds.
+    """
+    stats = list(_STATS.items())
+    children = {}
+    for stack, stat in stats:
+        if len(stack) > 1:
+            children[stack[:-1]] = children.get(stack[:-1], 0.0) + stat[1]
+    lines = []
+    for stack, stat in sorted(stats, key=lambda item: [ _frame_name(frame) for frame in item[0] ]):
+        microseconds = int(round((stat[1] - children.get(stack, 0.0)) * 1e6))
+        if microseconds > 0:
+            lines.append("%s %d" % (";".join(_frame_name(frame) for frame in stack), microseconds))
+    return "".join(line + "\n" for line in lines)
+
+
+def write_collapsed_stacks(path):
+    with open(path, "w") as f:
+        f.write(collapsed_stacks())
+
+#################################### Recording ####################################
+def _frame_name(frame):
+    name = frame.__name__ if isinstance(frame, type) else str(frame)
+    return name.replace(";", "_").replace(" ", "_")
+
+
+def _stack():
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+def _record(stack, seconds, errors=(), elements=0):
+    stat = _STATS.get(stack)
+    if stat is None:
+        stat = _STATS[stack] = [0, 0.0, {}, 0]
+    stat[0] += 1
+    stat[1] += seconds
+    stat[3] += elements
+    if errors:
+        counts = stat[2]
+        for error in errors:
+            counts[error[1]] = counts.get(error[1], 0) + 1
+
+
+def _enter(operation, model):
+    """Push the frames of a call of model, the operation is only pushed if the call is not nested"""
+    stack = _stack()
+    depth = len(stack)
+    if not depth:
+        stack.append(operation)
+    stack.append(model)
+    return stack, depth
+
+
+def _elements(definition, value):
+    if isinstance(definition, ListField) and isinstance(value, list):
+        return len(value)
+    if isinstance(definition, MapField) and isinstance(value, dict):
+        return len(value)
+    return 0
+
+#################################### Instrumented methods ####################################
+def _instrument(model):
+    """Replace the methods of model with the profiled ones, return the original attributes"""
+    methods = {
+        "_compiled_errors" : staticmethod(_profiled_errors(model)),
+        "_compiled_valid" : staticmethod(_profiled_valid(model)),
+        "_yield_errors" : _profiled_method(model, "_yield_errors", _profiled_yield_errors),
+        "clean_document" : _profiled_method(model, "clean_document", _profiled_clean_document),
+        "update" : _profiled_method(model, "update", _profiled_update),
+    }
+    if hasattr(model, "_mongo_encoders"):
+        methods["map_to_mongo"] = _profiled_method(model, "map_to_mongo", _profiled_map_to_mongo)
+        methods["map_from_mongo"] = _profiled_method(model, "map_from_mongo", _profiled_map_from_mongo)
+    saved = { name : model.__dict__.get(name, _INHERITED) for name in methods }
+    for name, value in methods.items():
+        setattr(model, name, value)
+    return saved
+
+
+def _profiled_method(model, name, profiled):
+    """Return the classmethod that replaces name in model.
+
+    The subclasses of model inherit it, the ones that are not profiled are given to the original method.
+    """
+    original = inspect.getattr_static(model, name)
+    def method(cls, *args, **kwargs):
+        if cls is not model:
+            return original.__get__(None, cls)(*args, **kwargs)
+        return profiled(cls, *args, **kwargs)
+    return classmethod(method)
+
+
+
+
+def _walk_model(model, document, parent, errors):
+    stack = _stack()
+    for key, definition in model._fields.items():
+        stack.append(key)
+        _walk_field(definition, document.get(key), key if parent is None else ".".join([parent, key]), errors)
+        stack.pop()
+
+
+def _walk_field(definition, value, key, errors):
+    """Add the errors of the value to errors like definition.errors would, recording the nested values
+    under their own path"""
+    stack = _stack()
+    start = time.perf_counter()
+    first = len(errors)
+    elements = 0
+    method = type(definition).errors
+    if method is DefinedDictField.errors:
+        errors.extend(TypedField.errors(definition, value, key))
+        last = len(errors)
+        if isinstance(value, dict):
+            stack.append(definition.model)
+            _walk_model(definition.model, value, key, errors)
+            stack.pop()
+    elif method is ListField.errors and definition.inner_type is not None and isinstance(value, list):
+        errors.extend(TypedField.errors(definition, value, key))
+        last = len(errors)
+        elements = len(value)
+        stack.append("*")
+        for index, inner in enumerate(value):
+            _walk_field(definition.inner_type, inner, ".".join([key, str(index)]), errors)
+        stack.pop()
+    elif method is MapField.errors and isinstance(value, dict):
+        errors.extend(TypedField.errors(definition, value, key))
+        last = len(errors)
+        elements = len(value)
+        stack.append("*")
+        for k, inner in value.items():
+            _walk_field(definition.inner_type, inner, ".".join([key, k]), errors)
+        stack.pop()
+    else:
+        errors.extend(definition.errors(value, key))
+        last = len(errors)
+    _record(tuple(stack), time.perf_counter() - start, errors[first:last], elements)
+
+
+def _profiled_errors(model):
+    def errors(document, parent, errors):
+        stack, depth = _enter("validate", model)
+        start = time.perf_counter()
+        try:
+            _walk_model(model, document, None if parent is None else _path_string(parent), errors)
+            _record(tuple(stack), time.perf_counter() - start)
+        finally:
+            del stack[depth:]
+    return errors
+
+
+class _FirstError(list):
+    """Errors list of is_document_valid, stops the validation at the first error"""
+
+    def extend(self, errors):
+        for error in errors:
+            self.append(error)
+            raise _ErrorLimitReached()
+
+
+def _profiled_valid(model):
+    def valid(document):
+        try:
+            model._compiled_errors(document, None, _FirstError())
+        except _ErrorLimitReached:
+            return False
+        return True
+    return valid
+
+
+def _profiled_yield_errors(cls, document, parent=None):
+    errors = []
+    cls._compiled_errors(document, None if parent is None else (None, parent), errors)
+    yield from errors
+
+
+def _profiled_clean_document(cls, document, set_default=True, remove_undefined=True):
+    if document is None:
+        return document
+    stack, depth = _enter("clean", cls)
+    start = time.perf_counter()
+    try:
+        fields = cls._fields
+        for key, step in cls._clean_plan:
+            stack.append(key)
+            step_start = time.perf_counter()
+            step(document, key, set_default, remove_undefined)
+            elapsed = time.perf_counter() - step_start
+            # the steps accept documents that are not dicts when there is nothing to clean
+            _record(tuple(stack), elapsed, (), _elements(fields[key], document.get(key)) if isinstance(document, dict) else 0)
+            stack.pop()
+        if remove_undefined:
+            field_keys = cls._field_keys
+            for key in [ key for key in document if key not in field_keys ]:
+                document.pop(key)
+        _record(tuple(stack), time.perf_counter() - start)
+    finally:
+        del stack[depth:]
+    return document
+
+
+def _profiled_update(cls, document, new_value, changed=None, parent=None):
+    stack, depth = _enter("update", cls)
+    start = time.perf_counter()
+    try:
+        for key, value in new_value.items():
+            if key in cls._fields:
+                definition = cls._fields.get(key)
+                stack.append(key)
+                key_start = time.perf_counter()
+                if changed is None:
+                    definition.update(document, key, value)
+                else:
+                    definition.update(document, key, value, changed=changed, path=_child_path(parent, key))
+                _record(tuple(stack), time.perf_counter() - key_start, (), _elements(definition, value))
+                stack.pop()
+        _record(tuple(stack), time.perf_counter() - start)
+    finally:
+        del stack[depth:]
+    return changed
+
+
+def _profiled_map_to_mongo(cls, document):
+    if document is None:
+        return
+    stack, depth = _enter("map_to_mongo", cls)
+    start = time.perf_counter()
+    try:
+        fields = cls._fields
+        for key, encode in cls._mongo_encoders:
+            value = document.get(key)
+            if value is not None:
+                stack.append(key)
+                key_start = time.perf_counter()
+                encode(document, value)
+                _record(tuple(stack), time.perf_counter() - key_start, (), _elements(fields[key], value))
+                stack.pop()
+        _record(tuple(stack), time.perf_counter() - start)
+    finally:
+        del stack[depth:]
+
+
+def _profiled_map_from_mongo(cls, document):
+    if document is None:
+        return
+    stack, depth = _enter("map_from_mongo", cls)
+    start = time.perf_counter()
+    try:
+        fields = cls._fields
+        for key, has_store_field, store_field, decode in cls._mongo_decoders:
+            stack.append(key)
+            key_start = time.perf_counter()
+            if has_store_field and store_field in document:
+                document[key] = document.pop(store_field)
+            value = None
+            if decode is not None:
+                value = document.get(key)
+                if value is not None:
+                    document[key] = decode(value)
+            _record(tuple(stack), time.perf_counter() - key_start, (), _elements(fields[key], value))
+            stack.pop()
+        _record(tuple(stack), time.perf_counter() - start)
+    finally:
+        del stack[depth:]
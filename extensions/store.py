@@ -0,0 +1,308 @@
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#                   Version 2, December 2004
+#
+# Copyright (C) 2015- ZwodahS(github.com/ZwodahS)
+# zwodahs.github.io
+#
+# Everyone is permitted to copy and distribute verbatim or modified
+# copies of this license document, and changing it is allowed as long
+# as the name is changed.
+#
+#           DO WHAT THE F*** YOU WANT TO PUBLIC LICENSE
+#   TERMS AND CONDITIONS FOR COPYING, DISTRIBUTION AND MODIFICATION
+#
+#  0. You just DO WHAT THE F*** YOU WANT TO.
+#
+# This program is free software. It comes without any warranty, to
+# the extent permitted by applicable law. You can redistribute it
+# and/or modify it under the terms of the Do What The Fuck You Want
+# To Public License, Version 2, as published by Sam Hocevar. See
+# http://sam.zoy.org/wtfpl/COPYING for more details.
+
+"""
+store plugin, requires binary
+
+An append only file of the documents of one model, read through mmap.
+
+    store = DocumentStore(User, "users.dms")
+    rejected = store.append_many(documents)         # [ (position, errors) ] of the documents not stored
+    store[10]["name"]                               # only name is decoded
+    for document in store.scan(["name", "age"]):    # the other fields are skipped
+        ...
+
+The data file starts with a header (magic, schema fingerprint) and is followed by the records :
+
+    uint32              size of the record
+    uint32 * fields     offset of each field from the start of the body
+    body                the fields, packed like BinaryMixin.pack (without the fingerprint)
+
+The offset of each record is kept in path + ".idx" (uint64 each), and rebuilt from the data file if it
+is missing or behind.
+"""
+
+import os
+import sys
+import mmap
+import array
+import struct
+import collections.abc
+from ..dict_model import *
+from .binary import _model_codec, _field_codecs, _MISSING, FINGERPRINT_SIZE
+
+MAGIC = b"DMST\x01"
+_HEADER_SIZE = len(MAGIC) + FINGERPRINT_SIZE
+_SIZE = struct.Struct("<I")
+
+
+class DocumentStore(object):
+    """Store the documents of model in the file at path, the file is created if needed.
+
+    Raise DictValueError if the file was written with another schema.
+    """
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self._codec = _model_codec(model)
+        self._fields = _field_codecs(model)
+        self._field_index = { key : index for index, (key, encode, decode) in enumerate(self._fields) }
+        self._table = struct.Struct("<%dI" % (len(self._fields), ))
+        self._body_offset = _SIZE.size + self._table.size
+        self._header = MAGIC + self._codec.fingerprint
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as f:
+                f.write(self._header)
+        with open(path, "rb") as f:
+            header = f.read(_HEADER_SIZE)
+        if header != self._header:
+            raise DictValueError(message="%s was not written with the schema of %s" % (path, model.__name__))
+
+        self._offsets = array.array("Q")
+        self._size = _HEADER_SIZE
+        self._load_index()
+        self._data = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        self._mmap = None
+        self._view = None
+        self._mapped = 0
+
+    #################################### Writing ####################################
+    def append(self, document, validate=True):
+        """Store a document and return its index.
+
+        Raise DictValueError if validate and the document has errors (get_document_errors).
+        """
+        rejected = self.append_many([ document ], validate=validate)
+        if rejected:
+            raise DictValueError(message="invalid document : %r" % (rejected[0][1], ))
+        return len(self._offsets) - 1
+
+    def append_many(self, documents, validate=True):
+        """Store the valid documents, in order, and return [ (position, errors) ] of the others.
+
+        position is the position of the document in documents.
+        """
+        rejected = []
+        records = []
+        offsets = array.array("Q")
+        offset = self._size
+        for position, document in enumerate(documents):
+            if validate:
+                errors = self.model.get_document_errors(document)
+                if errors:
+                    rejected.append((position, errors))
+                    continue
+            record = self._record(document)
+            records.append(record)
+            offsets.append(offset)
+            offset += len(record)
+        if records:
+            self._data.write(b"".join(records))
+            self._data.flush()
+            self._index.write(_little_endian(offsets).tobytes())
+            self._index.flush()
+            self._offsets.extend(offsets)
+            self._size = offset
+        return rejected
+
+    def _record(self, document):
+        out = []
+        positions = []
+        position = 0
+        get = document.get
+        for key, encode, decode in self._fields:
+            positions.append(position)
+            start = len(out)
+            encode(get(key, _MISSING), out)
+            position += sum(len(part) for part in out[start:])
+        return b"".join([ _SIZE.pack(self._body_offset + position), self._table.pack(*positions) ] + out)
+
+    #################################### Reading ####################################
+    def __len__(self):
+        return len(self._offsets)
+
+    def raw(self, index):
+        """The record at index as a memoryview of the file, see the module documentation"""
+        view = self._mapped_view()
+        start = self._offsets[index]
+        return view[start:start + _SIZE.unpack_from(view, start)[0]]
+
+    def __getitem__(self, index):
+        """The document at index as a StoredDocument, its fields are decoded when they are read"""
+        return StoredDocument(self, self.raw(index))
+
+    def __iter__(self):
+        for index in range(len(self._offsets)):
+            yield self[index]
+
+    def scan(self, fields=None, start=0, stop=None):
+        """Yield the documents from start to stop as dicts, only fields are decoded (all if None).
+
+        Missing keys are left out, as in the stored documents.
+        """
+        view = self._mapped_view()
+        offsets = self._offsets
+        indexes = range(*slice(start, stop).indices(len(offsets)))
+        if fields is None:
+            decode = self._codec.decode
+            skip = self._body_offset
+            for index in indexes:
+                yield decode(view, offsets[index] + skip)[0]
+            return
+
+        decoders = []
+        for key in fields:
+            index = self._field_index.get(key)
+            if index is None:
+                raise DictValueError(message="%s is not a field of %s" % (key, self.model.__name__))
+            decoders.append((key, index, self._fields[index][2]))
+        unpack = self._table.unpack_from
+        skip = self._body_offset
+        for index in indexes:
+            offset = offsets[index]
+            positions = unpack(view, offset + _SIZE.size)
+            body = offset + skip
+            document = {}
+            for key, index, decode in decoders:
+                value = decode(view, body + positions[index])[0]
+                if value is not _MISSING:
+                    document[key] = value
+            yield document
+
+    def _decode_field(self, record, key):
+        index = self._field_index[key]
+        position = self._table.unpack_from(record, _SIZE.size)[index]
+        return self._fields[index][2](record, self._body_offset + position)[0]
+
+    def _mapped_view(self):
+        if self._mapped != self._size:
+            # the old map stays alive as long as memoryviews of it are used
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), self._size, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            self._mapped = self._size
+        return self._view
+
+    #################################### Files ####################################
+    def _load_index(self):
+        data_size = os.path.getsize(self.path)
+        index_path = self.path + ".idx"
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as f:
+                content = f.read()
+            self._offsets.frombytes(content[:len(content) - len(content) % 8])
+            _little_endian(self._offsets)
+        # drop the offsets past the end of the data, then read the records the index does not have
+        while self._offsets and self._offsets[-1] >= data_size:
+            self._offsets.pop()
+        offset = _HEADER_SIZE
+        if self._offsets:
+            offset = self._offsets.pop()
+        with open(self.path, "rb") as f:
+            while offset + _SIZE.size <= data_size:
+                f.seek(offset)
+                size = _SIZE.unpack(f.read(_SIZE.size))[0]
+                # a size smaller than the record header is not a record (zeroed or preallocated tail)
+                if size < self._body_offset or offset + size > data_size:
+                    break
+                self._offsets.append(offset)
+                offset += size
+        if offset != data_size:
+            # an incomplete or corrupted record, from a write that did not finish
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+        self._size = offset
+        with open(index_path, "wb") as f:
+            f.write(_little_endian(array.array("Q", self._offsets)).tobytes())
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+        self._view = None
+        self._mmap = None
+        self._mapped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class StoredDocument(collections.abc.Mapping):
+    """A document of a DocumentStore, each field is decoded the first time it is read.
+
+    record is the memoryview of the record in the file.
+    """
+
+    __slots__ = ("store", "record", "_decoded")
+
+    def __init__(self, store, record):
+        self.store = store
+        self.record = record
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        decoded = self._decoded
+        if key in decoded:
+            value = decoded[key]
+        elif key in self.store._field_index:
+            value = decoded[key] = self.store._decode_field(self.record, key)
+        else:
+            raise KeyError(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for key, encode, decode in self.store._fields:
+            if key in self:
+                yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def materialize(self):
+        """Return the whole document as a dict"""
+        return self.store._codec.decode(self.record, self.store._body_offset)[0]
+
+    def __repr__(self):
+        return "StoredDocument(%r)" % (self.materialize(), )
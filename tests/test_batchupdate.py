@@ -0,0 +1,91 @@
+"""
+Tests of the batch update extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+batchupdate = importlib.import_module(PACKAGE + ".extensions.batchupdate")
+
+
+class Item(dict_model.DefinedDict):
+    name = dict_model.StringField()
+    score = dict_model.FloatField()
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+
+
+class BatchUpdaterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stored = { i : { "name" : "item%d" % i, "score" : 0.0, "counters" : {} } for i in range(3) }
+        self.written = {}
+        self.failing = set()
+
+    def load(self, document_id):
+        document = self.stored.get(document_id)
+        return None if document is None else copy.deepcopy(document)
+
+    def write(self, document_id, document, changed):
+        if document_id in self.failing:
+            raise IOError("write failed")
+        self.stored[document_id] = document
+        self.written[document_id] = changed
+
+    def updater(self, **kwargs):
+        return batchupdate.BatchUpdater(Item, self.load, self.write, flush_size=None, flush_window=None, **kwargs)
+
+    def test_merged(self):
+        updater = self.updater()
+        updater.add(0, { "counters" : { "a" : 1 } })
+        updater.add(0, { "counters" : { "b" : 2 }, "score" : 1 })
+        updater.add(1, { "name" : "x" })
+        self.assertEqual(len(updater), 3)
+        self.assertEqual(updater.flush(), 2)
+        self.assertEqual(self.stored[0], { "name" : "item0", "score" : 1.0, "counters" : { "a" : 1, "b" : 2 } })
+        self.assertEqual(self.written[0], { "counters.a", "counters.b", "score" })
+        self.assertEqual(updater.stats.merged, 1)
+        self.assertEqual(updater.stats.rounds, 2)
+        self.assertEqual(len(updater), 0)
+
+    def test_write_raises(self):
+        updater = self.updater()
+        for i in range(3):
+            updater.add(i, { "counters" : { "a" : i } })
+        updater.add(1, { "counters" : { "b" : 1 } })
+        self.failing.add(1)
+        self.assertRaises(IOError, updater.flush)
+        # the first document is written, the failed one and the ones after it are still pending
+        self.assertEqual(self.stored[0]["counters"], { "a" : 0 })
+        self.assertEqual(self.stored[1]["counters"], {})
+        self.assertEqual(len(updater), 3)
+        self.assertIsNotNone(updater._oldest)
+
+        self.failing.clear()
+        updater.flush_window = 0
+        self.assertEqual(updater.poll(), 2)
+        self.assertEqual(self.stored[1]["counters"], { "a" : 1, "b" : 1 })
+        self.assertEqual(self.stored[2]["counters"], { "a" : 2 })
+        self.assertEqual(len(updater), 0)
+        self.assertEqual(updater.stats.documents, 3)
+
+    def test_missing(self):
+        updater = self.updater()
+        updater.add(5, { "name" : "x" })
+        self.assertEqual(updater.flush(), 0)
+        self.assertEqual(updater.stats.missing, 1)
+        self.assertEqual(len(updater), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
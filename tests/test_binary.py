@@ -0,0 +1,74 @@
+"""
+Tests of the binary extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import datetime
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+binary = importlib.import_module(PACKAGE + ".extensions.binary")
+
+
+class Inner(dict_model.DefinedDict):
+    s = dict_model.StringField()
+
+
+class Document(dict_model.DefinedDict, binary.BinaryMixin):
+    a = dict_model.DefinedDictField(Inner)
+    items = dict_model.ListField(inner_type=dict_model.DefinedDictField(Inner))
+    extra = dict_model.DictField()
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+    anything = dict_model.Field()
+    created = dict_model.DateTimeField()
+
+
+class BinaryTest(unittest.TestCase):
+
+    def round_trip(self, document):
+        return Document.unpack(Document.pack(document))
+
+    def test_round_trip(self):
+        document = {
+            "a" : { "s" : "y" },
+            "items" : [ { "s" : "x" }, None ],
+            "extra" : { "k" : [ 1, 2.5, "v", { "z" : None } ] },
+            "counters" : { "c" : 1 },
+            "anything" : (1, b"bytes", True),
+            "created" : datetime.datetime(2015, 1, 2, 3, 4, 5, 6),
+        }
+        self.assertEqual(self.round_trip(document), document)
+
+    def test_undefined_keys_are_dropped(self):
+        document = { "a" : { "s" : "y", "zz" : 2 }, "items" : [ { "s" : "x", "zz" : 3 } ], "zz" : 1,
+                     "extra" : { "zz" : 4 }, "anything" : { "zz" : 5 } }
+        self.assertEqual(self.round_trip(document), {
+            "a" : { "s" : "y" }, "items" : [ { "s" : "x" } ], "extra" : { "zz" : 4 }, "anything" : { "zz" : 5 } })
+
+    def test_date(self):
+        day = datetime.date(2015, 1, 2)
+        document = { "anything" : [ day, { "d" : day } ], "created" : day, "extra" : { "d" : day } }
+        unpacked = self.round_trip(document)
+        self.assertEqual(unpacked, document)
+        self.assertIs(type(unpacked["created"]), datetime.date)
+        self.assertIs(type(unpacked["anything"][0]), datetime.date)
+
+    def test_aware_datetime(self):
+        created = datetime.datetime(2015, 1, 2, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+        self.assertEqual(self.round_trip({ "created" : created })["created"], created)
+
+    def test_unsupported_type(self):
+        self.assertRaises(dict_model.DictValueError, Document.pack, { "anything" : datetime.time(1, 2) })
+
+
+if __name__ == "__main__":
+    unittest.main()
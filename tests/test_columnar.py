@@ -0,0 +1,103 @@
+"""
+Tests of the columnar extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import random
+import datetime
+import unittest
+import unittest.mock
+import importlib
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+columnar = importlib.import_module(PACKAGE + ".extensions.columnar")
+
+
+class Row(dict_model.DefinedDict, columnar.ColumnarMixin):
+    count = dict_model.IntField(is_required=True)
+    ratio = dict_model.FloatField()
+    level = dict_model.IntField(choices=[0, 1, 2, 3], min=1, max=2)
+    flag = dict_model.BoolField()
+    kind = dict_model.StringField(choices=["a", "b"], is_required=True)
+    tag = dict_model.Field(choices={ "x" : 1, 2 : "y" })
+    name = dict_model.StringField()
+    items = dict_model.ListField(inner_type=dict_model.IntField())
+
+
+NUMBERS = [ 0, 1, 2, 3, -1, 2 ** 70, 1.5, 2.0, True, False ]
+HASHABLES = NUMBERS + [ "a", "b", "x", datetime.datetime(2015, 1, 2) ]
+VALUES = HASHABLES + [ [], [ 1, "a" ], {} ]
+# the values given to each field, min/max cannot be compared with other types than numbers and dict choices
+# cannot look up unhashable values, get_document_errors raises on both
+POOLS = { "level" : NUMBERS, "tag" : HASHABLES }
+
+
+def random_documents(rng):
+    """Documents whose columns only hold a few types, so that all the ways of checking a column are used"""
+    pools = {}
+    for key in Row._fields:
+        pool = POOLS.get(key, VALUES)
+        pools[key] = rng.sample(pool, rng.randrange(1, 4)) + ([ None ] if rng.random() < 0.5 else [])
+    documents = []
+    for i in range(rng.randrange(1, 30)):
+        document = {}
+        for key, pool in pools.items():
+            if rng.random() < 0.9:
+                document[key] = rng.choice(pool)
+        documents.append(document)
+    return documents
+
+
+class ColumnarTest(unittest.TestCase):
+    """The numpy checks give the errors of the pure python path, get_document_errors"""
+
+    def pure(self, method, *args):
+        with unittest.mock.patch.object(columnar, "numpy", None):
+            return method(*args)
+
+    def test_random_documents(self):
+        rng = random.Random(0)
+        for i in range(300):
+            documents = random_documents(rng)
+            with self.subTest(i=i, documents=documents):
+                errors = Row.get_columnar_errors(documents)
+                self.assertEqual(errors, self.pure(Row.get_columnar_errors, documents))
+                self.assertEqual(errors, [ Row.get_document_errors(document) for document in documents ])
+                # the values are the python values of the documents
+                self.assertEqual(repr(errors), repr(self.pure(Row.get_columnar_errors, documents)))
+
+                columns = { key : [ document.get(key) for document in documents ] for key in Row._fields }
+                self.assertEqual(Row.get_column_errors(columns), errors)
+
+    def test_arrays(self):
+        rng = numpy.random.default_rng(0)
+        columns = {
+            "count" : rng.integers(-3, 3, 50),
+            "ratio" : rng.random(50) * 3,
+            "level" : rng.integers(0, 4, 50),
+            "flag" : rng.random(50) < 0.5,
+            "kind" : [ "a", "c" ] * 25,
+            "tag" : rng.integers(0, 3, 50),
+        }
+        errors = Row.get_column_errors(columns)
+        expected = self.pure(Row.get_column_errors, { key : list(values) if isinstance(values, list) else values.tolist()
+                                                      for key, values in columns.items() })
+        self.assertEqual(errors, expected)
+        self.assertEqual(repr(errors), repr(expected))
+        self.assertTrue(any(errors))
+
+
+if __name__ == "__main__":
+    unittest.main()
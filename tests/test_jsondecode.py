@@ -0,0 +1,219 @@
+"""
+Tests of the json decoder extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import io
+import os
+import sys
+import json
+import random
+import datetime
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+jsondecode = importlib.import_module(PACKAGE + ".extensions.jsondecode")
+
+
+class Address(dict_model.DefinedDict):
+    street = dict_model.StringField(is_required=True)
+    kind = dict_model.StringField(choices=["home", "work"], default="home")
+    since = dict_model.DateTimeField()
+
+
+class User(dict_model.DefinedDict, jsondecode.JsonDecoderMixin):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField(min=0, max=150)
+    score = dict_model.FloatField()
+    active = dict_model.BoolField(default=True)
+    created = dict_model.DateTimeField()
+    tags = dict_model.ListField(inner_type=dict_model.StringField())
+    raw = dict_model.ListField(remove_none_value=False)
+    address = dict_model.DefinedDictField(Address)
+    required_address = dict_model.DefinedDictField(Address, is_required=True, default=None)
+    addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address))
+    kept = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address, is_required=True),
+                                remove_none_value=False)
+    counters = dict_model.MapField(inner_type=dict_model.IntField())
+    places = dict_model.MapField(inner_type=dict_model.DefinedDictField(Address))
+    groups = dict_model.MapField(inner_type=dict_model.ListField(inner_type=dict_model.DefinedDictField(Address)))
+    optional = dict_model.MapField(inner_type=dict_model.IntField(), ensure_dict=False, remove_none_value=False)
+    extra = dict_model.DictField()
+    anything = dict_model.Field()
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(8 if depth < 3 else 6)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return rng.randrange(-5, 200)
+    if kind == 2:
+        return rng.choice(["", "home", "work", "2015-01-02T03:04:05", "a\"b\\cé\n"])
+    if kind == 3:
+        return rng.random() * 10
+    if kind == 4:
+        return rng.choice([True, False])
+    if kind == 5:
+        return rng.choice([[], {}])
+    if kind == 6:
+        return [ random_value(rng, depth + 1) for i in range(rng.randrange(4)) ]
+    return { rng.choice(["a", "b", "street", "kind"]) : random_value(rng, depth + 1) for i in range(rng.randrange(4)) }
+
+
+def random_address(rng):
+    if rng.random() < 0.2:
+        return random_value(rng, 2)
+    address = {}
+    for key in ("street", "kind", "since", "undefined"):
+        if rng.random() < 0.7:
+            address[key] = rng.choice([ random_value(rng, 2), "home", "2015-01-02T03:04:05" ])
+    return address
+
+
+def random_user(rng):
+    user = {}
+    values = {
+        "name" : lambda: rng.choice([ "name", None, 3 ]),
+        "age" : lambda: rng.choice([ 20, -1, 200, "20", None ]),
+        "score" : lambda: rng.choice([ 1.5, 2, "x" ]),
+        "active" : lambda: rng.choice([ True, None, 1 ]),
+        "created" : lambda: rng.choice([ "2015-01-02T03:04:05", "not a date", 3, None ]),
+        "tags" : lambda: rng.choice([ [ "a", None, 3 ], None, "tags", [] ]),
+        "raw" : lambda: [ random_value(rng, 1) for i in range(3) ],
+        "address" : lambda: random_address(rng),
+        "required_address" : lambda: rng.choice([ None, random_address(rng) ]),
+        "addresses" : lambda: rng.choice([ [ random_address(rng) for i in range(3) ], random_address(rng) ]),
+        "kept" : lambda: [ random_address(rng), None ],
+        "counters" : lambda: rng.choice([ { "a" : 1, "b" : None, "c" : "x" }, None, {} ]),
+        "places" : lambda: { "home" : random_address(rng), "none" : None, "other" : random_address(rng) },
+        "groups" : lambda: { "g" : [ random_address(rng), None ], "h" : None, "i" : rng.choice([ None, 3, [] ]) },
+        "optional" : lambda: rng.choice([ None, { "a" : None, "b" : 2 } ]),
+        "extra" : lambda: random_value(rng),
+        "anything" : lambda: random_value(rng),
+        "undefined" : lambda: random_value(rng),
+        "deep" : lambda: [ { "x" : [ random_value(rng) ] } ],
+    }
+    keys = list(values)
+    rng.shuffle(keys)
+    for key in keys:
+        if rng.random() < 0.7:
+            user[key] = values[key]()
+    return user
+
+
+def reference(text, set_default=True, remove_undefined=True):
+    document = json.loads(text)
+    User.clean_document(document, set_default=set_default, remove_undefined=remove_undefined)
+    return document, User.get_document_errors(document)
+
+
+def cleans(user):
+    try:
+        reference(json.dumps(user))
+        return True
+    except (AttributeError, TypeError):
+        # clean_document raises for some values of the embedded documents
+        return False
+
+
+class JsonDecodeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chunk_size = jsondecode.CHUNK_SIZE
+
+    def tearDown(self):
+        jsondecode.CHUNK_SIZE = self.chunk_size
+
+    def assertDecodes(self, text, **kwargs):
+        expected = reference(text, **kwargs)
+        document, errors = User.decode_json(text, parse_datetime=None, **kwargs)
+        self.assertEqual((document, errors), expected)
+        # also the order of the keys
+        self.assertEqual(json.dumps(document), json.dumps(expected[0]))
+
+    def test_same_as_clean_and_errors(self):
+        rng = random.Random(1)
+        tested = 0
+        while tested < 300:
+            user = random_user(rng)
+            if not cleans(user):
+                continue
+            tested += 1
+            text = json.dumps(user, indent=rng.choice([ None, 1 ]))
+            for set_default in (True, False):
+                for remove_undefined in (True, False):
+                    with self.subTest(text=text, set_default=set_default, remove_undefined=remove_undefined):
+                        self.assertDecodes(text, set_default=set_default, remove_undefined=remove_undefined)
+
+    def test_duplicate_keys(self):
+        for text in ('{"name": 1, "age": 3, "name": "a"}',
+                     '{"counters": {"a": null, "b": 1, "a": 2}}',
+                     '{"counters": {"a": 1, "b": 1, "a": null}}',
+                     '{"places": {"a": {}, "a": null, "b": {"street": 1}}}',
+                     '{"places": {"a": null, "b": {}, "a": {"street": "s"}}}',
+                     '{"address": {"street": 1}, "address": {"kind": "work"}}'):
+            with self.subTest(text=text):
+                self.assertDecodes(text)
+
+    def test_file(self):
+        rng = random.Random(2)
+        users = [ user for user in (random_user(rng) for i in range(100)) if cleans(user) ]
+        for chunk_size in (1, 3, 64):
+            jsondecode.CHUNK_SIZE = chunk_size
+            for user in users:
+                text = json.dumps(user, indent=1)
+                expected = reference(text)
+                with self.subTest(chunk_size=chunk_size, text=text):
+                    self.assertEqual(User.decode_json(io.StringIO(text), parse_datetime=None), expected)
+                    for encoding in ("utf-8", "utf-16"):
+                        data = io.BytesIO(text.encode(encoding))
+                        self.assertEqual(User.decode_json(data, parse_datetime=None), expected)
+
+    def test_datetime(self):
+        text = json.dumps({
+            "name" : "a",
+            "created" : "2015-01-02T03:04:05",
+            "address" : { "street" : "s", "since" : "2016-01-01" },
+            "places" : { "a" : { "street" : "s", "since" : "not a date" } },
+            "undefined" : "2015-01-02T03:04:05",
+        })
+        document, errors = User.decode_json(text)
+        self.assertEqual(document["created"], datetime.datetime(2015, 1, 2, 3, 4, 5))
+        self.assertEqual(document["address"]["since"], datetime.datetime(2016, 1, 1))
+        self.assertEqual(document["places"]["a"]["since"], "not a date")
+        self.assertEqual(errors, [ ("required_address.street", "required"), ("places.a.since", "type", "not a date") ])
+
+    def test_skipped_values(self):
+        text = '{"name": "a", "undefined": [{"a": [1, 2.5e3, "x\\"]"]}, true, null, {}]}'
+        self.assertDecodes(text)
+        for text in ('{"name": "a", "undefined": [1, 2}',
+                     '{"name": "a", "undefined": [tru]}',
+                     '{"name": "a", "undefined": ["a]}',
+                     '{"name": "a", "undefined": [1, 2]'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    User.decode_json(text)
+
+    def test_invalid_json(self):
+        for text in ('', '[]', '{"name": "a"} x', '{"name": }', '{"name" "a"}', '{"tags": [1,,2]}',
+                     '{"address": {"street": "a",}}', b'{"name": "\xff"}'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    User.decode_json(text)
+
+    def test_lines(self):
+        lines = [ '{"name": "a"}\n', '\n', b'{"name": 1}\n' ]
+        self.assertEqual(list(User.decode_json_lines(lines, parse_datetime=None)),
+                         [ reference(lines[0]), reference(lines[2]) ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Tests of the labels extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import unittest
+import unittest.mock
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+labels = importlib.import_module(PACKAGE + ".extensions.labels")
+
+
+class Account(dict_model.DefinedDict, labels.LabelMixin):
+    password = dict_model.StringField(labels=["private"])
+    email = dict_model.StringField(labels=["private", "contact"])
+
+
+class User(dict_model.DefinedDict, labels.LabelMixin):
+    name = dict_model.StringField()
+    phone = dict_model.StringField(labels="contact")
+    account = dict_model.DefinedDictField(Account)
+
+
+class LabelsTest(unittest.TestCase):
+
+    def setUp(self):
+        User._label_projections.clear()
+        Account._label_projections.clear()
+
+    def test_clean_labels(self):
+        document = { "name" : "a", "phone" : "1", "account" : { "password" : "p", "email" : "e" } }
+        User.clean_labels(document, "private", exclude="contact")
+        self.assertEqual(document, { "name" : "a", "phone" : "1", "account" : { "email" : "e" } })
+        User.clean_labels(document, None)
+        self.assertEqual(document, { "name" : "a", "account" : {} })
+
+    def test_projections_are_kept_by_model(self):
+        User.label_projection("private")
+        Account.label_projection("contact")
+        self.assertEqual(list(User._label_projections), [ (frozenset(["private"]), frozenset()) ])
+        self.assertEqual(sorted(Account._label_projections),
+                         sorted([ (frozenset(["private"]), frozenset()), (frozenset(["contact"]), frozenset()) ]))
+
+    def test_cache_size_is_by_model(self):
+        with unittest.mock.patch.object(labels, "LABEL_PROJECTION_CACHE_SIZE", 2):
+            for label in ("a", "b", "c"):
+                User.label_projection(label)
+            Account.label_projection("d")
+        self.assertEqual(list(User._label_projections), [ (frozenset(["b"]), frozenset()),
+                                                          (frozenset(["c"]), frozenset()) ])
+        self.assertEqual(list(Account._label_projections), [ (frozenset(["c"]), frozenset()),
+                                                             (frozenset(["d"]), frozenset()) ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Tests of the mongo extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import datetime
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+mongo = importlib.import_module(PACKAGE + ".extensions.mongo")
+
+try:
+    from dateutil import tz
+except ImportError:
+    tz = None
+
+
+class DatetimeTest(unittest.TestCase):
+
+    def test_microsecond_to_datetime(self):
+        result = mongo.microsecond_to_datetime(1432550134353845)
+        # dateutil's tzutc as arrow returned, datetime.timezone.utc without dateutil
+        self.assertIs(type(result.tzinfo), datetime.timezone if tz is None else tz.tzutc)
+        self.assertEqual(result, datetime.datetime(2015, 5, 25, 10, 35, 34, 353845, tzinfo=datetime.timezone.utc))
+
+    def test_map_from_mongo(self):
+        class Event(dict_model.DefinedDict, mongo.MongoMixin):
+            at = dict_model.DateTimeField()
+
+        document = { "at" : 1432550134353845 }
+        Event.map_from_mongo(document)
+        self.assertEqual(document["at"], mongo.microsecond_to_datetime(1432550134353845))
+        self.assertIs(type(document["at"].tzinfo), type(mongo.microsecond_to_datetime(0).tzinfo))
+
+    def test_round_trip(self):
+        value = datetime.datetime(2015, 5, 25, 10, 35, 34, 353845)
+        result = mongo.microsecond_to_datetime(mongo.datetime_to_microsecond(value))
+        self.assertEqual(result.replace(tzinfo=None), value)
+        self.assertEqual(result.utcoffset(), datetime.timedelta(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests of the profiling extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+profiling = importlib.import_module(PACKAGE + ".extensions.profiling")
+
+
+class Child(dict_model.DefinedDict, profiling.ProfilingMixin):
+    name = dict_model.StringField()
+
+
+class Parent(dict_model.DefinedDict, profiling.ProfilingMixin):
+    child = dict_model.DefinedDictField(Child)
+    children = dict_model.ListField(inner_type=dict_model.DefinedDictField(Child))
+
+
+def make_parent():
+    return { "child" : { "name" : "a", "x" : 1 }, "children" : [ { "name" : "b" } ] }
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def tearDown(self):
+        profiling.disable_profiling()
+        profiling.reset_profile()
+
+    def test_disabled_child_is_not_recorded_by_parent(self):
+        Parent.clean_document(make_parent())        # planned before the child is profiled
+        Child.enable_profiling()
+        Parent.clean_document(make_parent())
+        self.assertEqual(profiling.profile_snapshot()["clean"]["Child"][""]["calls"], 2)
+
+        Child.disable_profiling()
+        profiling.reset_profile()
+        document = Parent.clean_document(make_parent())
+        self.assertEqual(profiling.profile_snapshot(), {})
+        self.assertEqual(document, { "child" : { "name" : "a" }, "children" : [ { "name" : "b" } ] })
+
+    def test_parent_disabled_after_child(self):
+        Child.enable_profiling()
+        Parent.enable_profiling()
+        Child.disable_profiling()
+        Parent.disable_profiling()
+        profiling.reset_profile()
+        Parent.clean_document(make_parent())
+        self.assertEqual(profiling.profile_snapshot(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
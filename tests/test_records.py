@@ -0,0 +1,57 @@
+"""
+Tests of the records of DefinedDict.record_class.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+
+
+class Address(dict_model.DefinedDict):
+    city = dict_model.StringField()
+
+
+class User(dict_model.DefinedDict):
+    name = dict_model.StringField()
+    age = dict_model.IntField()
+    address = dict_model.DefinedDictField(Address)
+
+
+def model_with(key):
+    return type("Keyed", (dict_model.DefinedDict, ), { key : dict_model.StringField() })
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        document = { "name" : "a", "age" : 3, "address" : { "city" : "b" } }
+        record = User.record_class().from_dict(document)
+        self.assertEqual(record.name, "a")
+        self.assertEqual(record.address.city, "b")
+        self.assertEqual(record.to_dict(), document)
+
+    def test_keys_that_are_not_attributes(self):
+        for key in ("class", "first-name", "1st", "__private"):
+            with self.subTest(key=key):
+                model = model_with(key)
+                self.assertIn(key, model._fields)
+                with self.assertRaises(dict_model.DictFieldError):
+                    model.record_class()
+                # the dict path is not affected
+                document = { key : "x" }
+                model.clean_document(document)
+                self.assertFalse(model.get_document_errors(document))
+
+
+if __name__ == "__main__":
+    unittest.main()
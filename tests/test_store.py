@@ -0,0 +1,79 @@
+"""
+Tests of the store extension.
+
+    python -m pytest tests
+
+The extensions are imported as a package, from the parent folder of the repository.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+store = importlib.import_module(PACKAGE + ".extensions.store")
+
+
+class User(dict_model.DefinedDict):
+    name = dict_model.StringField()
+    age = dict_model.IntField()
+
+
+class DocumentStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "users.dms")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, count):
+        with store.DocumentStore(User, self.path) as users:
+            for i in range(count):
+                users.append({ "name" : "user%d" % i, "age" : i })
+        return os.path.getsize(self.path)
+
+    def test_reopen(self):
+        self.write(3)
+        with store.DocumentStore(User, self.path) as users:
+            self.assertEqual(len(users), 3)
+            self.assertEqual(users[2]["name"], "user2")
+
+    def test_zeroed_tail_without_index(self):
+        size = self.write(3)
+        with open(self.path, "ab") as f:
+            f.write(b"\0" * 64)
+        os.remove(self.path + ".idx")
+        with store.DocumentStore(User, self.path) as users:
+            self.assertEqual(len(users), 3)
+            self.assertEqual(users[1]["age"], 1)
+            users.append({ "name" : "new", "age" : 3 })
+            self.assertEqual(users[3]["name"], "new")
+        self.assertGreater(os.path.getsize(self.path), size)
+
+    def test_zeroed_tail_with_index(self):
+        size = self.write(2)
+        with open(self.path, "ab") as f:
+            f.write(b"\0" * 64)
+        with store.DocumentStore(User, self.path) as users:
+            self.assertEqual(len(users), 2)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+    def test_incomplete_record(self):
+        size = self.write(2)
+        with open(self.path, "ab") as f:
+            f.write(b"\xff\x00\x00\x00abc")
+        with store.DocumentStore(User, self.path) as users:
+            self.assertEqual(len(users), 2)
+        self.assertEqual(os.path.getsize(self.path), size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,298 @@
+"""
+Tests of the compiled validators and clean plans, against the errors and clean methods of the fields.
+
+    python -m pytest tests
+
+The package is imported from the parent folder of the repository.
+"""
+import os
+import sys
+import copy
+import random
+import collections
+import datetime
+import unittest
+import unittest.mock
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+PACKAGE = os.path.basename(ROOT)
+
+dict_model = importlib.import_module(PACKAGE + ".dict_model")
+
+
+class EvenField(dict_model.IntField):
+    """A field with its own errors method, which the compiled validators call instead of inlining it"""
+
+    def errors(self, value, with_key=None):
+        yield from super().errors(value, with_key)
+        if isinstance(value, int) and value % 2:
+            yield (with_key, dict_model.Field.ERROR_VALUE, value)
+
+
+class Address(dict_model.DefinedDict):
+    street = dict_model.StringField(is_required=True)
+    kind = dict_model.StringField(choices={ "home" : "Home", "work" : "Work" })
+    floor = dict_model.IntField(choices=[0, 1, 2, 3], min=1, max=2)
+    since = dict_model.DateTimeField()
+
+
+class Building(dict_model.DefinedDict):
+    address = dict_model.DefinedDictField(Address, is_required=True)
+    doors = EvenField()
+    rooms = dict_model.MapField(inner_type=dict_model.ListField(inner_type=dict_model.IntField()))
+
+
+class User(dict_model.DefinedDict):
+    name = dict_model.StringField(is_required=True)
+    age = dict_model.IntField(min=0, max=150)
+    score = dict_model.FloatField(choices=[0.5, 1, 2.5])
+    active = dict_model.BoolField()
+    created = dict_model.DateTimeField(is_required=True)
+    anything = dict_model.Field(choices=[ "a", 1, None ])
+    extra = dict_model.DictField()
+    raw = dict_model.ListField()
+    tags = dict_model.ListField(inner_type=dict_model.StringField(choices=["x", "y"]))
+    address = dict_model.DefinedDictField(Address)
+    addresses = dict_model.ListField(inner_type=dict_model.DefinedDictField(Address, is_required=True))
+    places = dict_model.MapField(inner_type=dict_model.DefinedDictField(Address))
+    counters = dict_model.MapField(inner_type=EvenField(is_required=True))
+    buildings = dict_model.MapField(inner_type=dict_model.ListField(inner_type=dict_model.DefinedDictField(Building)))
+    matrix = dict_model.ListField(inner_type=dict_model.ListField(inner_type=dict_model.FloatField()))
+
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(8 if depth < 3 else 6)
+    if kind == 0:
+        return None
+    if kind == 1:
+        return rng.randrange(-5, 200)
+    if kind == 2:
+        return rng.choice(["", "a", "x", "home"])
+    if kind == 3:
+        return rng.random() * 10
+    if kind == 4:
+        return rng.choice([True, False])
+    if kind == 5:
+        return rng.choice([[], {}, datetime.datetime(2015, 1, 2)])
+    if kind == 6:
+        return [ random_value(rng, depth + 1) for i in range(rng.randrange(4)) ]
+    return { rng.choice(["a", "b", "street"]) : random_value(rng, depth + 1) for i in range(rng.randrange(4)) }
+
+
+def in_bounds(definition, value):
+    return ((getattr(definition, "min", None) is None or value >= definition.min) and
+            (getattr(definition, "max", None) is None or value <= definition.max))
+
+
+def random_field_value(rng, definition, noise, depth=0):
+    """Return a valid value of definition, or with probability noise None or a value that is likely invalid.
+
+    Numbers compared to min/max are always numbers, and the values of dict choices are never lists or
+    dicts, the errors methods cannot compare or look up these.
+    """
+    bounded = not in_bounds(definition, float("inf")) or not in_bounds(definition, float("-inf"))
+    if rng.random() < noise:
+        if rng.random() < 0.3:
+            return None
+        if bounded:
+            return rng.choice([-100, 1000, 2.5])
+        if isinstance(definition.choices, dict):
+            return rng.choice(["Home", 1, True])
+        return random_value(rng, depth)
+    if isinstance(definition, dict_model.DefinedDictField):
+        return random_document(rng, definition.model, noise, depth + 1)
+    if isinstance(definition, dict_model.ListField):
+        if definition.inner_type is None:
+            return [ random_value(rng, depth + 1) for i in range(rng.randrange(4)) ]
+        return [ random_field_value(rng, definition.inner_type, noise, depth + 1) for i in range(rng.randrange(4)) ]
+    if isinstance(definition, dict_model.MapField):
+        return { rng.choice("abcd") : random_field_value(rng, definition.inner_type, noise, depth + 1)
+                 for i in range(rng.randrange(4)) }
+    if definition.choices is not None:
+        return rng.choice([ choice for choice in definition.choices
+                            if choice is None or not bounded or in_bounds(definition, choice) ])
+    if isinstance(definition, EvenField):
+        return rng.randrange(0, 200, 2)
+    if isinstance(definition, dict_model.IntField):
+        return rng.randrange(-10, 200)
+    if isinstance(definition, dict_model.FloatField):
+        return rng.uniform(-10, 200)
+    if isinstance(definition, dict_model.BoolField):
+        return rng.choice([True, False])
+    if isinstance(definition, dict_model.StringField):
+        return rng.choice(["", "a", "x"])
+    if isinstance(definition, dict_model.DateTimeField):
+        return datetime.datetime(2015, 1, 2, 3, 4, 5)
+    if isinstance(definition, dict_model.DictField):
+        return { "a" : random_value(rng, depth + 1) }
+    return random_value(rng, depth)
+
+
+def random_document(rng, model, noise, depth=0):
+    document = {}
+    for key, definition in model._fields.items():
+        if rng.random() < 0.8 or (definition.is_required and rng.random() >= noise):
+            document[key] = random_field_value(rng, definition, noise, depth)
+    if rng.random() < 0.2:
+        document["undefined"] = random_value(rng, depth)
+    return document
+
+
+class CompiledValidatorTest(unittest.TestCase):
+    """The compiled validators give the errors of _yield_errors, the walk of the errors methods"""
+
+    def check(self, model, document):
+        expected = list(model._yield_errors(document))
+        self.assertEqual(model.get_document_errors(document), expected)
+        self.assertEqual(model.is_document_valid(document), not expected)
+        for max_errors in range(len(expected) + 2):
+            errors = model.get_document_errors(document, max_errors=max_errors)
+            self.assertEqual(errors, expected[:max_errors])
+            self.assertTrue(all(isinstance(error, dict_model.DocumentError) for error in errors))
+            self.assertEqual([ error.key for error in errors ], [ error[0] for error in expected[:max_errors] ])
+
+    def test_random_documents(self):
+        rng = random.Random(0)
+        counts = collections.Counter()
+        for i in range(500):
+            document = random_document(rng, User, rng.choice([0, 0.01, 0.05, 0.2]))
+            with self.subTest(i=i, document=document):
+                self.check(User, document)
+            counts[min(len(User.get_document_errors(document)), 2)] += 1
+        # valid documents, documents with a single error and documents with more errors are all checked
+        self.assertTrue(all(counts[errors] > 50 for errors in (0, 1, 2)), counts)
+
+    def test_nested_errors(self):
+        document = {
+            "name" : "a",
+            "created" : datetime.datetime(2015, 1, 2),
+            "address" : { "kind" : "Home", "floor" : 3 },
+            "addresses" : [ None, { "street" : 1 } ],
+            "places" : { "a" : { "street" : "s", "since" : "2015" }, "b" : 1 },
+            "counters" : { "a" : 1, "b" : None, "c" : 2 },
+            "buildings" : { "a" : [ { "doors" : 3, "rooms" : { "r" : [ 1, "2" ] } }, "b" ] },
+            "matrix" : [ [ 1, "1" ], 2 ],
+        }
+        self.check(User, document)
+        self.assertEqual(User.get_document_errors(document), [
+            ("address.street", "required"),
+            ("address.kind", "value", "Home"),
+            ("address.floor", "value", 3),
+            ("addresses.0", "required"),
+            ("addresses.1.street", "type", 1),
+            ("places.a.since", "type", "2015"),
+            ("places.b", "type", 1),
+            ("counters.a", "value", 1),
+            ("counters.b", "required"),
+            ("buildings.a.0.address", "required"),
+            ("buildings.a.0.doors", "value", 3),
+            ("buildings.a.0.rooms.r.1", "type", "2"),
+            ("buildings.a.1", "type", "b"),
+            ("matrix.0.1", "type", "1"),
+            ("matrix.1", "type", 2),
+        ])
+
+    def test_valid_short_circuit(self):
+        document = { "name" : None, "created" : None, "addresses" : [ None ] * 1000 }
+        self.assertFalse(User.is_document_valid(document))
+        self.assertEqual(len(User.get_document_errors(document, max_errors=3)), 3)
+        self.assertTrue(User.is_document_valid({ "name" : "a", "created" : datetime.datetime(2015, 1, 2) }))
+
+
+class LowercaseField(dict_model.StringField):
+    """A field with its own clean method, which the clean plans call"""
+
+    def clean(self, document, key, **kwargs):
+        super().clean(document, key, **kwargs)
+        if isinstance(document.get(key), str):
+            document[key] = document[key].lower()
+
+
+class Room(dict_model.DefinedDict):
+    name = LowercaseField(default="ROOM")
+    size = dict_model.IntField(default=1)
+    built = dict_model.DateTimeField(default=lambda field: datetime.datetime(2015, 1, 2))
+
+
+class House(dict_model.DefinedDict):
+    name = LowercaseField()
+    room = dict_model.DefinedDictField(Room)
+    no_room = dict_model.DefinedDictField(Room, default=None)
+    rooms = dict_model.ListField(inner_type=dict_model.DefinedDictField(Room))
+    kept_rooms = dict_model.ListField(inner_type=dict_model.DefinedDictField(Room), remove_none_value=False,
+                                      ensure_list=False)
+    tags = dict_model.ListField(inner_type=dict_model.StringField(), default=lambda field: ["new"])
+    raw = dict_model.ListField(remove_none_value=False)
+    floors = dict_model.MapField(inner_type=dict_model.DefinedDictField(Room))
+    kept_floors = dict_model.MapField(inner_type=dict_model.DefinedDictField(Room), remove_none_value=False,
+                                      ensure_dict=False)
+    wings = dict_model.MapField(inner_type=dict_model.ListField(inner_type=dict_model.DefinedDictField(Room)))
+    grid = dict_model.MapField(inner_type=dict_model.MapField(inner_type=dict_model.IntField(default=0)))
+    labels = dict_model.MapField(inner_type=LowercaseField())
+
+
+def reference_clean_document(cls, document, set_default=True, remove_undefined=True):
+    """clean_document as a walk of the clean methods of the fields, without the clean plans"""
+    if document is None:
+        return document
+    for key, definition in cls._fields.items():
+        definition.clean(document, key, set_default=set_default, remove_undefined=remove_undefined)
+    if remove_undefined:
+        for key in [ key for key in document if key not in cls._fields ]:
+            document.pop(key)
+    return document
+
+
+def random_clean_value(rng, definition, depth=0):
+    """Return None or a value that the clean methods can clean, the values of models and maps are dicts and
+    the values of lists are lists"""
+    if rng.random() < 0.15:
+        return None
+    if isinstance(definition, dict_model.DefinedDictField):
+        return random_clean_document(rng, definition.model, depth + 1)
+    if isinstance(definition, dict_model.ListField):
+        if definition.inner_type is None:
+            return [ rng.choice([None, 1, "A"]) for i in range(rng.randrange(4)) ]
+        return [ random_clean_value(rng, definition.inner_type, depth + 1) for i in range(rng.randrange(4)) ]
+    if isinstance(definition, dict_model.MapField):
+        return { rng.choice("abcd") : random_clean_value(rng, definition.inner_type, depth + 1)
+                 for i in range(rng.randrange(4)) }
+    return rng.choice([1, "A", [], datetime.datetime(2016, 1, 2)])
+
+
+def random_clean_document(rng, model, depth=0):
+    document = {}
+    for key, definition in model._fields.items():
+        if rng.random() < 0.6:
+            document[key] = random_clean_value(rng, definition, depth)
+    if rng.random() < 0.3:
+        document["undefined"] = rng.choice([None, 1, {}])
+    return document
+
+
+class CleanPlanTest(unittest.TestCase):
+    """The clean plans clean the documents as the clean methods of the fields do"""
+
+    def test_random_documents(self):
+        rng = random.Random(0)
+        for i in range(300):
+            document = random_clean_document(rng, House)
+            for set_default in (True, False):
+                for remove_undefined in (True, False):
+                    with self.subTest(i=i, set_default=set_default, remove_undefined=remove_undefined,
+                                      document=document):
+                        cleaned = House.clean_document(copy.deepcopy(document), set_default=set_default,
+                                                       remove_undefined=remove_undefined)
+                        # the plan of House calls the clean_document of Room that it was planned with
+                        with unittest.mock.patch.object(Room, "clean_document", classmethod(reference_clean_document)):
+                            expected = reference_clean_document(House, copy.deepcopy(document), set_default=set_default,
+                                                                remove_undefined=remove_undefined)
+                        self.assertEqual(cleaned, expected)
+                        # the defaults are added in the same order
+                        self.assertEqual(repr(cleaned), repr(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()